@@ -1,10 +1,8 @@
-import json
-import anthropic
-from config import settings
+from agents.llm import EventCallback
+from agents.runtime import run_tool_loop
+from services.session_store import ToolMemo
 from data_loader import get_crop, get_diseases_for_crop, get_zone
 
-client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-
 AGRO_TOOLS = [
     {
         "name": "get_crop_info",
@@ -80,54 +78,38 @@ REGLES:
 """
 
 
-async def run_agro_agent(query: str, language: str = "fr", channel: str = "web") -> dict:
+async def run_agro_agent(
+    query: str,
+    language: str = "fr",
+    channel: str = "web",
+    on_event: EventCallback | None = None,
+    stream: bool = False,
+    history: list[dict] | None = None,
+    memo: ToolMemo | None = None,
+) -> dict:
     """Run the agronomic agent to answer crop/disease questions."""
     user_message = query
     lang_label = {"en": "English", "wo": "Wolof"}.get(language, "Français")
     user_message += f"\n[Langue: {lang_label}]"
     user_message += f"\n[Canal: {channel}]"
 
-    messages = [{"role": "user", "content": user_message}]
-
-    response = await client.messages.create(
-        model=settings.ANTHROPIC_MODEL_FAST,
-        max_tokens=512,
+    result = await run_tool_loop(
+        agent="agro",
         system=SYSTEM_PROMPT,
         tools=AGRO_TOOLS,
-        messages=messages,
+        execute_tool=_execute_agro_tool,
+        messages=[*(history or []), {"role": "user", "content": user_message}],
+        on_event=on_event,
+        stream=stream,
+        memo=memo,
     )
 
-    while response.stop_reason == "tool_use":
-        tool_results = []
-        for block in response.content:
-            if block.type == "tool_use":
-                result = await _execute_agro_tool(block.name, block.input)
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": block.id,
-                    "content": json.dumps(result, ensure_ascii=False),
-                })
-
-        messages.append({"role": "assistant", "content": response.content})
-        messages.append({"role": "user", "content": tool_results})
-
-        response = await client.messages.create(
-            model=settings.ANTHROPIC_MODEL_FAST,
-            max_tokens=512,
-            system=SYSTEM_PROMPT,
-            tools=AGRO_TOOLS,
-            messages=messages,
-        )
-
-    text = ""
-    for block in response.content:
-        if hasattr(block, "text"):
-            text += block.text
-
     return {
         "agent": "agro",
-        "response": text,
+        "response": result["text"],
         "language": language,
+        "tool_timings": result["tool_timings"],
+        "usage": result["usage"],
     }
 
 
@@ -1,11 +1,18 @@
+import asyncio
 import json
-import anthropic
+import logging
+import time
+from datetime import date
 from config import settings
+from agents.llm import cached_system, create_message, response_text, usage_dict
+from services.jobs import ProgressCallback
+from services.llm_scheduler import BACKGROUND, llm_context
 from services.supabase_service import get_supabase
-from services.weather_service import get_weather_forecast
+from services.user_data_service import ACTIVE_STATUSES, get_active_cultures, get_profile
+from services.weather_service import get_weather_forecast, get_weather_forecasts
 from data_loader import load_crops, get_prices
 
-client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+logger = logging.getLogger(__name__)
 
 ALERTS_SYSTEM_PROMPT = """You are an agricultural alert system for farmers worldwide.
 Given the farmer's active crops, weather forecast, and current date, generate 1-3 actionable alerts.
@@ -20,41 +27,171 @@ Each alert must be a JSON object with:
 
 Respond with a JSON array only. No extra text."""
 
+ALERTS_SYSTEM = cached_system(ALERTS_SYSTEM_PROMPT)
 
-async def generate_user_alerts(user_id: str) -> list[dict]:
-    """Generate personalized alerts for a farmer based on their crops and weather."""
-    sb = get_supabase()
 
-    # Get user profile
-    profile = sb.table("profiles").select("*").eq("id", user_id).single().execute()
-    if not profile.data:
-        return []
+CULTURE_COLUMNS = "user_id, crop_key, status, planting_date, expected_harvest, parcelle_id"
+PAGE_SIZE = 1000       # PostgREST rows per page
+PROFILE_CHUNK = 200    # ids per profiles query (keeps URLs short)
 
-    city = profile.data.get("city", "kaolack")
-    zone = profile.data.get("zone", "bassin_arachidier")
+FALLBACK_ALERTS = [{
+    "type": "calendar",
+    "severity": "info",
+    "title_fr": "Consultez votre calendrier agricole",
+    "title_wo": "Saytu sa arminaatu tool",
+    "body_fr": "Verifiez les activites recommandees pour ce mois dans votre calendrier.",
+    "body_wo": "Saytu li nu la digal ngir weer wii ci sa arminaatu tool.",
+}]
 
-    # Get active cultures
-    active_cultures = (
-        sb.table("cultures")
-        .select("crop_key, status, planting_date, expected_harvest, parcelle_id")
-        .eq("user_id", user_id)
-        .in_("status", ["planned", "sown", "growing", "harvesting"])
-        .execute()
-    )
 
-    if not active_cultures.data:
+async def generate_user_alerts(user_id: str) -> list[dict]:
+    """Generate personalized alerts for a farmer based on their crops and weather."""
+    # Profile and active cultures are independent (and usually cached)
+    profile, active_cultures = await asyncio.gather(get_profile(user_id), get_active_cultures(user_id))
+    if not profile or not active_cultures:
         return []
 
-    # Get weather forecast
+    city = profile.get("city", "kaolack")
     try:
         weather = await get_weather_forecast(city)
     except Exception:
         weather = None
 
-    # Build context for Claude
+    with llm_context(BACKGROUND, user_id):
+        alerts, _ = await _generate_alerts(user_id, _build_context(profile, active_cultures, weather))
+    return await _insert_alerts(await get_supabase(), _alert_rows(user_id, alerts))
+
+
+async def generate_alerts_batch(
+    user_ids: list[str] | None = None,
+    concurrency: int | None = None,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+) -> dict:
+    """Generate alerts for every user with active cultures (or ``user_ids``).
+
+    Cultures and profiles are read in bulk, users are grouped by city so each
+    forecast is fetched once (via the batched Open-Meteo call), at most
+    ``concurrency`` LLM calls run at a time, and alerts are written with one
+    multi-row insert per ``batch_size`` rows. Returns run statistics,
+    including users per second.
+    """
+    concurrency = concurrency or settings.ALERTS_LLM_CONCURRENCY
+    batch_size = batch_size or settings.ALERTS_INSERT_BATCH
+    started = time.perf_counter()
+    sb = await get_supabase()
+
+    cultures_by_user = await _active_cultures_by_user(sb, user_ids)
+    profiles = await _profiles(sb, list(cultures_by_user))
+    users = [u for u in cultures_by_user if u in profiles]
+
+    by_city: dict[str, list[str]] = {}
+    for user_id in users:
+        city = (profiles[user_id].get("city") or "kaolack").lower().strip()
+        by_city.setdefault(city, []).append(user_id)
+    known_cities = [c for c in by_city if c in settings.CITIES]
+    forecasts = await _forecasts_by_city(known_cities)
+
+    stats = {
+        "users": len(users),
+        "cities": len(by_city),
+        "forecasts": len(forecasts),
+        "processed": 0,
+        "fallbacks": 0,
+        "alerts_inserted": 0,
+        "insert_batches": 0,
+    }
+    if progress:
+        progress({"total": len(users), "processed": 0})
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_user(user_id: str) -> tuple[str, list[dict], bool]:
+        profile = profiles[user_id]
+        city = (profile.get("city") or "kaolack").lower().strip()
+        context = _build_context(profile, cultures_by_user[user_id], forecasts.get(city))
+        async with semaphore:
+            with llm_context(BACKGROUND, user_id):
+                alerts, ok = await _generate_alerts(user_id, context)
+        return user_id, alerts, ok
+
+    pending: list[dict] = []
+    for next_result in asyncio.as_completed([run_user(u) for u in users]):
+        user_id, alerts, ok = await next_result
+        pending.extend(_alert_rows(user_id, alerts))
+        stats["processed"] += 1
+        stats["fallbacks"] += 0 if ok else 1
+        if len(pending) >= batch_size:
+            stats["alerts_inserted"] += len(await _insert_alerts(sb, pending))
+            stats["insert_batches"] += 1
+            pending = []
+        if progress:
+            progress({"processed": stats["processed"]})
+    if pending:
+        stats["alerts_inserted"] += len(await _insert_alerts(sb, pending))
+        stats["insert_batches"] += 1
+
+    elapsed = time.perf_counter() - started
+    stats["duration_s"] = round(elapsed, 3)
+    stats["users_per_second"] = round(len(users) / elapsed, 2) if elapsed else 0.0
+    logger.info("Alerts batch: %s", stats)
+    return stats
+
+
+async def _forecasts_by_city(cities: list[str]) -> dict[str, dict]:
+    """Forecasts for ``cities`` in one batched call. If that fails (Open-Meteo
+    down and one city has nothing stored), each city is fetched on its own
+    and the ones still failing are left out: their users get alerts without
+    weather instead of the whole run failing."""
+    if not cities:
+        return {}
+    try:
+        return dict(zip(cities, await get_weather_forecasts(cities)))
+    except Exception as e:
+        logger.warning("Batched forecasts failed (%s); fetching per city", e)
+
+    async def one(city: str) -> dict | None:
+        try:
+            return await get_weather_forecast(city)
+        except Exception as e:
+            logger.warning("No forecast for %s: %s", city, e)
+            return None
+
+    forecasts = await asyncio.gather(*(one(city) for city in cities))
+    return {city: forecast for city, forecast in zip(cities, forecasts) if forecast is not None}
+
+
+async def _active_cultures_by_user(sb, user_ids: list[str] | None) -> dict[str, list[dict]]:
+    by_user: dict[str, list[dict]] = {}
+    offset = 0
+    while True:
+        query = sb.table("cultures").select(CULTURE_COLUMNS).in_("status", ACTIVE_STATUSES)
+        if user_ids is not None:
+            query = query.in_("user_id", user_ids)
+        page = await query.order("user_id").range(offset, offset + PAGE_SIZE - 1).execute()
+        for culture in page.data or []:
+            by_user.setdefault(culture["user_id"], []).append(culture)
+        if len(page.data or []) < PAGE_SIZE:
+            return by_user
+        offset += PAGE_SIZE
+
+
+async def _profiles(sb, user_ids: list[str]) -> dict[str, dict]:
+    chunks = [user_ids[i:i + PROFILE_CHUNK] for i in range(0, len(user_ids), PROFILE_CHUNK)]
+    results = await asyncio.gather(*(
+        sb.table("profiles").select("id, city, zone").in_("id", chunk).execute() for chunk in chunks
+    ))
+    return {row["id"]: row for result in results for row in result.data or []}
+
+
+def _build_context(profile: dict, cultures: list[dict], weather: dict | None) -> str:
+    """LLM prompt context for one farmer: crops, 3-day weather and indicators."""
+    city = profile.get("city", "kaolack")
+    zone = profile.get("zone", "bassin_arachidier")
+
     crops_data = load_crops()
     crop_details = []
-    for culture in active_cultures.data:
+    for culture in cultures:
         crop_key = culture["crop_key"]
         crop_info = crops_data.get(crop_key, {})
         price_info = get_prices(crop_key)
@@ -72,9 +209,26 @@ async def generate_user_alerts(user_id: str) -> list[dict]:
             f"- {d['date']}: {d.get('temp_min', '?')}-{d.get('temp_max', '?')}C, pluie {d.get('precipitation_mm', 0)}mm"
             for d in forecast_days
         )
+        indicators = weather.get("indicators")
+        if indicators:
+            dry = indicators["dry_spell"]
+            risk = indicators["disease_risk"]
+            sowing = indicators["sowing_trigger"]
+            weather_summary += (
+                f"\nIndicateurs 7 jours: {dry['from_today_days']} jours secs a partir d'aujourd'hui"
+                f" (plus longue serie {dry['longest_days']}), {risk['hours']}h a risque de maladie ({risk['rule']}),"
+                f" pluie utile {sowing['threshold_mm']:g}mm "
+                + (f"atteinte le {sowing['date']}" if sowing["reached"] else f"non atteinte (max {sowing['max_rain_window_mm']}mm)")
+            )
+            for culture in cultures:
+                crop_gdd = indicators["growing_degree_days"].get(culture["crop_key"])
+                if crop_gdd:
+                    weather_summary += (
+                        f"\n- {culture['crop_key']}: {crop_gdd['gdd']} degres-jours (base {crop_gdd['base_c']:g}C),"
+                        f" {crop_gdd['heat_stress_hours']}h de stress thermique"
+                    )
 
-    from datetime import date
-    context = f"""Date: {date.today().isoformat()}
+    return f"""Date: {date.today().isoformat()}
 Ville: {city}, Zone: {zone}
 
 Cultures actives du fermier:
@@ -82,37 +236,31 @@ Cultures actives du fermier:
 
 {weather_summary}"""
 
+
+async def _generate_alerts(user_id: str, context: str) -> tuple[list[dict], bool]:
+    """LLM alerts for one farmer; falls back to a calendar reminder (ok=False)."""
     try:
-        response = await client.messages.create(
+        response = await create_message(
             model=settings.ANTHROPIC_MODEL_FAST,
             max_tokens=1024,
-            system=ALERTS_SYSTEM_PROMPT,
+            system=ALERTS_SYSTEM,
             messages=[{"role": "user", "content": context}],
         )
+        logger.info("Alerts LLM usage for %s: %s", user_id, usage_dict(response))
 
-        text = ""
-        for block in response.content:
-            if hasattr(block, "text"):
-                text += block.text
+        text = response_text(response)
 
         alerts = json.loads(text)
         if not isinstance(alerts, list):
             alerts = [alerts]
+        return alerts, True
     except Exception:
-        # Fallback: generate a simple calendar-based alert
-        alerts = [{
-            "type": "calendar",
-            "severity": "info",
-            "title_fr": "Consultez votre calendrier agricole",
-            "title_wo": "Saytu sa arminaatu tool",
-            "body_fr": "Verifiez les activites recommandees pour ce mois dans votre calendrier.",
-            "body_wo": "Saytu li nu la digal ngir weer wii ci sa arminaatu tool.",
-        }]
-
-    # Insert alerts into database
-    inserted = []
-    for alert in alerts:
-        row = {
+        return FALLBACK_ALERTS, False
+
+
+def _alert_rows(user_id: str, alerts: list[dict]) -> list[dict]:
+    return [
+        {
             "user_id": user_id,
             "type": alert.get("type", "info"),
             "title_fr": alert.get("title_fr", ""),
@@ -122,8 +270,13 @@ Cultures actives du fermier:
             "severity": alert.get("severity", "info"),
             "is_read": False,
         }
-        result = sb.table("alerts").insert(row).execute()
-        if result.data:
-            inserted.append(result.data[0])
+        for alert in alerts
+    ]
 
-    return inserted
+
+async def _insert_alerts(sb, rows: list[dict]) -> list[dict]:
+    """One multi-row insert; returns the inserted rows."""
+    if not rows:
+        return []
+    result = await sb.table("alerts").insert(rows).execute()
+    return result.data or []
@@ -0,0 +1,94 @@
+import logging
+import time
+from typing import Awaitable, Callable
+
+from services import tracing
+from services.http_client import get_anthropic
+from services.llm_scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Receives progress events ({"type": "token" | "tool" | ...}) as they happen.
+EventCallback = Callable[[dict], Awaitable[None]]
+
+
+async def create_message(on_token: EventCallback | None = None, **kwargs):
+    """Single entry point for Anthropic Messages calls.
+
+    Without ``on_token`` this is ``messages.create``. With it, the call goes
+    through the streaming API and every text delta is forwarded as a
+    ``{"type": "token", "text": ...}`` event the moment it arrives; the final
+    Message is returned either way. Every call is traced: latency per model
+    and mode, token counts, and time to first token when streaming.
+
+    Calls first take a slot from the LLM scheduler (priority and user come
+    from ``llm_context``) and may raise ``LLMOverloaded`` under load.
+    """
+    client = get_anthropic()
+    model = kwargs.get("model")
+    async with scheduler.slot(model):
+        response = await _create(client, model, on_token, kwargs)
+
+    usage = usage_dict(response)
+    for kind, tokens in usage.items():
+        if tokens:
+            tracing.llm_tokens.inc(tokens, model=model, kind=kind.removesuffix("_tokens"))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("LLM call model=%s usage=%s", model, usage)
+    return response
+
+
+async def _create(client, model: str, on_token: EventCallback | None, kwargs: dict):
+    started = time.perf_counter()
+    with tracing.span("llm", model=model, mode="create" if on_token is None else "stream") as attrs:
+        if on_token is None:
+            response = await client.messages.create(**kwargs)
+        else:
+            async with client.messages.stream(**kwargs) as stream:
+                async for text in stream.text_stream:
+                    if "first_token_ms" not in attrs:
+                        attrs["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    await on_token({"type": "token", "text": text})
+                response = await stream.get_final_message()
+        attrs.update(usage_dict(response))
+    return response
+
+
+# ---------- Prompt caching ----------
+# Prefix order is tools -> system -> messages. Static tool schemas and system
+# prompts get a cache breakpoint; everything per-request (city, language,
+# channel) lives in the user message so the cached prefix stays byte-stable.
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cached_system(prompt: str) -> list[dict]:
+    return [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]
+
+
+def cached_tools(tools: list[dict]) -> list[dict]:
+    if not tools:
+        return tools
+    return [*tools[:-1], {**tools[-1], "cache_control": CACHE_CONTROL}]
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def usage_dict(response) -> dict:
+    usage = getattr(response, "usage", None)
+    return {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+
+
+def add_usage(total: dict, usage: dict) -> dict:
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+    return total
+
+
+def response_text(response) -> str:
+    text = ""
+    for block in response.content:
+        if hasattr(block, "text"):
+            text += block.text
+    return text
@@ -0,0 +1,122 @@
+import re
+
+from text_utils import fold_text
+
+# ---------- Deterministic merge of agent answers ----------
+# With several agents, their answers can be stitched into sections instead of
+# paying a serial synthesis LLM call. The LLM is still used when the answers
+# disagree on what the farmer should do (see ``find_conflicts``).
+
+STRATEGIES = ("llm", "structured", "auto")
+
+SECTION_TITLES = {
+    "weather": {"fr": "Météo", "en": "Weather", "wo": "Jawwu"},
+    "agro": {"fr": "Cultures", "en": "Crops", "wo": "Tool"},
+    "market": {"fr": "Marchés", "en": "Markets", "wo": "Marse"},
+}
+SECTION_ICONS = {"weather": "🌦️", "agro": "🌱", "market": "💰"}
+SECTION_ORDER = ("weather", "agro", "market")
+
+SMS_MAX_CHARS = 320
+
+# Farm actions agents advise on, as the accent-folded verb forms that carry
+# advice (fr / en / wo). Whole words only: "semaine", "vendredi", "plantes"
+# or "traitement" are not advice to sow, sell or treat.
+ACTIONS = {
+    "sow": {"semer", "semez", "sow", "sowing", "planter", "plantez", "plant", "bey"},
+    "water": {"arroser", "arrosez", "irriguer", "irriguez", "irrigate", "irrigating", "suuxat"},
+    "harvest": {"recolter", "recoltez", "harvest", "harvesting", "natt"},
+    "sell": {"vendre", "vendez", "sell", "selling", "jaay"},
+    "treat": {"traiter", "traitez", "pulveriser", "pulverisez", "spray", "spraying"},
+}
+# Words that turn the verb right after them (within NEGATION_WINDOW words of
+# the same clause) into advice against it: "ne semez pas", "ne pas vendre",
+# "evitez de traiter", "don't sell", "bul jaay".
+NEGATIONS = {
+    "ne", "n", "pas", "jamais", "evitez", "eviter", "attendez", "reportez",
+    "don", "dont", "not", "never", "avoid", "wait", "postpone",
+    "bul", "buleen",
+}
+NEGATION_WINDOW = 3
+_CLAUSE_RE = re.compile(r"[^.,;:!?\n]+")
+_WORD_RE = re.compile(r"\w+")
+_MARKDOWN_RE = re.compile(r"[*_#`>|]+")
+
+
+def _stances(text: str) -> dict[str, set[str]]:
+    """action -> {"do", "avoid"} as advised anywhere in ``text``."""
+    stances: dict[str, set[str]] = {}
+    for clause in _CLAUSE_RE.findall(fold_text(text)):
+        words = _WORD_RE.findall(clause)
+        for i, word in enumerate(words):
+            for action, forms in ACTIONS.items():
+                if word in forms:
+                    negated = not NEGATIONS.isdisjoint(words[max(i - NEGATION_WINDOW, 0):i])
+                    stances.setdefault(action, set()).add("avoid" if negated else "do")
+    return stances
+
+
+def find_conflicts(results: list[dict]) -> list[str]:
+    """Actions one agent recommends while another advises against them."""
+    clear: dict[str, dict[str, str]] = {}  # action -> agent -> stance
+    for result in results:
+        for action, stances in _stances(result.get("response", "")).items():
+            if len(stances) == 1:
+                clear.setdefault(action, {})[result.get("agent", "agent")] = next(iter(stances))
+    return sorted(action for action, by_agent in clear.items() if len(set(by_agent.values())) > 1)
+
+
+def choose_strategy(requested: str, results: list[dict]) -> tuple[str, list[str]]:
+    """("llm" | "structured", conflicts). ``auto`` merges deterministically
+    unless the agents' advice conflicts."""
+    conflicts = find_conflicts(results) if requested == "auto" else []
+    if requested == "llm" or conflicts:
+        return "llm", conflicts
+    return "structured", conflicts
+
+
+def merge_sections(results: list[dict], language: str, channel: str) -> str:
+    """One section per agent in a fixed order: markdown headings on the web,
+    compact ``LABEL: text`` lines sharing the SMS length budget."""
+    lang = language if language in ("fr", "en", "wo") else "fr"
+    ordered = sorted(results, key=lambda r: SECTION_ORDER.index(r["agent"]) if r.get("agent") in SECTION_ORDER else len(SECTION_ORDER))
+    ordered = [r for r in ordered if r.get("response", "").strip()]
+    if not ordered:
+        return ""
+
+    if channel == "sms":
+        labels = [SECTION_TITLES.get(r["agent"], {}).get(lang, r["agent"]).upper() for r in ordered]
+        texts = [_plain(r["response"]) for r in ordered]
+        # Shortest sections first, so what they leave of the budget goes to the longer ones.
+        left = SMS_MAX_CHARS - sum(len(label) + 3 for label in labels)
+        limits = [0] * len(texts)
+        for n, i in enumerate(sorted(range(len(texts)), key=lambda i: len(texts[i]))):
+            limits[i] = min(len(texts[i]), left // (len(texts) - n))
+            left -= limits[i]
+        return "\n".join(f"{label}: {_cut(text, limit)}" for label, text, limit in zip(labels, texts, limits))
+
+    sections = []
+    for r in ordered:
+        agent = r.get("agent", "agent")
+        title = SECTION_TITLES.get(agent, {}).get(lang, agent.title())
+        icon = SECTION_ICONS.get(agent)
+        heading = f"### {icon} {title}" if icon else f"### {title}"
+        sections.append(f"{heading}\n\n{r['response'].strip()}")
+    return "\n\n".join(sections)
+
+
+def _plain(text: str) -> str:
+    """Single-line text without markdown markup."""
+    return " ".join(_MARKDOWN_RE.sub("", text).split())
+
+
+def _cut(text: str, limit: int) -> str:
+    """``text`` within ``limit`` characters, cut at a sentence (or word) boundary."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end >= limit // 2:
+        return cut[:end + 1]
+    space = cut.rfind(" ", 0, limit - 1)
+    return cut[:space if space > 0 else limit - 1].rstrip(",;:") + "…"
@@ -1,62 +1,62 @@
 import json
 import asyncio
+import logging
 import re
-import anthropic
+import time
+from typing import AsyncIterator, Awaitable
 from config import settings
+from agents.llm import EventCallback, add_usage, cached_system, create_message, response_text, usage_dict
+from data_loader import data_version
+from services import tracing
+from services.cache import TTLCache
+from services.llm_scheduler import CHAT, SMS, LLMOverloaded, llm_context
+from services.session_store import ToolMemo, history, new_session, record_turn, session_key, sessions
+from text_utils import fold_text, normalize_query
 from agents.weather_agent import run_weather_agent
 from agents.agro_agent import run_agro_agent
 from agents.market_agent import run_market_agent
+from agents.router import router
+from agents.merge import STRATEGIES, choose_strategy, merge_sections
 
-client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-
-# ---------- Keyword-based fast routing (no LLM call) ----------
-
-WEATHER_KEYWORDS = [
-    "weather", "meteo", "météo", "taw", "pluie", "rain", "temperature",
-    "température", "vent", "wind", "forecast", "prévision", "irrigation",
-    "arroser", "ndox", "nawet", "noor", "lolli", "sécheresse", "drought",
-    "inondation", "flood", "chaleur", "heat", "humidité", "humidity",
-    "soleil", "sun", "nuage", "cloud",
-]
-
-AGRO_KEYWORDS = [
-    "plant", "planter", "semer", "sow", "crop", "culture", "récolte",
-    "harvest", "maladie", "disease", "ravageur", "pest", "feuille", "leaf",
-    "tache", "spot", "variété", "variety", "semence", "seed", "engrais",
-    "fertilizer", "sol", "soil", "calendrier", "calendar", "arachide",
-    "gerte", "mil", "dugub", "riz", "malo", "mais", "maïs", "mbaxal",
-    "niebe", "niébé", "tomate", "tamaate", "oignon", "soble", "mangue",
-    "coton", "bey", "suuf", "diagnos", "traitement", "treatment",
-    "rotation", "compost", "neem", "bio",
-]
-
-MARKET_KEYWORDS = [
-    "prix", "price", "marché", "market", "vendre", "sell", "acheter",
-    "buy", "fcfa", "cfa", "tendance", "trend", "cours", "njeg",
-    "coût", "cost", "revenu", "revenue", "stockage", "storage",
-    "transport", "bénéfice", "profit", "sandaga", "thiaroye",
-]
+logger = logging.getLogger(__name__)
 
 
 def _fast_route(message: str) -> list[str]:
     """Route to agents using keyword matching. Returns list of agent names."""
-    text = message.lower()
-    # Remove accents for fuzzy matching
-    text_norm = text.replace("é", "e").replace("è", "e").replace("ê", "e").replace("à", "a").replace("ô", "o")
-
-    scores = {
-        "weather": sum(1 for k in WEATHER_KEYWORDS if k in text or k in text_norm),
-        "agro": sum(1 for k in AGRO_KEYWORDS if k in text or k in text_norm),
-        "market": sum(1 for k in MARKET_KEYWORDS if k in text or k in text_norm),
-    }
+    return router.route(message)[0]
+
+
+# ---------- Response cache ----------
+
+# Finished answers keyed on the normalized question and everything else that
+# shapes the answer. Entries are sized by their text so the cache is bounded
+# by memory rather than entry count.
+response_cache = TTLCache(
+    ttl=min(settings.RESPONSE_CACHE_TTL_SECONDS.values()),
+    max_entries=100_000,
+    name="orchestrator_response",
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    sizer=lambda entry: 256 + 2 * len(entry["response"]),
+)
+
+
+def _response_cache_key(message: str, city: str | None, language: str | None, channel: str, merge: str) -> tuple:
+    return (normalize_query(message), fold_text(city or ""), language or "", channel, merge, data_version())
+
 
-    agents = [name for name, score in scores.items() if score > 0]
+# City keys as they read in a normalized message ("saint-louis" -> "saint louis").
+_CITY_PHRASES = {key: f" {normalize_query(key)} " for key in settings.CITIES}
 
-    # If no keywords matched, default to agro (most common for farmers)
-    if not agents:
-        agents = ["agro"]
 
-    return agents
+def _mentioned_city(message: str) -> str | None:
+    """The known city a message names ("et à Touba ?" -> "touba"), if any."""
+    text = f" {normalize_query(message)} "
+    return next((key for key, phrase in _CITY_PHRASES.items() if phrase in text), None)
+
+
+def _response_ttl(agents: list[str]) -> float:
+    ttls = settings.RESPONSE_CACHE_TTL_SECONDS
+    return min(ttls.get(a, min(ttls.values())) for a in agents)
 
 
 # ---------- Synthesis prompt (used only for multi-agent) ----------
@@ -66,6 +66,15 @@ SYNTHESIS_PROMPT = """You synthesize responses from multiple agricultural agents
 - Respond in the specified language
 - Keep it concise and actionable"""
 
+SYNTHESIS_SYSTEM = cached_system(SYNTHESIS_PROMPT)
+
+# Sent when no agent produced an answer before the deadline.
+FALLBACK_RESPONSES = {
+    "fr": "Desole, le service est momentanement indisponible. Reessayez dans quelques instants.",
+    "en": "Sorry, the service is temporarily unavailable. Please try again in a moment.",
+    "wo": "Baal ma, sarwiis bi amul fi leegi. Jeemaatal ci kanam.",
+}
+
 
 async def orchestrate(
     message: str,
@@ -74,73 +83,341 @@ async def orchestrate(
     session_id: str | None = None,
     channel: str = "web",
     user_id: str | None = None,
+    timings: bool | None = None,
+    merge: str | None = None,
+    client: str | None = None,
 ) -> dict:
-    """Main orchestrator: fast keyword routing + parallel sub-agents."""
+    """Main orchestrator: fast keyword routing + parallel sub-agents.
 
-    # If user is logged in, enrich with profile data
-    if user_id and (not city or not language):
+    With ``timings`` (default: ``settings.TRACE_TIMINGS``) the metadata
+    carries a per-stage span breakdown of this request. ``merge`` picks how
+    several agents' answers are combined (default: ``settings.MERGE_STRATEGY``).
+    ``client`` (e.g. the caller's IP) keys LLM queue fairness for anonymous
+    callers without a session.
+    """
+    return await _orchestrate(message, city, language, session_id, channel, user_id, timings=timings, merge=merge, client=client)
+
+
+async def orchestrate_stream(
+    message: str,
+    city: str | None = None,
+    language: str | None = None,
+    session_id: str | None = None,
+    channel: str = "web",
+    user_id: str | None = None,
+    timings: bool | None = None,
+    merge: str | None = None,
+    client: str | None = None,
+) -> AsyncIterator[dict]:
+    """Streaming orchestrator: yields progress events as they happen.
+
+    Events: ``routing``, ``tool`` (start/done per tool call), ``token`` (text
+    deltas from the single agent's turns or from the synthesis call),
+    ``reset`` (drop the tokens received so far: they came from a turn that
+    called tools) and a final ``done`` carrying agents_used, language and
+    metadata.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run():
         try:
-            from services.supabase_service import get_supabase
-            sb = get_supabase()
-            profile = sb.table("profiles").select("city, preferred_language, zone").eq("id", user_id).single().execute()
-            if profile.data:
-                city = city or profile.data.get("city") or "kaolack"
-                language = language or profile.data.get("preferred_language") or "fr"
-        except Exception:
-            pass
+            result = await _orchestrate(
+                message, city, language, session_id, channel, user_id,
+                on_event=queue.put, timings=timings, merge=merge, client=client,
+            )
+            await queue.put({
+                "type": "done",
+                "agents_used": result["agents_used"],
+                "language": result["language"],
+                "metadata": result["metadata"],
+            })
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        await task
+    finally:
+        # Client went away mid-stream: stop the pipeline instead of orphaning it.
+        task.cancel()
+
+
+async def _enrich_from_profile(user_id: str, city: str | None, language: str | None) -> tuple[str | None, str | None]:
+    """If user is logged in, fill in missing city/language from their profile."""
+    try:
+        from services.user_data_service import get_profile
+        profile = await get_profile(user_id)
+        if profile:
+            city = city or profile.get("city") or "kaolack"
+            language = language or profile.get("preferred_language") or "fr"
+    except Exception:
+        pass
+    return city, language
+
+
+async def _orchestrate(
+    message: str,
+    city: str | None,
+    language: str | None,
+    session_id: str | None,
+    channel: str,
+    user_id: str | None,
+    on_event: EventCallback | None = None,
+    timings: bool | None = None,
+    merge: str | None = None,
+    client: str | None = None,
+) -> dict:
+    merge = merge if merge in STRATEGIES else settings.MERGE_STRATEGY
+    # SMS farmers get LLM capacity first; fairness is per user (or session,
+    # or client address for anonymous callers).
+    with llm_context(SMS if channel == "sms" else CHAT, user_id or session_id or client):
+        if not (settings.TRACE_TIMINGS if timings is None else timings):
+            return await _run_pipeline(message, city, language, session_id, channel, user_id, on_event, merge)
+        with tracing.collect() as trace:
+            result = await _run_pipeline(message, city, language, session_id, channel, user_id, on_event, merge)
+    result["metadata"]["timings"] = trace.summary()
+    return result
+
+
+async def _run_pipeline(
+    message: str,
+    city: str | None,
+    language: str | None,
+    session_id: str | None,
+    channel: str,
+    user_id: str | None,
+    on_event: EventCallback | None,
+    merge: str,
+) -> dict:
+    deadline = time.monotonic() + settings.REQUEST_DEADLINE_SECONDS.get(channel, settings.REQUEST_DEADLINE_SECONDS["web"])
+    # A city named in the message ("et à Touba ?") beats the selected one and
+    # the one the conversation was about.
+    city = _mentioned_city(message) or city
+    key = session = None
+    if session_id:
+        key = session_key(session_id, channel, user_id)
+        with tracing.span("stage", stage="session"):
+            session = await sessions.load(key) or new_session()
+        city = city or session["city"]
+
+    if user_id and (not city or not language):
+        with tracing.span("stage", stage="profile"):
+            city, language = await _enrich_from_profile(user_id, city, language)
+
+    metadata = {
+        "session_id": session_id,
+        "city": city,
+        "channel": channel,
+    }
+
+    with tracing.span("stage", stage="routing"):
+        routed_agents, confidence = router.route(message)
+    # A follow-up with no keywords of its own ("et à Touba ?") goes to the
+    # agents that answered the previous turn.
+    follow_up = bool(session and session["turns"] and session["agents"] and not any(confidence.values()))
+    if follow_up:
+        routed_agents = session["agents"]
+        metadata["follow_up"] = True
+    turns = history(session) if session else []
+
+    # Follow-ups depend on their conversation and bypass the shared response
+    # cache; other questions may be served from it, but an answer generated
+    # with history is not stored there.
+    cache_key = None
+    if settings.RESPONSE_CACHE_ENABLED and not follow_up:
+        with tracing.span("stage", stage="cache"):
+            cache_key = _response_cache_key(message, city, language, channel, merge)
+            cached = response_cache.lookup(cache_key)
+        if cached is not None:
+            if on_event:
+                await on_event({"type": "routing", "agents": cached["agents_used"]})
+                await on_event({"type": "token", "text": cached["response"]})
+            if session is not None:
+                record_turn(session, message, cached["response"], cached["agents_used"], city)
+                await sessions.save(key, session)
+            return {**cached, "metadata": {**metadata, "cache": "hit"}}
+        if turns:
+            cache_key = None
 
     lang = language or "en"
-    routed_agents = _fast_route(message)
+    metadata["routing"] = confidence
+    if on_event:
+        await on_event({"type": "routing", "agents": routed_agents})
+
+    memo = ToolMemo(session["tools"]) if session is not None else None
+
+    # A lone agent streams its own tokens; with several, only the synthesis
+    # call streams and the agents report tool progress.
+    stream_agent = len(routed_agents) == 1
+    agent_streamed: list[str] = []
+    agent_on_event = on_event
+    if stream_agent and on_event:
+        async def agent_on_event(event: dict) -> None:
+            if event["type"] == "token":
+                agent_streamed.append(event["text"])
+            elif event["type"] == "reset":
+                agent_streamed.clear()
+            await on_event(event)
 
     # Run all routed agents in parallel
-    tasks = []
+    tasks = {}
     for agent_name in routed_agents:
+        kwargs = {
+            "language": lang,
+            "channel": channel,
+            "on_event": agent_on_event,
+            "stream": stream_agent,
+            "history": turns,
+            "memo": memo,
+        }
         if agent_name == "weather":
-            tasks.append(run_weather_agent(message, city=city, language=lang, channel=channel))
+            tasks[agent_name] = _traced_agent(agent_name, run_weather_agent(message, city=city, **kwargs))
         elif agent_name == "agro":
-            tasks.append(run_agro_agent(message, language=lang, channel=channel))
+            tasks[agent_name] = _traced_agent(agent_name, run_agro_agent(message, **kwargs))
         elif agent_name == "market":
-            tasks.append(run_market_agent(message, language=lang, channel=channel))
+            tasks[agent_name] = _traced_agent(agent_name, run_market_agent(message, **kwargs))
 
-    results = await asyncio.gather(*tasks)
+    # Agents get the request deadline minus time for a possible synthesis call.
+    reserve = settings.SYNTHESIS_RESERVE_SECONDS if len(tasks) > 1 and merge != "structured" else 0.0
+    results, failed, cancelled = await _run_agents(tasks, deadline - reserve - time.monotonic())
+    if failed:
+        metadata["agents_failed"] = {name: _describe(e) for name, e in failed.items()}
+    if cancelled:
+        metadata["agents_cancelled"] = cancelled
+    partial = bool(failed or cancelled)
 
     agents_used = [r.get("agent", "unknown") for r in results]
+    usage: dict = {}
+    for r in results:
+        add_usage(usage, r.get("usage", {}))
 
-    # Single agent → return directly (skip synthesis LLM call)
-    if len(results) == 1:
+    if not results and agent_streamed:
+        # The lone agent was stopped mid-answer: keep what the client already
+        # has rather than appending an apology to it.
+        text = "".join(agent_streamed)
+    elif not results:
+        # Nothing usable: surface overload as 429/503, anything else as a
+        # short apology rather than a 500.
+        if failed and all(isinstance(e, LLMOverloaded) for e in failed.values()):
+            raise next(iter(failed.values()))
+        text = FALLBACK_RESPONSES.get(lang, FALLBACK_RESPONSES["fr"])
+        if on_event:
+            await on_event({"type": "token", "text": text})
+    elif len(results) == 1:
+        # Single agent → return directly (skip synthesis LLM call)
         text = results[0].get("response", "")
+        if on_event and not stream_agent:
+            await on_event({"type": "token", "text": text})
     else:
-        # Multiple agents → synthesize with one fast LLM call
-        lang_label = {"en": "English", "fr": "French", "wo": "Wolof"}.get(lang, lang)
-        parts = []
-        for r in results:
-            parts.append(f"[{r.get('agent', 'agent')}]: {r.get('response', '')}")
-        synthesis_input = "\n\n".join(parts)
-        synthesis_input += f"\n\n[Language: {lang_label}]"
-
-        response = await client.messages.create(
-            model=settings.ANTHROPIC_MODEL_FAST,
-            max_tokens=1024,
-            system=SYNTHESIS_PROMPT,
-            messages=[{"role": "user", "content": synthesis_input}],
-        )
-        text = ""
-        for block in response.content:
-            if hasattr(block, "text"):
-                text += block.text
+        # Multiple agents → one section each, or one fast LLM call when asked
+        # for or when their advice conflicts
+        strategy, conflicts = choose_strategy(merge, results)
+        metadata["merge"] = strategy
+        if conflicts:
+            metadata["conflicts"] = conflicts
+        if strategy == "structured":
+            with tracing.span("stage", stage="merge"):
+                text = merge_sections(results, lang, channel)
+            if on_event:
+                await on_event({"type": "token", "text": text})
+        else:
+            lang_label = {"en": "English", "fr": "French", "wo": "Wolof"}.get(lang, lang)
+            parts = []
+            for r in results:
+                parts.append(f"[{r.get('agent', 'agent')}]: {r.get('response', '')}")
+            synthesis_input = "\n\n".join(parts)
+            synthesis_input += f"\n\n[Language: {lang_label}]"
+
+            streamed = []
+
+            async def forward(event: dict) -> None:
+                streamed.append(event)
+                await on_event(event)
+
+            try:
+                with tracing.span("stage", stage="synthesis"):
+                    response = await asyncio.wait_for(
+                        create_message(
+                            on_token=forward if on_event else None,
+                            model=settings.ANTHROPIC_MODEL_FAST,
+                            max_tokens=1024,
+                            system=SYNTHESIS_SYSTEM,
+                            messages=[{"role": "user", "content": synthesis_input}],
+                        ),
+                        timeout=max(deadline - time.monotonic(), 1.0),
+                    )
+                text = response_text(response)
+                add_usage(usage, usage_dict(response))
+            except Exception as e:
+                # Keep what was already streamed, else fall back to the agents'
+                # own answers, one section each.
+                metadata["synthesis_failed"] = _describe(e)
+                partial = True
+                text = "".join(event["text"] for event in streamed)
+                if not text:
+                    text = merge_sections(results, lang, channel)
+                    if on_event:
+                        await on_event({"type": "token", "text": text})
 
     detected_lang = language or _detect_language(text)
 
-    return {
+    result = {
         "response": text,
         "language": detected_lang,
         "agents_used": list(set(agents_used)),
-        "metadata": {
-            "session_id": session_id,
-            "city": city,
-            "channel": channel,
-        },
     }
+    if partial:
+        metadata["partial"] = True
+    elif cache_key is not None and text:
+        response_cache.set(cache_key, result, ttl=_response_ttl(result["agents_used"]))
+        metadata["cache"] = "miss"
+    if session is not None and results:
+        record_turn(session, message, text, result["agents_used"], city, memo)
+        await sessions.save(key, session)
+        metadata["session"] = {"turns": len(session["turns"]) // 2, "tools_reused": memo.reused}
+    metadata["usage"] = usage
+    return {**result, "metadata": metadata}
+
+
+async def _run_agents(
+    agents: dict[str, Awaitable[dict]], timeout: float
+) -> tuple[list[dict], dict[str, Exception], list[str]]:
+    """Run agents concurrently for at most ``timeout`` seconds.
+
+    Returns the results of those that finished in time (in routing order),
+    the exception of each one that failed, and the names of the laggards,
+    which are cancelled.
+    """
+    tasks = {name: asyncio.ensure_future(run) for name, run in agents.items()}
+    try:
+        await asyncio.wait(tasks.values(), timeout=max(timeout, 0.0))
+    finally:
+        pending = [t for t in tasks.values() if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results, failed, cancelled = [], {}, []
+    for name, task in tasks.items():
+        if task.cancelled():
+            cancelled.append(name)
+        elif task.exception() is not None:
+            logger.warning("Agent %s failed: %s", name, _describe(task.exception()))
+            failed[name] = task.exception()
+        else:
+            results.append(task.result())
+    return results, failed, cancelled
+
+
+def _describe(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+async def _traced_agent(name: str, run: Awaitable[dict]) -> dict:
+    with tracing.span("stage", stage=f"agent.{name}"):
+        return await run
 
 
 def _detect_language(text: str) -> str:
@@ -0,0 +1,121 @@
+import re
+
+from text_utils import fold_text
+
+# ---------- Keyword-based fast routing (no LLM call) ----------
+# Keywords are written accent-free (messages are folded with unicodedata
+# before matching) and only match whole words, so "mil" no longer fires on
+# "family" nor "sol" on "solution". A trailing "*" allows any word ending
+# ("pluie*" matches "pluies", "plant*" matches "plantation").
+# Weights: 2 = unambiguous topic word, 1 = strong hint, 0.5 = weak hint that
+# only counts alongside other evidence (crop names, ambiguous words).
+
+WEATHER_KEYWORDS = {
+    "weather": 2, "meteo": 2, "taw": 2, "pluie*": 2, "pleut": 2, "rain*": 2,
+    "temperature*": 1, "vent*": 1, "wind*": 1, "forecast*": 2, "prevision*": 2,
+    "irrigation": 1, "irriguer": 1, "arroser": 1, "arrosage": 1, "ndox": 1,
+    "nawet": 1, "noor": 1, "lolli": 1, "secheresse": 2, "drought": 2,
+    "inondation*": 2, "flood*": 2, "chaleur": 1, "heat": 1, "humidite": 1,
+    "humidity": 1, "soleil": 1, "sun": 1, "sunny": 1, "nuage*": 1, "cloud*": 1,
+    "orage*": 2, "storm*": 2,
+}
+
+AGRO_KEYWORDS = {
+    "plant*": 1, "semer": 1, "semis": 1, "seme": 1, "sow": 1, "sowing": 1,
+    "crop*": 1, "culture*": 1, "recolte*": 1, "harvest*": 1, "maladie*": 2,
+    "disease*": 2, "ravageur*": 2, "pest": 2, "pests": 2, "insecte*": 1,
+    "chenille*": 2, "feuille*": 1, "leaf": 1, "leaves": 1, "tache*": 1,
+    "spot": 1, "spots": 1, "variete*": 1, "variety": 1, "varieties": 1,
+    "semence*": 1, "seed*": 1, "engrais": 2, "fertiliz*": 2, "fertilis*": 2,
+    "sol": 1, "sols": 1, "soil*": 1, "calendrier": 1, "calendar": 1,
+    "bey": 1, "suuf": 1, "diagnos*": 2, "traitement*": 1, "traiter": 1,
+    "treatment*": 1, "rotation": 1, "compost*": 1, "neem": 1, "bio": 1,
+    "biologique": 1,
+    # Crop names: weak on their own ("prix arachide" is a market question)
+    "arachide*": 0.5, "gerte": 0.5, "mil": 0.5, "dugub": 0.5, "riz": 0.5,
+    "malo": 0.5, "mais": 0.5, "mbaxal": 0.5, "niebe": 0.5, "tomate*": 0.5,
+    "tamaate": 0.5, "oignon*": 0.5, "soble": 0.5, "mangue*": 0.5, "coton": 0.5,
+}
+
+MARKET_KEYWORDS = {
+    "prix": 2, "price*": 2, "marche": 2, "marches": 2, "market*": 2,
+    "vendre": 1, "vente*": 1, "vends": 1, "sell*": 1, "acheter": 1, "achat*": 1,
+    "buy*": 1, "fcfa": 2, "cfa": 2, "tendance*": 1, "trend*": 1, "cours": 0.5,
+    "njeg": 2, "cout*": 1, "cost*": 1, "revenu*": 1, "revenue*": 1,
+    "stockage": 1, "storage": 1, "transport*": 1, "benefice*": 1, "profit*": 1,
+    "sandaga": 2, "thiaroye": 2,
+}
+
+AGENT_KEYWORDS = {
+    "weather": WEATHER_KEYWORDS,
+    "agro": AGRO_KEYWORDS,
+    "market": MARKET_KEYWORDS,
+}
+
+# An agent is routed when its score reaches MIN_SCORE and at least
+# RELATIVE_MIN of the best agent's score.
+MIN_SCORE = 1.0
+RELATIVE_MIN = 0.4
+DEFAULT_AGENT = "agro"  # most common need for farmers
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class KeywordRouter:
+    """Keyword tables compiled into word-level lookup tables.
+
+    The folded message is split into words once; each word is looked up in
+    a dict of exact keywords, then by prefix in one dict per stem length.
+    Scores are the summed weights of the distinct keywords matched per agent.
+    """
+
+    def __init__(self, tables: dict[str, dict[str, float]]):
+        self.agents = list(tables)
+        self._keywords: list[tuple[str, float]] = []
+        self._exact: dict[str, int] = {}
+        stems: dict[int, dict[str, int]] = {}
+        for agent, table in tables.items():
+            for keyword, weight in table.items():
+                index = len(self._keywords)
+                self._keywords.append((agent, weight))
+                if keyword.endswith("*"):
+                    stem = keyword[:-1]
+                    stems.setdefault(len(stem), {})[stem] = index
+                else:
+                    self._exact[keyword] = index
+        # Longest stem first so "prevision*" wins over a shorter stem.
+        self._stems = sorted(stems.items(), reverse=True)
+
+    def _match(self, word: str) -> int | None:
+        index = self._exact.get(word)
+        if index is not None:
+            return index
+        for length, table in self._stems:
+            if len(word) >= length:
+                index = table.get(word[:length])
+                if index is not None:
+                    return index
+        return None
+
+    def scores(self, message: str) -> dict[str, float]:
+        matched = {self._match(word) for word in _WORD_RE.findall(fold_text(message))}
+        matched.discard(None)
+        scores = dict.fromkeys(self.agents, 0.0)
+        for index in matched:
+            agent, weight = self._keywords[index]
+            scores[agent] += weight
+        return scores
+
+    def route(self, message: str) -> tuple[list[str], dict[str, float]]:
+        """Return (agents to run, per-agent confidence in [0, 1])."""
+        scores = self.scores(message)
+        total = sum(scores.values())
+        confidence = {a: round(s / total, 3) if total else 0.0 for a, s in scores.items()}
+        top = max(scores.values())
+        agents = [a for a, s in scores.items() if s >= MIN_SCORE and s >= RELATIVE_MIN * top]
+        if not agents:
+            agents = [DEFAULT_AGENT]
+        return agents, confidence
+
+
+router = KeywordRouter(AGENT_KEYWORDS)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+
+from config import settings
+from services import tracing
+from services.session_store import ToolMemo
+from agents.llm import (
+    CACHE_CONTROL,
+    EventCallback,
+    add_usage,
+    cached_system,
+    cached_tools,
+    create_message,
+    response_text,
+    usage_dict,
+)
+
+ToolExecutor = Callable[[str, dict], Awaitable[dict]]
+
+
+async def run_tool_loop(
+    agent: str,
+    system: str,
+    tools: list[dict],
+    execute_tool: ToolExecutor,
+    messages: list[dict],
+    on_event: EventCallback | None = None,
+    stream: bool = False,
+    model: str | None = None,
+    max_tokens: int = 512,
+    max_iterations: int | None = None,
+    turn_timeout: float | None = None,
+    memo: ToolMemo | None = None,
+) -> dict:
+    """Shared tool-use loop for the sub-agents.
+
+    Each turn calls the model; every ``tool_use`` block in the reply runs
+    concurrently and the results go back in one user message. A tool that
+    raises or overruns the turn deadline returns an ``is_error`` result
+    instead of failing the agent. After ``max_iterations`` tool turns the
+    model must answer with what it has (``tool_choice: none``). Each turn
+    (model call + its tools) must finish within ``turn_timeout`` seconds.
+    With a session ``memo``, a tool already run with the same input in an
+    earlier turn returns that result instead of running again.
+
+    With ``stream``, every turn's text deltas go out as ``token`` events as
+    they arrive. Text from a turn that ends in ``tool_use`` ("Je consulte la
+    météo...") is not part of the answer, so such a turn is followed by a
+    ``reset`` event telling the client to drop the tokens streamed so far;
+    the streamed text then matches the returned ``text``.
+
+    The tools and system prompt carry prompt-cache breakpoints, and the
+    latest tool_result block carries a rolling one, so each extra turn reads
+    the conversation so far from cache instead of re-processing it.
+
+    Returns the final text, the number of model calls, per-tool timings and
+    summed token usage (including cache read/write tokens).
+    """
+    model = model or settings.ANTHROPIC_MODEL_FAST
+    max_iterations = settings.AGENT_MAX_ITERATIONS if max_iterations is None else max_iterations
+    turn_timeout = settings.AGENT_TURN_TIMEOUT if turn_timeout is None else turn_timeout
+    tool_timings: list[dict] = []
+    usage: dict = {}
+    system_blocks = cached_system(system)
+    tool_defs = cached_tools(tools)
+    breakpoint_block: dict | None = None
+
+    async def run_tool(block, deadline: float) -> dict:
+        if on_event:
+            await on_event({"type": "tool", "agent": agent, "name": block.name, "status": "start"})
+        started = time.perf_counter()
+        is_error = False
+        result = memo.get(block.name, block.input) if memo is not None else None
+        reused = result is not None
+        if not reused:
+            try:
+                remaining = max(deadline - time.monotonic(), 0.0)
+                result = await asyncio.wait_for(execute_tool(block.name, block.input), timeout=remaining)
+                if memo is not None:
+                    memo.put(block.name, block.input, result)
+            except asyncio.TimeoutError:
+                is_error = True
+                result = {"error": f"Tool {block.name} timed out"}
+            except Exception as e:
+                is_error = True
+                result = {"error": f"{type(e).__name__}: {e}"}
+        elapsed = time.perf_counter() - started
+        status = "error" if is_error else "reused" if reused else "ok"
+        tool_timings.append({"tool": block.name, "ms": round(elapsed * 1000, 1), "ok": not is_error, **({"reused": True} if reused else {})})
+        tracing.record("tool", elapsed, started=started, agent=agent, tool=block.name, status=status)
+        if on_event:
+            await on_event({"type": "tool", "agent": agent, "name": block.name, "status": "error" if is_error else "done"})
+        tool_result = {
+            "type": "tool_result",
+            "tool_use_id": block.id,
+            "content": json.dumps(result, ensure_ascii=False),
+        }
+        if is_error:
+            tool_result["is_error"] = True
+        return tool_result
+
+    streamed = False
+
+    async def forward(event: dict) -> None:
+        nonlocal streamed
+        streamed = True
+        await on_event(event)
+
+    iterations = 0
+    while True:
+        deadline = time.monotonic() + turn_timeout
+        kwargs = {}
+        if iterations >= max_iterations:
+            kwargs["tool_choice"] = {"type": "none"}
+        response = await asyncio.wait_for(
+            create_message(
+                on_token=forward if stream and on_event else None,
+                model=model,
+                max_tokens=max_tokens,
+                system=system_blocks,
+                tools=tool_defs,
+                messages=messages,
+                **kwargs,
+            ),
+            timeout=turn_timeout,
+        )
+        iterations += 1
+        add_usage(usage, usage_dict(response))
+        if response.stop_reason != "tool_use":
+            break
+        if streamed:
+            streamed = False
+            await on_event({"type": "reset", "agent": agent})
+
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+        tool_results = list(await asyncio.gather(*(run_tool(block, deadline) for block in tool_blocks)))
+
+        # Move the conversation breakpoint forward (the API allows 4 in total).
+        if breakpoint_block is not None:
+            breakpoint_block.pop("cache_control", None)
+        breakpoint_block = tool_results[-1]
+        breakpoint_block["cache_control"] = CACHE_CONTROL
+
+        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "user", "content": tool_results})
+
+    return {
+        "text": response_text(response),
+        "iterations": iterations,
+        "tool_timings": tool_timings,
+        "usage": usage,
+    }
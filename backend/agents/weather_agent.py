@@ -1,14 +1,12 @@
-import json
-import anthropic
-from config import settings
+from agents.llm import EventCallback
+from agents.runtime import run_tool_loop
+from services.session_store import ToolMemo
 from services.weather_service import get_weather_forecast, format_weather_code
 
-client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-
 WEATHER_TOOLS = [
     {
         "name": "get_forecast",
-        "description": "Get 7-day weather forecast for any city worldwide. Returns temperature, precipitation, wind data.",
+        "description": "Get 7-day weather forecast for any city worldwide. Returns temperature, precipitation, wind data, plus precomputed agro indicators: growing degree days per crop, disease-risk hours, dry-spell length and the 30mm sowing-rain trigger.",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -46,6 +44,7 @@ REGLES:
 - Relie toujours la météo à l'agriculture (ex: "pas de pluie = arrosez vos cultures")
 - Adapte tes conseils au climat local de la ville/région demandée
 - Si le canal est SMS, sois ultra-concis (max 300 caractères)
+- Utilise les indicateurs fournis par get_forecast (degrés-jours, heures à risque de maladie, jours secs, seuil de semis 30mm) au lieu de les recalculer
 
 CONTEXTE CLIMATIQUE GLOBAL:
 - Zone tropicale: saison des pluies / saison sèche
@@ -56,7 +55,16 @@ CONTEXTE CLIMATIQUE GLOBAL:
 """
 
 
-async def run_weather_agent(query: str, city: str | None = None, language: str = "fr", channel: str = "web") -> dict:
+async def run_weather_agent(
+    query: str,
+    city: str | None = None,
+    language: str = "fr",
+    channel: str = "web",
+    on_event: EventCallback | None = None,
+    stream: bool = False,
+    history: list[dict] | None = None,
+    memo: ToolMemo | None = None,
+) -> dict:
     """Run the weather agent to answer a weather-related query."""
     user_message = query
     if city:
@@ -65,49 +73,23 @@ async def run_weather_agent(query: str, city: str | None = None, language: str =
     user_message += f"\n[Langue: {lang_label}]"
     user_message += f"\n[Canal: {channel}]"
 
-    messages = [{"role": "user", "content": user_message}]
-
-    response = await client.messages.create(
-        model=settings.ANTHROPIC_MODEL_FAST,
-        max_tokens=512,
+    result = await run_tool_loop(
+        agent="weather",
         system=SYSTEM_PROMPT,
         tools=WEATHER_TOOLS,
-        messages=messages,
+        execute_tool=_execute_weather_tool,
+        messages=[*(history or []), {"role": "user", "content": user_message}],
+        on_event=on_event,
+        stream=stream,
+        memo=memo,
     )
 
-    # Handle tool use loop
-    while response.stop_reason == "tool_use":
-        tool_results = []
-        for block in response.content:
-            if block.type == "tool_use":
-                result = await _execute_weather_tool(block.name, block.input)
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": block.id,
-                    "content": json.dumps(result, ensure_ascii=False),
-                })
-
-        messages.append({"role": "assistant", "content": response.content})
-        messages.append({"role": "user", "content": tool_results})
-
-        response = await client.messages.create(
-            model=settings.ANTHROPIC_MODEL_FAST,
-            max_tokens=512,
-            system=SYSTEM_PROMPT,
-            tools=WEATHER_TOOLS,
-            messages=messages,
-        )
-
-    # Extract text response
-    text = ""
-    for block in response.content:
-        if hasattr(block, "text"):
-            text += block.text
-
     return {
         "agent": "weather",
-        "response": text,
+        "response": result["text"],
         "language": language,
+        "tool_timings": result["tool_timings"],
+        "usage": result["usage"],
     }
 
 
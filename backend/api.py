@@ -1,17 +1,25 @@
 import json
-import asyncio
 import base64
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-import anthropic
 
-from agents.orchestrator import orchestrate, _fast_route
-from services.weather_service import get_weather_forecast
+from agents.orchestrator import orchestrate, orchestrate_stream, response_cache
+from services.weather_service import (
+    ForecastUnavailable, forecast_cache_stats, forecast_store_stats, get_weather_forecast, get_weather_forecasts,
+)
 from services.sms_service import handle_incoming_sms
+from agents.llm import cached_system, create_message, response_text, usage_dict
 from config import settings
-from auth import get_optional_user
+from auth import get_optional_user, token_cache
+from services.payloads import static_response
+from services.user_data_service import user_cache
+from services.session_store import sessions
+from services.llm_scheduler import LLMOverloaded, scheduler
+from services.image_service import (
+    ImageTooLarge, diagnosis_cache, known_image, prepare_image_async, read_upload, upload_digest,
+)
 
 router = APIRouter()
 
@@ -21,6 +29,8 @@ class ChatRequest(BaseModel):
     city: Optional[str] = None
     language: Optional[str] = None  # "fr" or "wo" or "en"
     session_id: Optional[str] = None
+    timings: Optional[bool] = None  # per-stage timing breakdown in metadata
+    merge: Optional[str] = None  # "llm", "structured" or "auto" (multi-agent answers)
 
 
 class ChatResponse(BaseModel):
@@ -35,9 +45,18 @@ class SMSRequest(BaseModel):
     Body: str
 
 
+def _client_address(request: Request) -> str | None:
+    """The caller's IP (first X-Forwarded-For hop behind the App Engine
+    front end). Only a fairness key for anonymous LLM callers, not trusted."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip() or None
+    return request.client.host if request.client else None
+
+
 # --- Chat endpoint (main) ---
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, user_id: str | None = Depends(get_optional_user)):
+async def chat(req: ChatRequest, request: Request, user_id: str | None = Depends(get_optional_user)):
     try:
         result = await orchestrate(
             message=req.message,
@@ -45,38 +64,35 @@ async def chat(req: ChatRequest, user_id: str | None = Depends(get_optional_user
             language=req.language,
             session_id=req.session_id,
             user_id=user_id,
+            timings=req.timings,
+            merge=req.merge,
+            client=_client_address(request),
         )
         return result
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # --- Streaming chat endpoint (SSE) ---
 @router.post("/chat/stream")
-async def chat_stream(req: ChatRequest, user_id: str | None = Depends(get_optional_user)):
+async def chat_stream(req: ChatRequest, request: Request, user_id: str | None = Depends(get_optional_user)):
     async def event_stream():
         try:
-            routed = _fast_route(req.message)
-            yield f"data: {json.dumps({'type': 'routing', 'agents': routed})}\n\n"
-
-            result = await orchestrate(
+            async for event in orchestrate_stream(
                 message=req.message,
                 city=req.city,
                 language=req.language,
                 session_id=req.session_id,
                 user_id=user_id,
-            )
-
-            text = result["response"]
-            words = text.split(" ")
-            for i in range(0, len(words), 3):
-                chunk = " ".join(words[i : i + 3])
-                if i + 3 < len(words):
-                    chunk += " "
-                yield f"data: {json.dumps({'type': 'token', 'text': chunk})}\n\n"
-                await asyncio.sleep(0.02)
-
-            yield f"data: {json.dumps({'type': 'done', 'agents_used': result['agents_used'], 'language': result.get('language', 'en')})}\n\n"
+                timings=req.timings,
+                merge=req.merge,
+                client=_client_address(request),
+            ):
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except LLMOverloaded as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': e.detail, 'status': e.status_code, 'retry_after': e.retry_after})}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
 
@@ -87,7 +103,29 @@ async def chat_stream(req: ChatRequest, user_id: str | None = Depends(get_option
     )
 
 
-# --- Weather endpoint ---
+# --- Weather endpoints ---
+MAX_BULK_CITIES = 200
+
+
+@router.get("/weather")
+async def weather_bulk(cities: Optional[str] = None):
+    """Forecasts for several cities (comma-separated keys, default: all known cities)."""
+    keys = [c.strip().lower() for c in cities.split(",") if c.strip()] if cities else list(settings.CITIES)
+    if len(keys) > MAX_BULK_CITIES:
+        raise HTTPException(status_code=400, detail=f"Too many cities (max {MAX_BULK_CITIES})")
+    unknown = [k for k in keys if k not in settings.CITIES]
+    known = [k for k in keys if k in settings.CITIES]
+    if not known:
+        raise HTTPException(status_code=404, detail=f"Villes inconnues: {', '.join(unknown)}")
+    try:
+        forecasts = await get_weather_forecasts(known)
+    except ForecastUnavailable as e:
+        raise _forecast_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"forecasts": forecasts, "unknown": unknown}
+
+
 @router.get("/weather/{city}")
 async def weather(city: str):
     try:
@@ -95,16 +133,39 @@ async def weather(city: str):
         return data
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except ForecastUnavailable as e:
+        raise _forecast_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _forecast_unavailable(e: ForecastUnavailable) -> HTTPException:
+    retry_after = str(settings.WEATHER_REFRESH_RETRY_SECONDS)
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after})
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        "weather_forecast": forecast_cache_stats(),
+        "forecast_store": forecast_store_stats(),
+        "orchestrator_response": response_cache.stats(),
+        "verified_jwt": token_cache.stats(),
+        "user_data": user_cache.stats(),
+        "sessions": sessions.stats(),
+        "llm_scheduler": scheduler.stats(),
+        "diagnosis": diagnosis_cache.stats(),
+    }
+
+
 # --- SMS webhook ---
 @router.post("/sms/incoming")
 async def sms_incoming(req: SMSRequest):
     try:
         response = await handle_incoming_sms(req.From, req.Body)
         return response
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -123,8 +184,7 @@ Be specific, practical, and context-aware (local climate, available products, et
 Use markdown tables for structured data when appropriate.
 Respond in the language specified."""
 
-vision_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-
+DIAGNOSIS_SYSTEM = cached_system(DIAGNOSIS_PROMPT)
 
 @router.post("/diagnose")
 async def diagnose_crop(
@@ -132,16 +192,31 @@ async def diagnose_crop(
     language: str = Form("en"),
 ):
     try:
-        image_data = await image.read()
-        b64 = base64.b64encode(image_data).decode("utf-8")
+        data = await read_upload(image)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # A byte-identical re-upload with a cached diagnosis skips decoding.
+    digest = await upload_digest(data)
+    known = known_image(digest)
+    if known is not None:
+        key, summary = known
+        cached = diagnosis_cache.lookup((key, language))
+        if cached is not None:
+            return _diagnosis_response(cached, language, summary, hit=True)
 
-        content_type = image.content_type or "image/jpeg"
-        if content_type not in ("image/jpeg", "image/png", "image/gif", "image/webp"):
-            content_type = "image/jpeg"
+    try:
+        prepared = await prepare_image_async(data, digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        lang_label = {"en": "English", "fr": "French", "wo": "Wolof"}.get(language, "English")
+    lang_label = {"en": "English", "fr": "French", "wo": "Wolof"}.get(language, "English")
+    loaded = False
 
-        response = await vision_client.messages.create(
+    async def diagnose() -> dict:
+        nonlocal loaded
+        loaded = True
+        response = await create_message(
             model=settings.ANTHROPIC_MODEL,
             max_tokens=1024,
             messages=[
@@ -152,8 +227,8 @@ async def diagnose_crop(
                             "type": "image",
                             "source": {
                                 "type": "base64",
-                                "media_type": content_type,
-                                "data": b64,
+                                "media_type": prepared.media_type,
+                                "data": base64.b64encode(prepared.data).decode("ascii"),
                             },
                         },
                         {
@@ -163,43 +238,49 @@ async def diagnose_crop(
                     ],
                 }
             ],
-            system=DIAGNOSIS_PROMPT,
+            system=DIAGNOSIS_SYSTEM,
         )
+        return {"diagnosis": response_text(response), "usage": usage_dict(response)}
 
-        text = ""
-        for block in response.content:
-            if hasattr(block, "text"):
-                text += block.text
-
-        return {
-            "diagnosis": text,
-            "language": language,
-            "agents_used": ["vision"],
-        }
+    try:
+        result = await diagnosis_cache.get_or_load((prepared.key, language), diagnose)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return _diagnosis_response(result, language, prepared.summary(), hit=not loaded)
+
+
+def _diagnosis_response(result: dict, language: str, image: dict, hit: bool) -> dict:
+    return {
+        "diagnosis": result["diagnosis"],
+        "language": language,
+        "agents_used": ["vision"],
+        # A cached diagnosis cost nothing this time.
+        "usage": {} if hit else result["usage"],
+        "cache": "hit" if hit else "miss",
+        "image": image,
+    }
 
 
 # --- Data endpoints ---
+# Pre-serialized and compressed once per data version (services/payloads.py);
+# ?fields=name_fr,name_wo keeps only those fields in each record.
 @router.get("/crops")
-async def list_crops():
-    from data_loader import load_crops
-    return load_crops()
+async def list_crops(request: Request, fields: Optional[str] = None):
+    return static_response(request, "crops", fields)
 
 
 @router.get("/markets")
-async def list_markets():
-    from data_loader import load_markets
-    return load_markets()
+async def list_markets(request: Request, fields: Optional[str] = None):
+    return static_response(request, "markets", fields)
 
 
 @router.get("/zones")
-async def list_zones():
-    from data_loader import load_zones
-    return load_zones()
+async def list_zones(request: Request, fields: Optional[str] = None):
+    return static_response(request, "zones", fields)
 
 
 @router.get("/cities")
-async def list_cities():
-    from config import settings
-    return settings.CITIES
+async def list_cities(request: Request, fields: Optional[str] = None):
+    return static_response(request, "cities", fields)
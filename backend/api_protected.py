@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from pydantic import BaseModel
 from typing import Optional
 from datetime import date
 
-from auth import get_current_user
+from auth import get_current_user, require_job_token
+from services.calendar_service import zone_calendar
+from services.jobs import jobs, public_view
+from services.payloads import REVALIDATE, etag_matches
 from services.supabase_service import get_supabase
+from services import user_data_service as user_data
+from services.user_data_service import CULTURES, PARCELLES, PROFILE
 from data_loader import load_crops, load_zones
 
 router = APIRouter()
@@ -85,20 +90,20 @@ class HistoryUpdate(BaseModel):
 
 @router.get("/me")
 async def get_profile(user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    result = sb.table("profiles").select("*").eq("id", user_id).single().execute()
-    if not result.data:
+    profile = await user_data.get_profile(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-    return result.data
+    return profile
 
 
 @router.put("/me")
 async def update_profile(data: ProfileUpdate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
-    result = sb.table("profiles").update(update_data).eq("id", user_id).execute()
+    result = await sb.table("profiles").update(update_data).eq("id", user_id).execute()
+    user_data.invalidate(user_id, PROFILE)
     return result.data[0] if result.data else {}
 
 
@@ -106,36 +111,36 @@ async def update_profile(data: ProfileUpdate, user_id: str = Depends(get_current
 
 @router.get("/parcelles")
 async def list_parcelles(user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    result = sb.table("parcelles").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-    return result.data
+    return await user_data.get_parcelles(user_id)
 
 
 @router.post("/parcelles")
 async def create_parcelle(data: ParcelleCreate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     row = {"user_id": user_id, **data.model_dump(exclude_none=True)}
-    result = sb.table("parcelles").insert(row).execute()
+    result = await sb.table("parcelles").insert(row).execute()
+    user_data.invalidate(user_id, PARCELLES)
     return result.data[0]
 
 
 @router.get("/parcelles/{parcelle_id}")
 async def get_parcelle(parcelle_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    parcelle = sb.table("parcelles").select("*").eq("id", parcelle_id).eq("user_id", user_id).single().execute()
+    sb = await get_supabase()
+    parcelle = await sb.table("parcelles").select("*").eq("id", parcelle_id).eq("user_id", user_id).single().execute()
     if not parcelle.data:
         raise HTTPException(status_code=404, detail="Parcelle not found")
-    cultures = sb.table("cultures").select("*").eq("parcelle_id", parcelle_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+    cultures = await sb.table("cultures").select("*").eq("parcelle_id", parcelle_id).eq("user_id", user_id).order("created_at", desc=True).execute()
     return {**parcelle.data, "cultures": cultures.data}
 
 
 @router.put("/parcelles/{parcelle_id}")
 async def update_parcelle(parcelle_id: str, data: ParcelleUpdate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
-    result = sb.table("parcelles").update(update_data).eq("id", parcelle_id).eq("user_id", user_id).execute()
+    result = await sb.table("parcelles").update(update_data).eq("id", parcelle_id).eq("user_id", user_id).execute()
+    user_data.invalidate(user_id, PARCELLES)
     if not result.data:
         raise HTTPException(status_code=404, detail="Parcelle not found")
     return result.data[0]
@@ -143,8 +148,10 @@ async def update_parcelle(parcelle_id: str, data: ParcelleUpdate, user_id: str =
 
 @router.delete("/parcelles/{parcelle_id}")
 async def delete_parcelle(parcelle_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    sb.table("parcelles").delete().eq("id", parcelle_id).eq("user_id", user_id).execute()
+    sb = await get_supabase()
+    await sb.table("parcelles").delete().eq("id", parcelle_id).eq("user_id", user_id).execute()
+    # Cultures go with their parcelle (ON DELETE CASCADE)
+    user_data.invalidate(user_id, PARCELLES, CULTURES)
     return {"ok": True}
 
 
@@ -156,48 +163,47 @@ async def list_cultures(
     status: Optional[str] = None,
     user_id: str = Depends(get_current_user),
 ):
-    sb = get_supabase()
-    query = sb.table("cultures").select("*").eq("user_id", user_id)
-    if parcelle_id:
-        query = query.eq("parcelle_id", parcelle_id)
-    if status:
-        query = query.eq("status", status)
-    result = query.order("created_at", desc=True).execute()
-    return result.data
+    cultures = await user_data.get_cultures(user_id)
+    return [
+        c for c in cultures
+        if (not parcelle_id or c.get("parcelle_id") == parcelle_id) and (not status or c.get("status") == status)
+    ]
 
 
 @router.post("/cultures")
 async def create_culture(data: CultureCreate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     row = {"user_id": user_id, **data.model_dump(exclude_none=True)}
     # Convert date objects to ISO strings for Supabase
     for key in ("planting_date", "expected_harvest"):
         if key in row and isinstance(row[key], date):
             row[key] = row[key].isoformat()
-    result = sb.table("cultures").insert(row).execute()
+    result = await sb.table("cultures").insert(row).execute()
+    user_data.invalidate(user_id, CULTURES)
     return result.data[0]
 
 
 @router.get("/cultures/{culture_id}")
 async def get_culture(culture_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    culture = sb.table("cultures").select("*").eq("id", culture_id).eq("user_id", user_id).single().execute()
+    sb = await get_supabase()
+    culture = await sb.table("cultures").select("*").eq("id", culture_id).eq("user_id", user_id).single().execute()
     if not culture.data:
         raise HTTPException(status_code=404, detail="Culture not found")
-    history = sb.table("season_history").select("*").eq("culture_id", culture_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+    history = await sb.table("season_history").select("*").eq("culture_id", culture_id).eq("user_id", user_id).order("created_at", desc=True).execute()
     return {**culture.data, "history": history.data}
 
 
 @router.put("/cultures/{culture_id}")
 async def update_culture(culture_id: str, data: CultureUpdate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     for key in ("planting_date", "expected_harvest", "actual_harvest_date"):
         if key in update_data and isinstance(update_data[key], date):
             update_data[key] = update_data[key].isoformat()
-    result = sb.table("cultures").update(update_data).eq("id", culture_id).eq("user_id", user_id).execute()
+    result = await sb.table("cultures").update(update_data).eq("id", culture_id).eq("user_id", user_id).execute()
+    user_data.invalidate(user_id, CULTURES)
     if not result.data:
         raise HTTPException(status_code=404, detail="Culture not found")
     return result.data[0]
@@ -205,8 +211,9 @@ async def update_culture(culture_id: str, data: CultureUpdate, user_id: str = De
 
 @router.delete("/cultures/{culture_id}")
 async def delete_culture(culture_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    sb.table("cultures").delete().eq("id", culture_id).eq("user_id", user_id).execute()
+    sb = await get_supabase()
+    await sb.table("cultures").delete().eq("id", culture_id).eq("user_id", user_id).execute()
+    user_data.invalidate(user_id, CULTURES)
     return {"ok": True}
 
 
@@ -217,29 +224,29 @@ async def list_history(
     culture_id: Optional[str] = None,
     user_id: str = Depends(get_current_user),
 ):
-    sb = get_supabase()
+    sb = await get_supabase()
     query = sb.table("season_history").select("*").eq("user_id", user_id)
     if culture_id:
         query = query.eq("culture_id", culture_id)
-    result = query.order("created_at", desc=True).execute()
+    result = await query.order("created_at", desc=True).execute()
     return result.data
 
 
 @router.post("/history")
 async def create_history(data: HistoryCreate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     row = {"user_id": user_id, **data.model_dump(exclude_none=True)}
-    result = sb.table("season_history").insert(row).execute()
+    result = await sb.table("season_history").insert(row).execute()
     return result.data[0]
 
 
 @router.put("/history/{history_id}")
 async def update_history(history_id: str, data: HistoryUpdate, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
+    sb = await get_supabase()
     update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
-    result = sb.table("season_history").update(update_data).eq("id", history_id).eq("user_id", user_id).execute()
+    result = await sb.table("season_history").update(update_data).eq("id", history_id).eq("user_id", user_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="History record not found")
     return result.data[0]
@@ -247,8 +254,8 @@ async def update_history(history_id: str, data: HistoryUpdate, user_id: str = De
 
 @router.delete("/history/{history_id}")
 async def delete_history(history_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    sb.table("season_history").delete().eq("id", history_id).eq("user_id", user_id).execute()
+    sb = await get_supabase()
+    await sb.table("season_history").delete().eq("id", history_id).eq("user_id", user_id).execute()
     return {"ok": True}
 
 
@@ -256,8 +263,8 @@ async def delete_history(history_id: str, user_id: str = Depends(get_current_use
 
 @router.get("/alerts")
 async def list_alerts(user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    result = (
+    sb = await get_supabase()
+    result = await (
         sb.table("alerts")
         .select("*")
         .eq("user_id", user_id)
@@ -270,109 +277,60 @@ async def list_alerts(user_id: str = Depends(get_current_user)):
 
 @router.put("/alerts/{alert_id}/read")
 async def mark_alert_read(alert_id: str, user_id: str = Depends(get_current_user)):
-    sb = get_supabase()
-    result = sb.table("alerts").update({"is_read": True}).eq("id", alert_id).eq("user_id", user_id).execute()
+    sb = await get_supabase()
+    result = await sb.table("alerts").update({"is_read": True}).eq("id", alert_id).eq("user_id", user_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Alert not found")
     return result.data[0]
 
 
-@router.post("/alerts/generate")
+@router.post("/alerts/generate", status_code=202)
 async def generate_alerts(user_id: str = Depends(get_current_user)):
+    """Start alert generation in the background; poll /alerts/jobs/{job_id}."""
     from agents.alerts_agent import generate_user_alerts
-    alerts = await generate_user_alerts(user_id)
-    return alerts
 
+    async def run(progress):
+        return await generate_user_alerts(user_id)
 
-# ─── Calendar ──────────────────────────────────────────────────
+    job = jobs.submit("alerts.user", run, owner=user_id, dedupe_key=f"alerts:{user_id}")
+    return public_view(job)
 
-MONTH_RECOMMENDATIONS_FR = {
-    1: "Recolte tomate et oignon. Stockage cereales. Preparation pepinieres.",
-    2: "Recolte tomate/oignon continue. Debut preparation des sols.",
-    3: "Preparation sols. Riz irrigue possible en Vallee du Fleuve.",
-    4: "Preparation sols intensive. Achat semences et intrants.",
-    5: "Debut semis arachide/mil/mais en zones precoces. Preparation pepinieres.",
-    6: "Semis toutes cultures pluviales: arachide, mil, riz, mais, niebe.",
-    7: "Croissance active. Surveillance ravageurs (chenille legionnaire). Desherbage.",
-    8: "Croissance. Recolte precoce mil. Traitement phytosanitaire si necessaire.",
-    9: "Recolte mil. Arachide/riz/mais en maturation. Surveillance marches.",
-    10: "Grandes recoltes: arachide, riz, niebe, mais. Vente ou stockage.",
-    11: "Fin recolte arachide. Debut saison seche. Preparation maraichage.",
-    12: "Stockage. Plantation tomate/oignon. Bilan saison et planification.",
-}
 
-MONTH_RECOMMENDATIONS_WO = {
-    1: "Natt tamaate ak soble. Teg cereale ci njeexe. Tegg pepiniyeer.",
-    2: "Natt tamaate/soble. Jotali suuf bi.",
-    3: "Jotali suuf. Riz irrigue ci Ganaar.",
-    4: "Jotali suuf bu meg. Jend mbuuru ak engere.",
-    5: "Door bey gerte/dugub/mbaxal. Tegg pepiniyeer.",
-    6: "Bey yeppa: gerte, dugub, malo, mbaxal, niebe.",
-    7: "Yokk. Saytu njuumte yi. Sotti njaxx.",
-    8: "Yokk. Natt dugub. Faral aartu ndimbal.",
-    9: "Natt dugub. Gerte/malo ci wettu. Saytu njeg.",
-    10: "Natt bu mag: gerte, malo, niebe, mbaxal. Jaay walla teg.",
-    11: "Jeex natt gerte. Door noor. Tegg ndar.",
-    12: "Teg. Bey tamaate/soble. Xool nawet bi te plan.",
-}
+@router.post("/alerts/generate-all", status_code=202, dependencies=[Depends(require_job_token)])
+async def generate_all_alerts():
+    """Fleet-wide alert run for every user with active cultures (scheduler)."""
+    from agents.alerts_agent import generate_alerts_batch
 
+    job = jobs.submit("alerts.batch", lambda progress: generate_alerts_batch(progress=progress), dedupe_key="alerts:all")
+    return public_view(job)
 
-@router.get("/calendar/{zone}")
-async def get_calendar(zone: str):
-    """Return monthly agricultural calendar data for a zone."""
-    crops = load_crops()
-    zones_data = load_zones()
 
-    zone_info = zones_data.get("zones", {}).get(zone)
-    zone_crops = zone_info["main_crops"] if zone_info else list(crops.keys())
-
-    months = []
-    for month_num in range(1, 13):
-        month_info = {
-            "month": month_num,
-            "recommendation_fr": MONTH_RECOMMENDATIONS_FR.get(month_num, ""),
-            "recommendation_wo": MONTH_RECOMMENDATIONS_WO.get(month_num, ""),
-            "crops": [],
-        }
-        for crop_key, crop in crops.items():
-            # Check if crop belongs to zone
-            crop_in_zone = (
-                crop_key in zone_crops
-                or crop.get("name_fr", "").lower() in zone_crops
-            )
-            if not crop_in_zone:
-                continue
-
-            activities = []
-            sowing = crop.get("sowing_month", [])
-            harvest = crop.get("harvest_month", [])
-
-            if month_num in sowing:
-                activities.append("sowing")
-            if month_num in harvest:
-                activities.append("harvest")
-
-            # Growing = between sowing and harvest, not sowing or harvest month
-            if sowing and harvest:
-                sow_end = max(sowing)
-                harvest_start = min(harvest)
-                if sow_end < month_num < harvest_start:
-                    activities.append("growing")
-
-            if activities:
-                month_info["crops"].append({
-                    "key": crop_key,
-                    "name_fr": crop.get("name_fr", crop_key),
-                    "name_wo": crop.get("name_wo", ""),
-                    "activities": activities,
-                })
-        months.append(month_info)
+@router.get("/alerts/generate-all/{job_id}", dependencies=[Depends(require_job_token)])
+async def get_batch_alert_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job or job["kind"] != "alerts.batch":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_view(job)
 
-    return {
-        "zone": zone,
-        "zone_info": zone_info,
-        "calendar": months,
-    }
+
+@router.get("/alerts/jobs/{job_id}")
+async def get_alert_job(job_id: str, user_id: str = Depends(get_current_user)):
+    job = jobs.get(job_id)
+    if not job or job["owner"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_view(job)
+
+
+# ─── Calendar ──────────────────────────────────────────────────
+
+@router.get("/calendar/{zone}")
+async def get_calendar(zone: str, if_none_match: str | None = Header(default=None)):
+    """Return monthly agricultural calendar data for a zone."""
+    body, etag = zone_calendar(zone)
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # ─── Rotation advice ──────────────────────────────────────────
@@ -391,15 +349,15 @@ ROTATION_RULES = {
 @router.get("/rotation/{parcelle_id}")
 async def get_rotation_advice(parcelle_id: str, user_id: str = Depends(get_current_user)):
     """Recommend next crop based on parcelle history."""
-    sb = get_supabase()
+    sb = await get_supabase()
 
     # Get parcelle
-    parcelle = sb.table("parcelles").select("*").eq("id", parcelle_id).eq("user_id", user_id).single().execute()
+    parcelle = await sb.table("parcelles").select("*").eq("id", parcelle_id).eq("user_id", user_id).single().execute()
     if not parcelle.data:
         raise HTTPException(status_code=404, detail="Parcelle not found")
 
     # Get cultures for this parcelle ordered by most recent
-    cultures = (
+    cultures = await (
         sb.table("cultures")
         .select("crop_key, status, planting_date")
         .eq("parcelle_id", parcelle_id)
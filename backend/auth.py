@@ -1,45 +1,85 @@
-from fastapi import Depends, HTTPException, status
+import hashlib
+import hmac
+import random
+import time
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from config import settings
+from services.cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer(auto_error=False)
 
 
+# ---------- Verified-token cache ----------
+# Dashboards fire several calls in parallel with the same bearer token; a
+# token whose signature was checked once is trusted until its own ``exp``.
+# Keys are SHA-256 digests so raw tokens are never held in memory. Only
+# signature-verified tokens are cached.
+
+token_cache = TTLCache(
+    ttl=settings.AUTH_CACHE_MAX_TTL_SECONDS,
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    name="verified_jwt",
+)
+
+
+def _log_sampled(msg: str, *args) -> None:
+    """Per-request debug logs, sampled so the hot path stays quiet."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < settings.AUTH_LOG_SAMPLE_RATE:
+        logger.debug(msg, *args)
+
+
+def _verify(token: str, verify_signature: bool = True) -> str | None:
+    """Return the token's subject (user id); raises JWTError if invalid."""
+    key = hashlib.sha256(token.encode()).digest()
+    user_id = token_cache.lookup(key)
+    if user_id is not None:
+        return user_id
+
+    # Supabase tokens use HS256
+    payload = jwt.decode(
+        token,
+        settings.SUPABASE_JWT_SECRET,
+        algorithms=["HS256"],
+        options={"verify_aud": False, "verify_signature": verify_signature},
+    )
+    user_id = payload.get("sub")
+    if user_id and verify_signature:
+        exp = payload.get("exp")
+        ttl = settings.AUTH_CACHE_MAX_TTL_SECONDS
+        if isinstance(exp, (int, float)):
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            token_cache.set(key, user_id, ttl=ttl)
+    return user_id
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
 ) -> str:
     """Verify Supabase JWT and return user_id (UUID string)."""
     if not credentials:
-        logger.warning("No credentials provided")
+        _log_sampled("No credentials provided")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication required - Please login first",
         )
-    
-    logger.info(f"Token received (first 50 chars): {credentials.credentials[:50]}...")
-    logger.info(f"JWT Secret length: {len(settings.SUPABASE_JWT_SECRET)}")
-    
+
     try:
-        # Supabase tokens use HS256
         # In production, signature is verified; in dev, can be skipped if JWT_SECRET missing
         skip_sig = settings.APP_ENV == "development" and not settings.SUPABASE_JWT_SECRET
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            options={"verify_aud": False, "verify_signature": not skip_sig},
-        )
-        user_id: str = payload.get("sub")
-        logger.info(f"Token decoded successfully. User ID: {user_id}")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token - No user ID found")
-        return user_id
+        user_id = _verify(credentials.credentials, verify_signature=not skip_sig)
     except JWTError as e:
-        logger.error(f"JWT Error: {type(e).__name__}: {str(e)}")
+        logger.warning("JWT rejected: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=401, detail=f"Invalid or expired token: {str(e)}")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token - No user ID found")
+    _log_sampled("Authenticated user %s", user_id)
+    return user_id
 
 
 async def get_optional_user(
@@ -49,12 +89,15 @@ async def get_optional_user(
     if not credentials:
         return None
     try:
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            options={"verify_aud": False},
-        )
-        return payload.get("sub")
+        return _verify(credentials.credentials)
     except JWTError:
         return None
+
+
+async def require_job_token(x_job_token: str | None = Header(default=None)) -> None:
+    """Guard for scheduler-triggered jobs: X-Job-Token must match ALERTS_JOB_TOKEN."""
+    expected = settings.ALERTS_JOB_TOKEN
+    if not expected:
+        raise HTTPException(status_code=403, detail="Batch jobs are disabled (ALERTS_JOB_TOKEN not set)")
+    if not x_job_token or not hmac.compare_digest(x_job_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid job token")
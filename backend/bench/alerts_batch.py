@@ -0,0 +1,72 @@
+"""Fleet-wide alert generation: per-user loop vs the batch job.
+
+Seeds N farmers (two active cultures each, spread over a few cities) in the
+PostgREST stand-in and generates alerts for all of them twice: once calling
+generate_user_alerts per user (the old per-request path, run sequentially),
+once with generate_alerts_batch. Prints users per second and upstream calls.
+
+    cd backend && python -m bench.alerts_batch --users 200
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from bench.load_test import configure_app, seed_tables
+from bench.stubs import Latency, StubServer, anthropic_app, open_meteo_app, postgrest_app
+
+
+def _calls(counters: dict[str, Counter]) -> str:
+    return (
+        f"llm={counters['anthropic'].get('messages.create', 0)}"
+        f" meteo={counters['open_meteo'].get('forecast', 0)}"
+        f" db={sum(counters['supabase'].values())}"
+        f" (alerts inserts={counters['supabase'].get('POST alerts', 0)})"
+    )
+
+
+async def run(users: list[str], counters: dict[str, Counter], concurrency: int) -> None:
+    from agents.alerts_agent import generate_alerts_batch, generate_user_alerts
+    from services.weather_service import forecast_cache, forecast_store
+
+    started = time.perf_counter()
+    for user_id in users:
+        await generate_user_alerts(user_id)
+    elapsed = time.perf_counter() - started
+    print(f"per-user loop   {len(users) / elapsed:8.1f} users/s  {elapsed:6.2f}s  {_calls(counters)}")
+
+    forecast_cache.clear()
+    forecast_store.clear()
+    for counter in counters.values():
+        counter.clear()
+    stats = await generate_alerts_batch(concurrency=concurrency)
+    print(f"batch job       {stats['users_per_second']:8.1f} users/s  {stats['duration_s']:6.2f}s  {_calls(counters)}")
+    print(f"                {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight for the batch job")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.3")
+    parser.add_argument("--meteo-latency", default="lognormal:150:0.3")
+    parser.add_argument("--db-latency", default="lognormal:20:0.3")
+    args = parser.parse_args()
+
+    users = [f"00000000-0000-4000-9000-{i:012d}" for i in range(1, args.users + 1)]
+    counters = {name: Counter() for name in ("anthropic", "open_meteo", "supabase")}
+    stubs = [
+        StubServer(anthropic_app(Latency.parse(args.llm_latency), counters["anthropic"])).start(),
+        StubServer(open_meteo_app(Latency.parse(args.meteo_latency), counters["open_meteo"])).start(),
+        StubServer(postgrest_app(Latency.parse(args.db_latency), counters["supabase"], seed_tables(users))).start(),
+    ]
+    configure_app(*(stub.url for stub in stubs))
+    try:
+        asyncio.run(run(users, counters, args.concurrency))
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Auth overhead per request: previous get_current_user vs the cached one.
+
+Two traffic shapes: a dashboard burst reusing one token (the common case),
+and every request carrying a fresh token (worst case, all cache misses).
+INFO logging is enabled with a discarding handler, as in production where
+the previous implementation's per-request INFO lines were emitted.
+
+    cd backend && python -m bench.auth_bench
+"""
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+
+import auth
+from config import settings
+
+SECRET = "bench-jwt-secret"
+legacy_logger = logging.getLogger("bench.auth_legacy")
+
+
+# ---------- Previous implementation, kept verbatim for comparison ----------
+
+async def legacy_get_current_user(credentials):
+    logger = legacy_logger
+    if not credentials:
+        logger.warning("No credentials provided")
+        raise HTTPException(status_code=401, detail="Authentication required - Please login first")
+    logger.info(f"Token received (first 50 chars): {credentials.credentials[:50]}...")
+    logger.info(f"JWT Secret length: {len(settings.SUPABASE_JWT_SECRET)}")
+    try:
+        skip_sig = settings.APP_ENV == "development" and not settings.SUPABASE_JWT_SECRET
+        payload = jwt.decode(
+            credentials.credentials,
+            settings.SUPABASE_JWT_SECRET,
+            algorithms=["HS256"],
+            options={"verify_aud": False, "verify_signature": not skip_sig},
+        )
+        user_id: str = payload.get("sub")
+        logger.info(f"Token decoded successfully. User ID: {user_id}")
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Invalid token - No user ID found")
+        return user_id
+    except JWTError as e:
+        logger.error(f"JWT Error: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=401, detail=f"Invalid or expired token: {str(e)}")
+
+
+def _token(i: int) -> HTTPAuthorizationCredentials:
+    now = int(time.time())
+    claims = {"sub": f"00000000-0000-4000-8000-{i:012d}", "role": "authenticated", "iat": now, "exp": now + 3600}
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encode(claims, SECRET, algorithm="HS256"))
+
+
+async def _per_call_us(fn, tokens: list, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for credentials in tokens:
+            await fn(credentials)
+    return (time.perf_counter() - started) / (rounds * len(tokens)) * 1e6
+
+
+async def main() -> None:
+    settings.SUPABASE_JWT_SECRET = SECRET
+    handler = logging.NullHandler()
+    for name in ("auth", legacy_logger.name):
+        logging.getLogger(name).addHandler(handler)
+        logging.getLogger(name).setLevel(logging.INFO)
+        logging.getLogger(name).propagate = False
+
+    same = [_token(1)]
+    fresh = [_token(i) for i in range(2000)]
+    for label, tokens, rounds in (("same token x2000", same, 2000), ("2000 distinct tokens", fresh, 1)):
+        legacy = await _per_call_us(legacy_get_current_user, tokens, rounds)
+        auth.token_cache.clear()
+        cached = await _per_call_us(auth.get_current_user, tokens, rounds)
+        print(f"{label:<22} previous {legacy:7.1f} us/request   cached {cached:7.1f} us/request   ({legacy / cached:4.1f}x)")
+    print(f"token cache: {auth.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,395 @@
+"""Offline end-to-end load test.
+
+Starts local stand-ins for Anthropic, Open-Meteo and Supabase (PostgREST)
+with configurable latency (bench/stubs.py), points the app at them, serves
+the real FastAPI app with uvicorn and drives its endpoints at fixed
+concurrency levels. Reports p50/p95/p99 latency, throughput and upstream
+call counts per endpoint and level, and can save the run as a baseline or
+compare against one (exit code 1 on regression).
+
+    cd backend
+    python -m bench.load_test --save-baseline
+    python -m bench.load_test --compare
+    python -m bench.load_test -e chat,sms -c 1,16,64 -n 200 --llm-latency lognormal:800:0.4
+
+No API key, network access or Supabase project is needed. Response and
+forecast caches are cleared before every run; chat messages get a unique
+suffix unless ``--repeat`` is given, so each run measures the full pipeline.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from jose import jwt
+
+from bench.stubs import Latency, StubServer, anthropic_app, open_meteo_app, postgrest_app
+
+JWT_SECRET = "bench-jwt-secret"
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+CITIES = ["kaolack", "dakar", "thies", "ziguinchor", "saint-louis", "tambacounda"]
+
+CHAT_MESSAGES = [
+    "Quel temps fera-t-il cette semaine, dois-je arroser ?",
+    "Quand semer l'arachide dans le bassin arachidier ?",
+    "Quel est le prix du mil au marché de Kaolack ?",
+    "Mes feuilles de tomate ont des taches brunes, quelle maladie ?",
+    "Prévision de pluie et prix du mil à Kaffrine",
+    "Will it rain enough to sow millet this week?",
+    "Naka la taw di doxee ci Kaolack ?",
+    "Où vendre mon oignon au meilleur prix ?",
+]
+
+SMS_BODIES = [
+    "METEO KAOLACK",
+    "PRIX ARACHIDE",
+    "TOOL MIL",
+    "JEGGE TOMATE",
+    "AIDE",
+    "Est-ce que je peux semer demain avec la pluie annoncée ?",
+    "Ban jamono laa war ji gerte ?",
+]
+
+USERS = [f"00000000-0000-4000-8000-{i:012d}" for i in range(1, 51)]
+
+
+def mint_token(subject: str, role: str = "authenticated") -> str:
+    now = int(time.time())
+    claims = {"sub": subject, "role": role, "iat": now, "exp": now + 24 * 3600}
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+
+def seed_tables(users: list[str] = USERS) -> dict[str, list[dict]]:
+    profiles, cultures = [], []
+    for i, user_id in enumerate(users):
+        profiles.append({
+            "id": user_id,
+            "full_name": f"Bench farmer {i + 1}",
+            "city": CITIES[i % len(CITIES)],
+            "zone": "bassin_arachidier",
+            "preferred_language": "fr" if i % 3 else "wo",
+        })
+        for j, crop in enumerate(("arachide", "mil")):
+            cultures.append({
+                "id": f"{user_id[:-4]}{j:04d}",
+                "user_id": user_id,
+                "parcelle_id": None,
+                "crop_key": crop,
+                "status": "growing",
+                "planting_date": "2026-07-01",
+                "expected_harvest": "2026-10-15",
+            })
+    return {"profiles": profiles, "cultures": cultures, "alerts": []}
+
+
+# ---------- Endpoints ----------
+
+def _chat_body(i: int, unique: bool) -> dict:
+    message = CHAT_MESSAGES[i % len(CHAT_MESSAGES)]
+    if unique:
+        message = f"{message} (#{i})"
+    return {"message": message, "city": CITIES[i % len(CITIES)], "language": "fr"}
+
+
+def _sms_body(i: int, unique: bool) -> dict:
+    body = SMS_BODIES[i % len(SMS_BODIES)]
+    if unique and not body.isupper():
+        body = f"{body} #{i}"
+    return {"From": f"+22177{i:07d}", "Body": body}
+
+
+ENDPOINTS = {
+    "chat": lambda i, unique: {"method": "POST", "url": "/api/chat", "json": _chat_body(i, unique)},
+    "chat_stream": lambda i, unique: {"method": "POST", "url": "/api/chat/stream", "json": _chat_body(i, unique)},
+    "sms": lambda i, unique: {"method": "POST", "url": "/api/sms/incoming", "json": _sms_body(i, unique)},
+    "alerts": lambda i, unique: {
+        "method": "POST",
+        "url": "/api/alerts/generate",
+        "headers": {"Authorization": f"Bearer {mint_token(USERS[i % len(USERS)])}"},
+    },
+}
+
+# Endpoints that answer 202 with a background job: timed until the job ends.
+JOB_ENDPOINTS = {"alerts": "/api/alerts/jobs/{id}"}
+JOB_POLL_INTERVAL = 0.02
+
+
+# ---------- Runner ----------
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def _send(client: httpx.AsyncClient, request: dict, job_url: str | None = None) -> tuple[int, float | None]:
+    """Send one request; returns (status, seconds to first SSE token or None).
+
+    With ``job_url``, a 202 job response is polled until the job finishes.
+    """
+    started = time.perf_counter()
+    first_token = None
+    lines = []
+    async with client.stream(**request) as response:
+        async for line in response.aiter_lines():
+            if first_token is None and line.startswith("data:") and '"token"' in line:
+                first_token = time.perf_counter() - started
+            if job_url:
+                lines.append(line)
+    if job_url and response.status_code == 202:
+        job = json.loads("".join(lines))
+        while job["status"] == "running":
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            poll = await client.get(job_url.format(id=job["id"]), headers=request.get("headers"))
+            job = poll.json()
+        return (200 if job["status"] == "succeeded" else 500), first_token
+    return response.status_code, first_token
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int, unique: bool) -> dict:
+    latencies: list[float] = []
+    first_tokens: list[float] = []
+    errors: Counter = Counter()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            request = ENDPOINTS[endpoint](i, unique)
+            started = time.perf_counter()
+            try:
+                status, first_token = await _send(client, request, JOB_ENDPOINTS.get(endpoint))
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors[str(status)] += 1
+            if first_token is not None:
+                first_tokens.append(first_token)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    first_tokens.sort()
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": dict(errors),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+    if first_tokens:
+        result["ttft_p50_ms"] = round(percentile(first_tokens, 50) * 1000, 1)
+        result["ttft_p95_ms"] = round(percentile(first_tokens, 95) * 1000, 1)
+    return result
+
+
+def _reset_app_caches() -> None:
+    from agents.orchestrator import response_cache
+    from services.user_data_service import user_cache
+    from services.weather_service import forecast_cache, forecast_store
+
+    response_cache.clear()
+    forecast_cache.clear()
+    forecast_store.clear()
+    user_cache.clear()
+
+
+def configure_app(anthropic_url: str, meteo_url: str, supabase_url: str, merge: str | None = None):
+    """Point settings at the stand-ins, then import the app.
+
+    config.py loads .env with override=True at import, so the stand-in URLs
+    are set on the settings object afterwards rather than via the environment.
+    """
+    from config import settings
+
+    settings.ANTHROPIC_API_KEY = "bench-key"
+    settings.ANTHROPIC_API_URL = anthropic_url
+    settings.OPEN_METEO_BASE_URL = f"{meteo_url}/v1/forecast"
+    settings.SUPABASE_URL = supabase_url
+    settings.SUPABASE_SERVICE_ROLE_KEY = mint_token("service-role", role="service_role")
+    settings.SUPABASE_JWT_SECRET = JWT_SECRET
+    settings.WEATHER_STORE_PATH = ":memory:"
+    if merge:
+        settings.MERGE_STRATEGY = merge
+
+    import main
+    return main.app
+
+
+async def drive(app_url: str, args, counters: dict[str, Counter]) -> list[dict]:
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                _reset_app_caches()
+                for counter in counters.values():
+                    counter.clear()
+                result = await run_level(client, endpoint, concurrency, args.requests, unique=not args.repeat)
+                result["upstream_calls"] = {name: dict(counter) for name, counter in counters.items()}
+                results.append(result)
+                print(_format_row(result), flush=True)
+    return results
+
+
+# ---------- Reporting ----------
+
+_HEADER = f"{'endpoint':<12} {'conc':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}  upstream calls"
+
+
+def _format_row(r: dict) -> str:
+    upstream = r["upstream_calls"]
+    calls = (
+        f"llm={sum(v for k, v in upstream['anthropic'].items() if k.startswith('messages'))}"
+        f" meteo={upstream['open_meteo'].get('forecast', 0)}"
+        f" db={sum(upstream['supabase'].values())}"
+    )
+    if upstream["anthropic"].get("rate_limited"):
+        calls += f" llm_429={upstream['anthropic']['rate_limited']}"
+    return (
+        f"{r['endpoint']:<12} {r['concurrency']:>5} {r['throughput_rps']:>8.1f} {r['p50_ms']:>9.1f}"
+        f" {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {sum(r['errors'].values()):>7}  {calls}"
+    )
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Regressions vs the baseline: p95 up or throughput down by more than ``tolerance``."""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('git_revision')} ({baseline['meta'].get('created_at')}):")
+    for r in results:
+        old = previous.get((r["endpoint"], r["concurrency"]))
+        if old is None:
+            continue
+        p95 = r["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        rps = r["throughput_rps"] / old["throughput_rps"] - 1 if old["throughput_rps"] else 0.0
+        label = f"{r['endpoint']} @ {r['concurrency']}"
+        print(f"  {label:<20} p95 {p95:+7.1%}   throughput {rps:+7.1%}")
+        if p95 > tolerance:
+            regressions.append(f"{label}: p95 {old['p95_ms']} -> {r['p95_ms']} ms")
+        if rps < -tolerance:
+            regressions.append(f"{label}: throughput {old['throughput_rps']} -> {r['throughput_rps']} rps")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-e", "--endpoints", default=",".join(ENDPOINTS), help="comma-separated: " + ", ".join(ENDPOINTS))
+    parser.add_argument("-c", "--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("-n", "--requests", type=int, default=50, help="requests per endpoint and level")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.3", help="Anthropic time to first byte")
+    parser.add_argument("--llm-rate-limit", type=int, help="Anthropic stand-in answers 429 beyond this many calls in flight")
+    parser.add_argument("--merge", choices=("llm", "structured", "auto"), help="multi-agent merge strategy (default: MERGE_STRATEGY)")
+    parser.add_argument("--token-interval-ms", type=float, default=5.0, help="delay between streamed words")
+    parser.add_argument("--meteo-latency", default="lognormal:150:0.3")
+    parser.add_argument("--db-latency", default="lognormal:20:0.3")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout (s)")
+    parser.add_argument("--repeat", action="store_true", help="reuse identical messages (exercises the response cache)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against --baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression (default 15%%)")
+    parser.add_argument("--output", type=Path, help="also write this run's JSON here")
+    args = parser.parse_args(argv)
+
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in args.endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    latencies = {
+        "anthropic": Latency.parse(args.llm_latency),
+        "open_meteo": Latency.parse(args.meteo_latency),
+        "supabase": Latency.parse(args.db_latency),
+    }
+    counters = {name: Counter() for name in latencies}
+    stubs = [
+        StubServer(anthropic_app(
+            latencies["anthropic"], counters["anthropic"], args.token_interval_ms / 1000, rate_limit=args.llm_rate_limit
+        )).start(),
+        StubServer(open_meteo_app(latencies["open_meteo"], counters["open_meteo"])).start(),
+        StubServer(postgrest_app(latencies["supabase"], counters["supabase"], seed_tables())).start(),
+    ]
+    app = configure_app(*(stub.url for stub in stubs), merge=args.merge)
+    server = StubServer(app).start()
+
+    print(
+        f"upstream latency: llm={latencies['anthropic']} meteo={latencies['open_meteo']} db={latencies['supabase']}"
+        f"  ({args.requests} requests per level)\n"
+    )
+    print(_HEADER)
+    try:
+        results = asyncio.run(drive(server.url, args, counters))
+    finally:
+        server.stop()
+        for stub in stubs:
+            stub.stop()
+
+    from config import settings
+
+    run = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "latency": {name: str(latency) for name, latency in latencies.items()},
+            "token_interval_ms": args.token_interval_ms,
+            "requests_per_level": args.requests,
+            "unique_messages": not args.repeat,
+            "merge": settings.MERGE_STRATEGY,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2))
+
+    status = 0
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+            return 2
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"].get("latency") != run["meta"]["latency"]:
+            print("\nWarning: upstream latency settings differ from the baseline's.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            status = 1
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
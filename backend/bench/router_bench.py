@@ -0,0 +1,125 @@
+"""Router micro-benchmark and routing-quality check.
+
+Compares the compiled keyword router (agents/router.py) with the previous
+substring-scan implementation on a labelled query set: per-call latency,
+exact-match accuracy, spurious agent invocations (routed but not needed) and
+missed agents.
+
+    cd backend && python -m bench.router_bench
+"""
+import timeit
+
+from agents.router import router
+
+# ---------- Previous implementation, kept verbatim for comparison ----------
+
+LEGACY_WEATHER = [
+    "weather", "meteo", "météo", "taw", "pluie", "rain", "temperature",
+    "température", "vent", "wind", "forecast", "prévision", "irrigation",
+    "arroser", "ndox", "nawet", "noor", "lolli", "sécheresse", "drought",
+    "inondation", "flood", "chaleur", "heat", "humidité", "humidity",
+    "soleil", "sun", "nuage", "cloud",
+]
+LEGACY_AGRO = [
+    "plant", "planter", "semer", "sow", "crop", "culture", "récolte",
+    "harvest", "maladie", "disease", "ravageur", "pest", "feuille", "leaf",
+    "tache", "spot", "variété", "variety", "semence", "seed", "engrais",
+    "fertilizer", "sol", "soil", "calendrier", "calendar", "arachide",
+    "gerte", "mil", "dugub", "riz", "malo", "mais", "maïs", "mbaxal",
+    "niebe", "niébé", "tomate", "tamaate", "oignon", "soble", "mangue",
+    "coton", "bey", "suuf", "diagnos", "traitement", "treatment",
+    "rotation", "compost", "neem", "bio",
+]
+LEGACY_MARKET = [
+    "prix", "price", "marché", "market", "vendre", "sell", "acheter",
+    "buy", "fcfa", "cfa", "tendance", "trend", "cours", "njeg",
+    "coût", "cost", "revenu", "revenue", "stockage", "storage",
+    "transport", "bénéfice", "profit", "sandaga", "thiaroye",
+]
+
+
+def legacy_route(message: str) -> list[str]:
+    text = message.lower()
+    text_norm = text.replace("é", "e").replace("è", "e").replace("ê", "e").replace("à", "a").replace("ô", "o")
+    scores = {
+        "weather": sum(1 for k in LEGACY_WEATHER if k in text or k in text_norm),
+        "agro": sum(1 for k in LEGACY_AGRO if k in text or k in text_norm),
+        "market": sum(1 for k in LEGACY_MARKET if k in text or k in text_norm),
+    }
+    agents = [name for name, score in scores.items() if score > 0]
+    return agents or ["agro"]
+
+
+# ---------- Labelled queries: (message, agents that should answer) ----------
+
+LABELLED = [
+    ("Quel temps fera-t-il demain à Dakar ?", {"weather"}),
+    ("météo Kaolack cette semaine", {"weather"}),
+    ("Est-ce qu'il va pleuvoir ? Il y aura de la pluie ?", {"weather"}),
+    ("Will it rain in Thies tomorrow?", {"weather"}),
+    ("Dama bëgg xam taw bi ci Touba", {"weather"}),
+    ("Quand dois-je arroser mes plants avec cette chaleur ?", {"weather", "agro"}),
+    ("Quel est le prix de l'arachide à Kaolack ?", {"market"}),
+    ("prix arachide Kaolack", {"market"}),
+    ("What is the price of millet in Dakar market?", {"market"}),
+    ("Njeg gerte ci Touba", {"market"}),
+    ("Où vendre mon oignon au meilleur prix ?", {"market"}),
+    ("Combien coûte le riz au marché Sandaga ?", {"market"}),
+    ("Mes feuilles de tomate ont des taches jaunes, quelle maladie ?", {"agro"}),
+    ("Quand semer le mil dans le bassin arachidier ?", {"agro"}),
+    ("Which fertilizer should I use for maize?", {"agro"}),
+    ("Comment traiter la chenille légionnaire sur le maïs ?", {"agro"}),
+    ("Quelle variété de riz pour la Casamance ?", {"agro"}),
+    ("Is compost good for sandy soil?", {"agro"}),
+    ("My family needs a solution for the biology exam", {"agro"}),
+    ("I want to support my family farm", {"agro"}),
+    ("Quelle est la solution pour améliorer mes rendements ?", {"agro"}),
+    ("Il fait soleil, dois-je semer maintenant ou attendre la pluie ?", {"weather", "agro"}),
+    ("Faut-il stocker mon arachide ou vendre maintenant vu la tendance des prix ?", {"market"}),
+    ("Prévision de pluie et prix du mil à Kaffrine", {"weather", "market"}),
+    ("Bonjour, mais je ne sais pas quoi faire", {"agro"}),
+    ("Au cours de la saison, comment protéger mon champ ?", {"agro"}),
+    ("Les sauterelles mangent mon sorgho, help", {"agro"}),
+    ("Transport de tomates vers Dakar : quel coût ?", {"market"}),
+    ("J'ai un problème de sol salé dans les Niayes", {"agro"}),
+    ("Sunny weekend planned, should I irrigate my onions?", {"weather", "agro"}),
+]
+
+
+def evaluate(route) -> dict:
+    exact = spurious = missed = invocations = 0
+    for message, expected in LABELLED:
+        routed = set(route(message))
+        invocations += len(routed)
+        exact += routed == expected
+        spurious += len(routed - expected)
+        missed += len(expected - routed)
+    return {
+        "exact": f"{exact}/{len(LABELLED)}",
+        "agent_calls": invocations,
+        "spurious": spurious,
+        "missed": missed,
+    }
+
+
+def bench(route, number: int = 2000) -> float:
+    """Mean microseconds per routed message."""
+    messages = [m for m, _ in LABELLED]
+    seconds = timeit.timeit(lambda: [route(m) for m in messages], number=number)
+    return seconds / (number * len(messages)) * 1e6
+
+
+def main():
+    compiled = lambda m: router.route(m)[0]
+    for name, route in (("legacy substring", legacy_route), ("compiled router", compiled)):
+        print(f"{name:18s} {bench(route):7.2f} us/query  {evaluate(route)}")
+
+    print("\nDisagreements (legacy -> compiled, expected):")
+    for message, expected in LABELLED:
+        old, new = set(legacy_route(message)), set(compiled(message))
+        if old != new:
+            print(f"  {message!r}: {sorted(old)} -> {sorted(new)}, expected {sorted(expected)}")
+
+
+if __name__ == "__main__":
+    main()
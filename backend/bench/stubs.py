@@ -0,0 +1,368 @@
+"""Local stand-ins for the upstream services, for offline load tests.
+
+Each stand-in is a small Starlette app with a configurable latency
+distribution and a per-route call counter:
+
+- Anthropic Messages API (``POST /v1/messages``): answers tool-bearing
+  requests with one ``tool_use`` turn, then text; supports ``stream: true``.
+- Open-Meteo forecast (``GET /v1/forecast``): deterministic 7-day forecasts
+  for one or several comma-separated coordinates.
+- PostgREST (``/rest/v1/{table}``): in-memory tables with ``eq.`` / ``in.``
+  filters, ``single()`` and inserts.
+
+``StubServer`` runs an app with uvicorn on its own thread and event loop, so
+blocking clients in the app under test (the sync Supabase client) cannot
+deadlock against it.
+"""
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+# ---------- Latency ----------
+
+@dataclass
+class Latency:
+    """Response delay distribution, in milliseconds.
+
+    ``fixed:200``, ``uniform:50:150`` or ``lognormal:400:0.5`` (median and
+    sigma; a sigma of 0.5 puts p95 at about 2.3x the median).
+    """
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            return cls(kind, values[0])
+        if kind in ("uniform", "lognormal") and len(values) == 2:
+            return cls(kind, values[0], values[1])
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return random.uniform(self.a, self.b) / 1000
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(max(self.a, 0.001)), self.b) / 1000
+        return self.a / 1000
+
+    async def wait(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def __str__(self) -> str:
+        if self.kind == "fixed":
+            return f"fixed:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+
+# ---------- Anthropic ----------
+
+# Values for required tool inputs, by property name.
+_TOOL_INPUTS = {
+    "city": "kaolack",
+    "crop_name": "arachide",
+    "zone_name": "bassin_arachidier",
+    "code": 61,
+}
+
+_ANSWER = (
+    "Selon les prévisions, des pluies sont attendues cette semaine à Kaolack. "
+    "Préparez vos semences d'arachide et surveillez les taches sur les feuilles. "
+    "Le prix moyen au marché reste stable autour de 350 FCFA/kg."
+)
+
+_ALERTS = json.dumps([{
+    "type": "weather",
+    "severity": "warning",
+    "title_fr": "Pluie attendue",
+    "title_wo": "Taw dina ñëw",
+    "body_fr": "Des pluies sont prévues dans les 3 prochains jours, préparez le semis.",
+    "body_wo": "Taw dina am ci 3 fan yii, waajal ji gi.",
+}], ensure_ascii=False)
+
+
+def _system_text(system) -> str:
+    if isinstance(system, list):
+        return "".join(block.get("text", "") for block in system)
+    return system or ""
+
+
+def _plan_reply(body: dict) -> tuple[list[dict], str]:
+    """Content blocks and stop reason for a Messages request."""
+    last = body["messages"][-1]["content"]
+    answered = isinstance(last, list) and any(b.get("type") == "tool_result" for b in last)
+    tool_choice = (body.get("tool_choice") or {}).get("type")
+    if body.get("tools") and not answered and tool_choice != "none":
+        tool = body["tools"][0]
+        required = tool.get("input_schema", {}).get("required", [])
+        tool_input = {name: _TOOL_INPUTS.get(name, "dakar") for name in required}
+        block = {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:16]}", "name": tool["name"], "input": tool_input}
+        return [block], "tool_use"
+    text = _ALERTS if "alert system" in _system_text(body.get("system")) else _ANSWER
+    return [{"type": "text", "text": text}], "end_turn"
+
+
+def _message(content: list[dict], stop_reason: str | None, output_tokens: int) -> dict:
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:16]}",
+        "type": "message",
+        "role": "assistant",
+        "model": "stub",
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": 800, "output_tokens": output_tokens, "cache_read_input_tokens": 600},
+    }
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def anthropic_app(
+    latency: Latency,
+    calls: Counter,
+    token_interval: float = 0.005,
+    rate_limit: int | None = None,
+) -> Starlette:
+    """Messages API stand-in. ``latency`` is time to first byte; streamed
+    replies then emit one word every ``token_interval`` seconds. With
+    ``rate_limit``, requests beyond that many in flight get a 429
+    rate_limit_error (with retry-after), like a saturated organization."""
+    in_flight = 0
+
+    async def messages(request: Request) -> Response:
+        nonlocal in_flight
+        body = await request.json()
+        if rate_limit is not None and in_flight >= rate_limit:
+            calls["rate_limited"] += 1
+            return JSONResponse(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Too many concurrent requests"}},
+                status_code=429,
+                headers={"retry-after": "1"},
+            )
+        in_flight += 1
+        content, stop_reason = _plan_reply(body)
+        words = content[0]["text"].split(" ") if content[0]["type"] == "text" else []
+        calls["messages.stream" if body.get("stream") else "messages.create"] += 1
+        calls["tool_use" if stop_reason == "tool_use" else "end_turn"] += 1
+        try:
+            await latency.wait()
+        except BaseException:
+            in_flight -= 1
+            raise
+
+        if not body.get("stream"):
+            in_flight -= 1
+            return JSONResponse(_message(content, stop_reason, max(len(words), 20)))
+
+        async def events():
+            nonlocal in_flight
+            try:
+                async for event in _events():
+                    yield event
+            finally:
+                in_flight -= 1
+
+        async def _events():
+            yield _sse({"type": "message_start", "message": _message([], None, 1)})
+            for index, block in enumerate(content):
+                if block["type"] == "text":
+                    yield _sse({"type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}})
+                    for i, word in enumerate(words):
+                        if token_interval:
+                            await asyncio.sleep(token_interval)
+                        text = word if i == 0 else " " + word
+                        yield _sse({"type": "content_block_delta", "index": index, "delta": {"type": "text_delta", "text": text}})
+                else:
+                    yield _sse({"type": "content_block_start", "index": index, "content_block": {**block, "input": {}}})
+                    yield _sse({
+                        "type": "content_block_delta",
+                        "index": index,
+                        "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])},
+                    })
+                yield _sse({"type": "content_block_stop", "index": index})
+            yield _sse({
+                "type": "message_delta",
+                "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                "usage": {"output_tokens": max(len(words), 20)},
+            })
+            yield _sse({"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/messages", messages, methods=["POST"])])
+
+
+# ---------- Open-Meteo ----------
+
+def _forecast(lat: float, lon: float) -> dict:
+    """Deterministic 7-day forecast: a rainy spell mid-week, humid nights."""
+    rng = random.Random(f"{lat:.4f},{lon:.4f}")
+    start = date.today()
+    days = [(start + timedelta(days=i)).isoformat() for i in range(7)]
+    rain = [round(max(0.0, rng.gauss(6, 8)), 1) if 2 <= i <= 4 else 0.0 for i in range(7)]
+    tmax = [round(rng.uniform(31, 38), 1) for _ in days]
+    tmin = [round(rng.uniform(22, 26), 1) for _ in days]
+    hours, temp, humidity, precip = [], [], [], []
+    for d, day in enumerate(days):
+        for h in range(24):
+            hours.append(f"{day}T{h:02d}:00")
+            swing = (1 - math.cos((h - 4) / 24 * 2 * math.pi)) / 2
+            temp.append(round(tmin[d] + (tmax[d] - tmin[d]) * swing, 1))
+            humidity.append(round(95 - 45 * swing))
+            precip.append(round(rain[d] / 24, 2))
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "current_weather": {"temperature": temp[12], "windspeed": round(rng.uniform(5, 20), 1), "weathercode": 2},
+        "daily": {
+            "time": days,
+            "temperature_2m_max": tmax,
+            "temperature_2m_min": tmin,
+            "precipitation_sum": rain,
+            "windspeed_10m_max": [round(rng.uniform(10, 30), 1) for _ in days],
+            "weathercode": [61 if r > 1 else 2 for r in rain],
+        },
+        "hourly": {
+            "time": hours,
+            "temperature_2m": temp,
+            "relative_humidity_2m": humidity,
+            "precipitation": precip,
+        },
+    }
+
+
+def open_meteo_app(latency: Latency, calls: Counter) -> Starlette:
+    async def forecast(request: Request) -> Response:
+        lats = [float(v) for v in request.query_params["latitude"].split(",")]
+        lons = [float(v) for v in request.query_params["longitude"].split(",")]
+        calls["forecast"] += 1
+        calls["locations"] += len(lats)
+        await latency.wait()
+        items = [_forecast(lat, lon) for lat, lon in zip(lats, lons)]
+        return JSONResponse(items[0] if len(items) == 1 else items)
+
+    return Starlette(routes=[Route("/v1/forecast", forecast, methods=["GET"])])
+
+
+# ---------- PostgREST (Supabase) ----------
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _matches(row: dict, column: str, condition: str) -> bool:
+    op, _, value = condition.partition(".")
+    if op == "eq":
+        return str(row.get(column)) == value
+    if op == "in":
+        return str(row.get(column)) in value.strip("()").replace('"', "").split(",")
+    if op == "gte":
+        return str(row.get(column, "")) >= value
+    if op == "lte":
+        return str(row.get(column, "")) <= value
+    return True
+
+
+def postgrest_app(latency: Latency, calls: Counter, tables: dict[str, list[dict]]) -> Starlette:
+    """PostgREST stand-in over ``tables`` (mutated in place by writes)."""
+
+    def select(request: Request, table: str) -> list[dict]:
+        rows = tables.setdefault(table, [])
+        filters = [(k, v) for k, v in request.query_params.multi_items() if k not in _RESERVED_PARAMS]
+        return [row for row in rows if all(_matches(row, k, v) for k, v in filters)]
+
+    def respond(request: Request, rows: list[dict], status: int = 200) -> Response:
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse(
+                    {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"},
+                    status_code=406,
+                )
+            return JSONResponse(rows[0], status_code=status)
+        return JSONResponse(rows, status_code=status)
+
+    async def handle(request: Request) -> Response:
+        table = request.path_params["table"]
+        calls[f"{request.method} {table}"] += 1
+        await latency.wait()
+
+        if request.method == "GET":
+            return respond(request, select(request, table))
+        if request.method == "POST":
+            payload = await request.json()
+            new_rows = payload if isinstance(payload, list) else [payload]
+            created = []
+            for row in new_rows:
+                row = {"id": str(uuid.uuid4()), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), **row}
+                tables.setdefault(table, []).append(row)
+                created.append(row)
+            return respond(request, created, status=201)
+        if request.method == "PATCH":
+            changes = await request.json()
+            rows = select(request, table)
+            for row in rows:
+                row.update(changes)
+            return respond(request, rows)
+        if request.method == "DELETE":
+            rows = select(request, table)
+            for row in rows:
+                tables[table].remove(row)
+            return respond(request, rows)
+        return Response(status_code=405)
+
+    return Starlette(routes=[
+        Route("/rest/v1/{table}", handle, methods=["GET", "POST", "PATCH", "DELETE"]),
+    ])
+
+
+# ---------- Server thread ----------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Runs an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, port: int | None = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
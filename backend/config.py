@@ -9,6 +9,9 @@ os.environ.pop("ANTHROPIC_BASE_URL", None)
 
 class Settings:
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
+    # Point at a local stand-in API for tests/benchmarks (ANTHROPIC_BASE_URL is
+    # cleared above on purpose, hence the separate name).
+    ANTHROPIC_API_URL: str = os.getenv("ANTHROPIC_API_URL", "https://api.anthropic.com")
     ANTHROPIC_MODEL: str = "claude-sonnet-4-20250514"          # orchestrator
     ANTHROPIC_MODEL_OPUS: str = "claude-opus-4-5-20251101"     # for demo/showcase
     ANTHROPIC_MODEL_FAST: str = "claude-3-haiku-20240307"       # sub-agents (fastest)
@@ -23,10 +26,108 @@ class Settings:
 
     OPEN_METEO_BASE_URL: str = "https://api.open-meteo.com/v1/forecast"
 
+    # Shared outbound HTTP pool (services/http_client.py)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    HTTP_DEFAULT_TIMEOUT: float = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "15"))
+    OPEN_METEO_TIMEOUT: float = float(os.getenv("OPEN_METEO_TIMEOUT", "10"))
+    ANTHROPIC_TIMEOUT: float = float(os.getenv("ANTHROPIC_TIMEOUT", "60"))
+    # Open-Meteo refreshes its forecasts hourly; cached forecasts expire on
+    # that boundary (plus a publication lag) rather than a sliding window.
+    WEATHER_CACHE_TTL_SECONDS: int = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", "3600"))
+    WEATHER_CACHE_UPDATE_LAG_SECONDS: int = int(os.getenv("WEATHER_CACHE_UPDATE_LAG_SECONDS", "300"))
+    WEATHER_CACHE_MAX_ENTRIES: int = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "512"))
+    # Last good forecast per location on disk (services/forecast_store.py):
+    # stale ones are served while a background refresh runs, and kept as a
+    # fallback for Open-Meteo outages up to the max age
+    WEATHER_STORE_PATH: str = os.getenv("WEATHER_STORE_PATH", "forecasts.db")
+    WEATHER_STALE_SERVE_SECONDS: int = int(os.getenv("WEATHER_STALE_SERVE_SECONDS", str(6 * 3600)))
+    WEATHER_REFRESH_RETRY_SECONDS: int = int(os.getenv("WEATHER_REFRESH_RETRY_SECONDS", "60"))
+    WEATHER_STORE_MAX_AGE_SECONDS: int = int(os.getenv("WEATHER_STORE_MAX_AGE_SECONDS", str(7 * 86400)))
+
+    # Sub-agent tool loop (agents/runtime.py)
+    AGENT_MAX_ITERATIONS: int = int(os.getenv("AGENT_MAX_ITERATIONS", "4"))
+    AGENT_TURN_TIMEOUT: float = float(os.getenv("AGENT_TURN_TIMEOUT", "20"))
+    # Whole orchestrate() budget per channel; late agents are cancelled and the
+    # answer is built from those that finished (SMS gateways time out early)
+    REQUEST_DEADLINE_SECONDS: dict = {
+        "web": float(os.getenv("REQUEST_DEADLINE_WEB", "30")),
+        "sms": float(os.getenv("REQUEST_DEADLINE_SMS", "10")),
+    }
+    # Part of the deadline kept for the synthesis call when several agents run
+    SYNTHESIS_RESERVE_SECONDS: float = float(os.getenv("SYNTHESIS_RESERVE_SECONDS", "4"))
+    # How multi-agent answers are combined (agents/merge.py): "llm" always runs
+    # the synthesis call, "structured" stitches sections, "auto" stitches
+    # unless the agents' advice conflicts
+    MERGE_STRATEGY: str = os.getenv("MERGE_STRATEGY", "auto")
+
+    # LLM admission control (services/llm_scheduler.py)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+    LLM_MODEL_CONCURRENCY: int = int(os.getenv("LLM_MODEL_CONCURRENCY", "48"))
+    # Per-model overrides: "claude-3-haiku-20240307=24,claude-sonnet-4-20250514=8"
+    LLM_MODEL_LIMITS: str = os.getenv("LLM_MODEL_LIMITS", "")
+    LLM_MAX_QUEUE: int = int(os.getenv("LLM_MAX_QUEUE", "200"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+
+    # orchestrate() response cache: TTL per agent (an answer lives as long as
+    # its most volatile agent allows) and a memory bound for the whole cache.
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL_SECONDS: dict = {
+        "weather": int(os.getenv("RESPONSE_CACHE_TTL_WEATHER", "900")),
+        "market": int(os.getenv("RESPONSE_CACHE_TTL_MARKET", "3600")),
+        "agro": int(os.getenv("RESPONSE_CACHE_TTL_AGRO", "86400")),
+    }
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # Conversation sessions (services/session_store.py): "memory" (per worker)
+    # or "sqlite" (shared by the workers on one host, survives restarts)
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "memory").lower()
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "sessions.db")
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    SESSION_MAX_BYTES: int = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+    SESSION_IDLE_TTL_SECONDS: int = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+    # Turns + tool results kept per session (approximate tokens)
+    SESSION_TOKEN_BUDGET: int = int(os.getenv("SESSION_TOKEN_BUDGET", "4000"))
+    # A tool result is reused by follow-ups while younger than this
+    SESSION_TOOL_TTL_SECONDS: int = int(os.getenv("SESSION_TOOL_TTL_SECONDS", "900"))
+
+    # Per-request span breakdown in orchestrate() metadata (metrics are always on)
+    TRACE_TIMINGS: bool = os.getenv("TRACE_TIMINGS", "false").lower() == "true"
+
+    # Alert generation (agents/alerts_agent.py) and background jobs
+    ALERTS_LLM_CONCURRENCY: int = int(os.getenv("ALERTS_LLM_CONCURRENCY", "8"))
+    ALERTS_INSERT_BATCH: int = int(os.getenv("ALERTS_INSERT_BATCH", "200"))
+    # Shared secret for POST /api/alerts/generate-all (scheduler); empty = disabled
+    ALERTS_JOB_TOKEN: str = os.getenv("ALERTS_JOB_TOKEN", "")
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+    # Browser cache lifetime for /api/crops, /markets, /zones, /cities (revalidated via ETag after)
+    STATIC_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("STATIC_CACHE_MAX_AGE_SECONDS", "300"))
+
+    # /api/diagnose image pipeline (services/image_service.py)
+    DIAGNOSE_MAX_UPLOAD_BYTES: int = int(os.getenv("DIAGNOSE_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+    # Longest edge sent to the vision model (larger images are downscaled by the API anyway)
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "1568"))
+    IMAGE_OUTPUT_FORMAT: str = os.getenv("IMAGE_OUTPUT_FORMAT", "jpeg")  # jpeg or webp
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", "85"))
+    DIAGNOSIS_CACHE_TTL_SECONDS: int = int(os.getenv("DIAGNOSIS_CACHE_TTL_SECONDS", "86400"))
+    DIAGNOSIS_CACHE_MAX_BYTES: int = int(os.getenv("DIAGNOSIS_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
     # Supabase
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
     SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    # Per-user profile/parcelles/cultures cache (services/user_data_service.py)
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+    USER_CACHE_MAX_BYTES: int = int(os.getenv("USER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    # Verified-JWT cache (auth.py): entries live until the token's exp, capped
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_CACHE_MAX_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_MAX_TTL_SECONDS", "3600"))
+    AUTH_LOG_SAMPLE_RATE: float = float(os.getenv("AUTH_LOG_SAMPLE_RATE", "0.01"))
+    SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+    SUPABASE_TIMEOUT: float = float(os.getenv("SUPABASE_TIMEOUT", "10"))
 
     # Global cities coordinates (international coverage)
     CITIES: dict = {
@@ -1,59 +1,184 @@
+import hashlib
 import json
+import logging
+import threading
+import time
 from pathlib import Path
 
-DATA_DIR = Path(__file__).parent / "data"
+from text_utils import fold_text
+
+logger = logging.getLogger(__name__)
 
+DATA_DIR = Path(__file__).parent / "data"
+DATA_FILES = ("crops", "diseases", "markets", "zones")
+
+# How often (seconds) the store stats data/*.json to detect edits on disk.
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+class _Snapshot:
+    """Immutable view of the reference data plus its lookup indexes.
+
+    A reload builds a brand new snapshot and swaps it in one assignment, so
+    readers never see a half-built index.
+    """
+
+    def __init__(self, raw: dict[str, dict], version: str, modified: float = 0.0):
+        self.version = version
+        self.modified = modified  # newest data file mtime (for Last-Modified)
+        self.crops: dict = raw["crops"]
+        self.diseases: dict = raw["diseases"]
+        self.markets: dict = raw["markets"]
+        self.zones: dict = raw["zones"]
+
+        # Crop aliases: key, French name, Wolof name, all accent-folded.
+        # Keys are indexed last so a crop name can never shadow another key.
+        self.crop_aliases: dict[str, str] = {}
+        for key, crop in self.crops.items():
+            for name in (crop.get("name_fr"), crop.get("name_wo")):
+                if name:
+                    self.crop_aliases.setdefault(fold_text(name), key)
+        for key in self.crops:
+            self.crop_aliases[fold_text(key)] = key
+
+        self.diseases_by_crop: dict[str, list[dict]] = {}
+        for disease in self.diseases.get("diseases", []):
+            for crop_key in disease.get("crops", []):
+                self.diseases_by_crop.setdefault(fold_text(crop_key), []).append(disease)
+
+        self.prices: dict[str, dict] = {
+            fold_text(k): v for k, v in self.markets.get("prices", {}).items()
+        }
+
+        self.markets_by_city: dict[str, list[dict]] = {}
+        for market in self.markets.get("markets", []):
+            self.markets_by_city.setdefault(fold_text(market["city"]), []).append(market)
+
+        self.zones_by_key: dict[str, dict] = {
+            fold_text(k): v for k, v in self.zones.get("zones", {}).items()
+        }
+
+    def crop_key(self, name: str) -> str:
+        """Resolve a crop key, French or Wolof name to its canonical key."""
+        folded = fold_text(name)
+        return self.crop_aliases.get(folded, folded)
+
+
+class ReferenceStore:
+    """Process-wide, in-memory store for data/*.json.
+
+    Files are parsed once and indexed; lookups are plain dict hits. The store
+    re-stats the files at most every ``RELOAD_CHECK_INTERVAL`` seconds and
+    rebuilds the snapshot when an mtime changes. A file that is missing or
+    fails to parse (e.g. caught mid-write or mid-rename) keeps the previous
+    snapshot in service.
+    """
+
+    def __init__(self, data_dir: Path = DATA_DIR, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: _Snapshot | None = None
+        self._mtimes: dict[str, float] = {}
+        self._next_check = 0.0
+
+    def _paths(self) -> dict[str, Path]:
+        return {name: self.data_dir / f"{name}.json" for name in DATA_FILES}
+
+    def _stat(self) -> dict[str, float]:
+        return {name: path.stat().st_mtime for name, path in self._paths().items()}
+
+    def _load(self, mtimes: dict[str, float]) -> None:
+        raw = {}
+        digest = hashlib.sha1()
+        for name, path in self._paths().items():
+            content = path.read_bytes()
+            digest.update(content)
+            raw[name] = json.loads(content)
+        self._snapshot = _Snapshot(raw, digest.hexdigest()[:16], max(mtimes.values(), default=0.0))
+        self._mtimes = mtimes
+
+    def snapshot(self) -> _Snapshot:
+        now = time.monotonic()
+        if self._snapshot is not None and now < self._next_check:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot is not None and now < self._next_check:
+                return self._snapshot
+            if self._snapshot is None:
+                self._load(self._stat())
+            else:
+                # A file briefly missing (swapped in by an atomic rename) or
+                # caught mid-write leaves the current snapshot in service.
+                try:
+                    mtimes = self._stat()
+                    if mtimes != self._mtimes:
+                        self._load(mtimes)
+                        logger.info("Reference data reloaded (version %s)", self._snapshot.version)
+                except (OSError, ValueError) as e:
+                    logger.warning("Reference data reload failed, keeping previous version: %s", e)
+            self._next_check = now + self.check_interval
+            return self._snapshot
+
+    def reload(self) -> None:
+        """Force a reload on the next access."""
+        with self._lock:
+            self._next_check = 0.0
+            self._mtimes = {}
+
+
+store = ReferenceStore()
+
+
+def data_version() -> str:
+    """Content hash of the reference data currently in service."""
+    return store.snapshot().version
+
+
+# The load_* helpers return the shared, cached dicts: treat them as read-only.
 
 def load_crops() -> dict:
-    with open(DATA_DIR / "crops.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    return store.snapshot().crops
 
 
 def load_diseases() -> dict:
-    with open(DATA_DIR / "diseases.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    return store.snapshot().diseases
 
 
 def load_markets() -> dict:
-    with open(DATA_DIR / "markets.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    return store.snapshot().markets
 
 
 def load_zones() -> dict:
-    with open(DATA_DIR / "zones.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    return store.snapshot().zones
+
+
+def get_crop_key(crop_name: str) -> str | None:
+    """Canonical crop key for a key, French or Wolof name (accent-insensitive)."""
+    snap = store.snapshot()
+    key = snap.crop_key(crop_name)
+    return key if key in snap.crops else None
 
 
 def get_crop(crop_name: str) -> dict | None:
-    crops = load_crops()
-    key = crop_name.lower().strip()
-    if key in crops:
-        return crops[key]
-    for k, v in crops.items():
-        if v["name_fr"].lower() == key or v["name_wo"].lower() == key:
-            return v
-    return None
+    snap = store.snapshot()
+    return snap.crops.get(snap.crop_key(crop_name))
 
 
 def get_diseases_for_crop(crop_name: str) -> list[dict]:
-    data = load_diseases()
-    key = crop_name.lower().strip()
-    return [d for d in data["diseases"] if key in d["crops"]]
+    snap = store.snapshot()
+    return snap.diseases_by_crop.get(snap.crop_key(crop_name), [])
 
 
 def get_prices(crop_name: str) -> dict | None:
-    data = load_markets()
-    key = crop_name.lower().strip()
-    return data["prices"].get(key)
+    snap = store.snapshot()
+    return snap.prices.get(snap.crop_key(crop_name))
 
 
 def get_markets_for_city(city: str) -> list[dict]:
-    data = load_markets()
-    key = city.lower().strip()
-    return [m for m in data["markets"] if m["city"] == key]
+    return store.snapshot().markets_by_city.get(fold_text(city), [])
 
 
 def get_zone(zone_name: str) -> dict | None:
-    data = load_zones()
-    key = zone_name.lower().strip()
-    return data["zones"].get(key)
+    return store.snapshot().zones_by_key.get(fold_text(zone_name))
@@ -1,16 +1,83 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from config import settings
 from api import router as api_router
 from api_protected import router as protected_router
+from auth import token_cache
+from agents.orchestrator import response_cache
+from services import http_client, supabase_service, tracing, weather_service
+from services.jobs import jobs
+from services.weather_service import forecast_cache_stats, forecast_store_stats
+from services.user_data_service import user_cache
+from services.session_store import sessions
+from services.llm_scheduler import LLMOverloaded
+from services.image_service import diagnosis_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.startup()
+    try:
+        yield
+    finally:
+        await jobs.shutdown()
+        await sessions.close()
+        await weather_service.shutdown()
+        await supabase_service.shutdown()
+        await http_client.shutdown()
+
 
 app = FastAPI(
     title="AgriAgent",
     description="Global multi-agent AI system for farmers worldwide",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
+
+class BodySizeLimit:
+    """Refuse request bodies larger than ``limits[path]`` with 413 while they
+    stream in, before the multipart parser spools them to disk."""
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        detail = f"Request body too large (max {limit // (1024 * 1024)} MB)"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# Multipart framing and the form fields come on top of the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Added before CORS so 413s still carry the CORS headers.
+app.add_middleware(BodySizeLimit, limits={"/api/diagnose": settings.DIAGNOSE_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES})
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -24,6 +91,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, to keep series bounded.
+    route = request.scope.get("route")
+    tracing.record(
+        "http", time.perf_counter() - started, started=started,
+        method=request.method, route=getattr(route, "path", "unmatched"), status=str(response.status_code),
+    )
+    return response
+
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded(request: Request, exc: LLMOverloaded):
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
 app.include_router(api_router, prefix="/api")
 app.include_router(protected_router, prefix="/api")
 
@@ -41,3 +130,9 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    body = tracing.render_metrics(caches=[forecast_cache_stats(), forecast_store_stats(), response_cache.stats(), token_cache.stats(), user_cache.stats(), sessions.stats(), diagnosis_cache.stats()])
+    return PlainTextResponse(body, media_type=tracing.CONTENT_TYPE)
@@ -0,0 +1,115 @@
+import numpy as np
+
+# Disease-favourable conditions: near-saturated air in the fungal growth window.
+DISEASE_RH_MIN = 90.0
+DISEASE_TEMP_RANGE = (18.0, 30.0)
+
+# A day with less rain than this counts as dry.
+DRY_DAY_MAX_MM = 1.0
+
+# "Semer apres la premiere pluie utile (30mm)" (crops.json, arachide tips_fr):
+# effective rain is >= 30mm accumulated over a short window.
+SOWING_RAIN_MM = 30.0
+SOWING_WINDOW_DAYS = 3
+
+
+def _array(values) -> np.ndarray:
+    # Open-Meteo returns null for missing samples; float dtype turns them into NaN.
+    return np.asarray(values if values is not None else [], dtype=float)
+
+
+def _longest_run(mask: np.ndarray) -> int:
+    if not mask.any():
+        return 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def _leading_run(mask: np.ndarray) -> int:
+    breaks = np.flatnonzero(~mask)
+    return int(breaks[0]) if breaks.size else int(mask.size)
+
+
+def compute_indicators(hourly: dict, daily: dict, crops: dict) -> dict:
+    """Agro-climate indicators from Open-Meteo hourly and daily arrays.
+
+    - growing degree days per crop, hourly integration between the lower
+      (base) and upper (cap) bounds of the crop's ``temperature_range``
+    - disease-risk hours: RH >= DISEASE_RH_MIN with temperature inside
+      DISEASE_TEMP_RANGE, in total, per day and longest consecutive stretch
+    - dry spell: longest run of dry days and dry days from today onwards
+    - sowing trigger: first day the SOWING_WINDOW_DAYS rain total reaches
+      SOWING_RAIN_MM
+    """
+    temp = _array(hourly.get("temperature_2m"))
+    rh = _array(hourly.get("relative_humidity_2m"))
+    dates = daily.get("time") or []
+    rain = np.nan_to_num(_array(daily.get("precipitation_sum")))
+
+    # Growing degree days: every crop at once, (n_crops, n_hours).
+    crop_keys = [k for k, c in crops.items() if len(c.get("temperature_range") or []) == 2]
+    gdd = {}
+    if crop_keys and temp.size:
+        bounds = np.array([crops[k]["temperature_range"] for k in crop_keys], dtype=float)
+        base, cap = bounds[:, :1], bounds[:, 1:]
+        valid = ~np.isnan(temp)
+        t = temp[valid][np.newaxis, :]
+        degree_hours = np.clip(t, base, cap) - base
+        heat_hours = (t > cap).sum(axis=1)
+        for i, key in enumerate(crop_keys):
+            gdd[key] = {
+                "gdd": round(float(degree_hours[i].sum() / 24.0), 1),
+                "base_c": float(base[i, 0]),
+                "heat_stress_hours": int(heat_hours[i]),
+            }
+
+    # Disease-risk hours
+    n = min(temp.size, rh.size)
+    risk = (
+        (rh[:n] >= DISEASE_RH_MIN)
+        & (temp[:n] >= DISEASE_TEMP_RANGE[0])
+        & (temp[:n] <= DISEASE_TEMP_RANGE[1])
+    )
+    full_days = n // 24
+    risk_by_day = risk[: full_days * 24].reshape(full_days, 24).sum(axis=1)
+
+    # Dry spell
+    dry = rain < DRY_DAY_MAX_MM
+
+    # Sowing trigger: rolling rain total over the window ending on each day
+    window = min(SOWING_WINDOW_DAYS, rain.size)
+    if window:
+        cumulative = np.concatenate(([0.0], np.cumsum(rain)))
+        rolling = cumulative[window:] - cumulative[:-window]
+        rolling = np.concatenate((cumulative[1:window], rolling))
+        hit = np.flatnonzero(rolling >= SOWING_RAIN_MM)
+        max_rain = float(rolling.max())
+    else:
+        hit = np.array([], dtype=int)
+        max_rain = 0.0
+    trigger_index = int(hit[0]) if hit.size else None
+
+    return {
+        "growing_degree_days": gdd,
+        "disease_risk": {
+            "hours": int(risk.sum()),
+            "longest_stretch_hours": _longest_run(risk),
+            "hours_by_day": [
+                {"date": dates[i] if i < len(dates) else None, "hours": int(h)}
+                for i, h in enumerate(risk_by_day)
+            ],
+            "rule": f"RH>={DISEASE_RH_MIN:g}% and {DISEASE_TEMP_RANGE[0]:g}-{DISEASE_TEMP_RANGE[1]:g}C",
+        },
+        "dry_spell": {
+            "longest_days": _longest_run(dry),
+            "from_today_days": _leading_run(dry),
+            "threshold_mm": DRY_DAY_MAX_MM,
+        },
+        "sowing_trigger": {
+            "reached": trigger_index is not None,
+            "date": dates[trigger_index] if trigger_index is not None and trigger_index < len(dates) else None,
+            "max_rain_window_mm": round(max_rain, 1),
+            "threshold_mm": SOWING_RAIN_MM,
+            "window_days": SOWING_WINDOW_DAYS,
+        },
+    }
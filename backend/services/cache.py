@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry TTL and single-flight loads.
+
+    ``get_or_load`` coalesces concurrent misses for the same key: the first
+    caller runs the loader, everyone else awaits the same future. Failures are
+    not cached.
+
+    With ``max_bytes`` and a ``sizer`` (value -> approximate bytes), the cache
+    is also bounded by memory: least recently used entries are evicted until
+    the total fits.
+
+    ``ttl`` arguments may also be a function of the value being stored, for
+    values whose lifetime depends on their content.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 1024,
+        name: str = "cache",
+        max_bytes: int | None = None,
+        sizer: Callable[[Any], int] | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.bytes = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def lookup(self, key: Hashable, default: Any = None) -> Any:
+        """``get`` that also counts towards the hit/miss statistics."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | Callable[[Any], float] | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl(value) if callable(ttl) else ttl
+        size = self.sizer(value) if self.sizer else 0
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def invalidate(self, key: Hashable) -> None:
+        self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float | Callable[[Any], float] | None = None,
+    ) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The leading caller was cancelled, not us: take over the load.
+                if inflight.cancelled():
+                    return await self.get_or_load(key, loader, ttl)
+                raise
+            if value is _MISSING:
+                # Joined a get_many_or_load whose loader left this key out.
+                return await self.get_or_load(key, loader, ttl)
+            return value
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged.
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_many_or_load(
+        self,
+        keys: list[Hashable],
+        loader: Callable[[list[Hashable]], Awaitable[dict]],
+        ttl: float | Callable[[Any], float] | None = None,
+    ) -> dict:
+        """Batch variant of ``get_or_load``.
+
+        Cached keys are served directly, keys already being loaded are awaited,
+        and all remaining keys go to a single ``loader(missing)`` call that must
+        return a ``{key: value}`` dict. Keys the loader leaves out are absent
+        from the result (and not cached). As with ``get_or_load``, a caller
+        whose shared load was cancelled by its leading caller loads the keys
+        itself.
+        """
+        results: dict = {}
+        waiting: dict[Hashable, asyncio.Future] = {}
+        missing: list[Hashable] = []
+        for key in dict.fromkeys(keys):
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                results[key] = value
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            try:
+                loaded = await loader(missing)
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    future.exception()
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop(key, None)
+            for key, future in futures.items():
+                value = loaded.get(key, _MISSING)
+                if value is not _MISSING:
+                    self.set(key, value, ttl)
+                    results[key] = value
+                future.set_result(value)
+
+        orphaned = []
+        for key, future in waiting.items():
+            try:
+                value = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leading caller was cancelled, not us: take over the load.
+                if future.cancelled():
+                    orphaned.append(key)
+                    continue
+                raise
+            if value is not _MISSING:
+                results[key] = value
+        if orphaned:
+            results.update(await self.get_many_or_load(orphaned, loader, ttl))
+        return results
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
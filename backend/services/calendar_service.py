@@ -0,0 +1,126 @@
+import threading
+
+from config import settings
+from data_loader import store
+from services.payloads import json_bytes, strong_etag
+
+MONTH_RECOMMENDATIONS_FR = {
+    1: "Recolte tomate et oignon. Stockage cereales. Preparation pepinieres.",
+    2: "Recolte tomate/oignon continue. Debut preparation des sols.",
+    3: "Preparation sols. Riz irrigue possible en Vallee du Fleuve.",
+    4: "Preparation sols intensive. Achat semences et intrants.",
+    5: "Debut semis arachide/mil/mais en zones precoces. Preparation pepinieres.",
+    6: "Semis toutes cultures pluviales: arachide, mil, riz, mais, niebe.",
+    7: "Croissance active. Surveillance ravageurs (chenille legionnaire). Desherbage.",
+    8: "Croissance. Recolte precoce mil. Traitement phytosanitaire si necessaire.",
+    9: "Recolte mil. Arachide/riz/mais en maturation. Surveillance marches.",
+    10: "Grandes recoltes: arachide, riz, niebe, mais. Vente ou stockage.",
+    11: "Fin recolte arachide. Debut saison seche. Preparation maraichage.",
+    12: "Stockage. Plantation tomate/oignon. Bilan saison et planification.",
+}
+
+MONTH_RECOMMENDATIONS_WO = {
+    1: "Natt tamaate ak soble. Teg cereale ci njeexe. Tegg pepiniyeer.",
+    2: "Natt tamaate/soble. Jotali suuf bi.",
+    3: "Jotali suuf. Riz irrigue ci Ganaar.",
+    4: "Jotali suuf bu meg. Jend mbuuru ak engere.",
+    5: "Door bey gerte/dugub/mbaxal. Tegg pepiniyeer.",
+    6: "Bey yeppa: gerte, dugub, malo, mbaxal, niebe.",
+    7: "Yokk. Saytu njuumte yi. Sotti njaxx.",
+    8: "Yokk. Natt dugub. Faral aartu ndimbal.",
+    9: "Natt dugub. Gerte/malo ci wettu. Saytu njeg.",
+    10: "Natt bu mag: gerte, malo, niebe, mbaxal. Jaay walla teg.",
+    11: "Jeex natt gerte. Door noor. Tegg ndar.",
+    12: "Teg. Bey tamaate/soble. Xool nawet bi te plan.",
+}
+
+
+# Pre-serialized calendars (body, ETag) for every known zone, rebuilt when the
+# reference data version changes.
+_calendars: dict[str, tuple[bytes, str]] = {}
+_version: str | None = None
+_lock = threading.Lock()
+
+
+def _crop_activities(crop: dict) -> dict[int, list[str]]:
+    """Month -> activities ("sowing", "harvest", "growing") for one crop."""
+    sowing = crop.get("sowing_month", [])
+    harvest = crop.get("harvest_month", [])
+    activities: dict[int, list[str]] = {}
+    for month_num in range(1, 13):
+        month = []
+        if month_num in sowing:
+            month.append("sowing")
+        if month_num in harvest:
+            month.append("harvest")
+        # Growing = between sowing and harvest, not sowing or harvest month
+        if sowing and harvest and max(sowing) < month_num < min(harvest):
+            month.append("growing")
+        if month:
+            activities[month_num] = month
+    return activities
+
+
+def build_calendar(zone: str, crops: dict, zones_data: dict) -> dict:
+    """Monthly calendar for a zone; unknown zones get every crop."""
+    zone_info = zones_data.get("zones", {}).get(zone)
+    zone_crops = set(zone_info["main_crops"] if zone_info else crops.keys())
+
+    in_zone = [
+        (crop_key, crop, _crop_activities(crop))
+        for crop_key, crop in crops.items()
+        if crop_key in zone_crops or crop.get("name_fr", "").lower() in zone_crops
+    ]
+
+    months = []
+    for month_num in range(1, 13):
+        months.append({
+            "month": month_num,
+            "recommendation_fr": MONTH_RECOMMENDATIONS_FR.get(month_num, ""),
+            "recommendation_wo": MONTH_RECOMMENDATIONS_WO.get(month_num, ""),
+            "crops": [
+                {
+                    "key": crop_key,
+                    "name_fr": crop.get("name_fr", crop_key),
+                    "name_wo": crop.get("name_wo", ""),
+                    "activities": activities[month_num],
+                }
+                for crop_key, crop, activities in in_zone
+                if month_num in activities
+            ],
+        })
+
+    return {
+        "zone": zone,
+        "zone_info": zone_info,
+        "calendar": months,
+    }
+
+
+def _serialize(calendar: dict) -> tuple[bytes, str]:
+    body = json_bytes(calendar)
+    return body, strong_etag(body)
+
+
+def zone_calendar(zone: str) -> tuple[bytes, str]:
+    """Serialized calendar and its strong ETag for ``zone``.
+
+    Every zone in zones.json and settings.ZONES is computed once per data
+    version; other names are built on demand (not cached, so arbitrary path
+    values cannot grow memory).
+    """
+    global _calendars, _version
+    snapshot = store.snapshot()
+    if snapshot.version != _version:
+        with _lock:
+            if snapshot.version != _version:
+                names = set(snapshot.zones.get("zones", {})) | set(settings.ZONES)
+                _calendars = {
+                    name: _serialize(build_calendar(name, snapshot.crops, snapshot.zones))
+                    for name in names
+                }
+                _version = snapshot.version
+    entry = _calendars.get(zone)
+    if entry is None:
+        entry = _serialize(build_calendar(zone, snapshot.crops, snapshot.zones))
+    return entry
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------- Durable forecast store ----------
+# The last good parsed forecast per location, in a local SQLite table shared
+# by every worker on the host and kept across restarts. weather_service reads
+# it behind the in-memory cache, so an instance that restarts, or that cannot
+# reach Open-Meteo, still answers with the latest forecast (and its as_of).
+
+Entry = tuple[float, dict]  # (fetched_at epoch seconds, parsed forecast)
+
+
+def _row_key(key: tuple[float, float]) -> str:
+    return f"{key[0]},{key[1]}"
+
+
+class ForecastStore:
+    """Rows older than ``max_age`` are neither served nor kept: they are
+    pruned every ``prune_every`` saves."""
+
+    name = "forecast_store"
+
+    def __init__(self, path: str, max_age: float, prune_every: int = 50):
+        self.path = path
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS forecasts (key TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    def _load_many(self, keys: list[tuple[float, float]]) -> dict[tuple[float, float], Entry]:
+        by_row = {_row_key(key): key for key in keys}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, data, fetched_at FROM forecasts WHERE fetched_at > ? AND key IN ({','.join('?' * len(by_row))})",
+                (time.time() - self.max_age, *by_row),
+            ).fetchall()
+        found = {by_row[row_key]: (fetched_at, json.loads(data)) for row_key, data, fetched_at in rows}
+        self.hits += len(found)
+        self.misses += len(by_row) - len(found)
+        return found
+
+    def _save_many(self, rows: list[tuple[str, str, float]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO forecasts (key, data, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at",
+                rows,
+            )
+            self._saves += 1
+            if self._saves % self.prune_every == 0:
+                self._db.execute("DELETE FROM forecasts WHERE fetched_at <= ?", (time.time() - self.max_age,))
+
+    async def load_many(self, keys: list[tuple[float, float]]) -> dict[tuple[float, float], Entry]:
+        """Stored entries for ``keys`` (absent when unknown or too old)."""
+        if not keys:
+            return {}
+        return await asyncio.to_thread(self._load_many, keys)
+
+    async def save_many(self, entries: dict[tuple[float, float], Entry]) -> None:
+        rows = [(_row_key(key), json.dumps(forecast), fetched_at) for key, (fetched_at, forecast) in entries.items()]
+        if rows:
+            await asyncio.to_thread(self._save_many, rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM forecasts")
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": size,
+            "ttl_seconds": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def open_store(path: str, max_age: float) -> ForecastStore:
+    """The store at ``path``, or an in-memory one (warm only while the
+    process lives) when the file cannot be opened, e.g. on a read-only disk."""
+    try:
+        return ForecastStore(path, max_age)
+    except sqlite3.Error as e:
+        logger.warning("Forecast store %s unavailable (%s); keeping forecasts in memory", path, e)
+        return ForecastStore(":memory:", max_age)
@@ -0,0 +1,85 @@
+import importlib.util
+import logging
+from urllib.parse import urlparse
+
+import anthropic
+import httpx
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_http: httpx.AsyncClient | None = None
+_anthropic: anthropic.AsyncAnthropic | None = None
+
+
+def _host_timeouts() -> dict[str, httpx.Timeout]:
+    return {
+        urlparse(settings.OPEN_METEO_BASE_URL).hostname: httpx.Timeout(settings.OPEN_METEO_TIMEOUT, connect=3.0),
+        urlparse(settings.ANTHROPIC_API_URL).hostname: httpx.Timeout(settings.ANTHROPIC_TIMEOUT, connect=5.0),
+    }
+
+
+async def _apply_host_timeout(request: httpx.Request) -> None:
+    timeout = _host_timeouts().get(request.url.host)
+    if timeout is not None:
+        request.extensions["timeout"] = timeout.as_dict()
+
+
+def http2_available() -> bool:
+    if not settings.HTTP2_ENABLED:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.HTTP_DEFAULT_TIMEOUT, connect=5.0),
+        event_hooks={"request": [_apply_host_timeout]},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Pooled client shared by all outbound calls (Open-Meteo, Anthropic).
+
+    Opened in the FastAPI lifespan and closed on shutdown; scripts that never
+    run the lifespan get a lazily-created instance.
+    """
+    global _http, _anthropic
+    if _http is None or _http.is_closed:
+        _http = _build_http_client()
+        _anthropic = None
+    return _http
+
+
+def get_anthropic() -> anthropic.AsyncAnthropic:
+    """The single Anthropic client, riding on the shared connection pool."""
+    global _anthropic
+    http = get_http_client()
+    if _anthropic is None:
+        _anthropic = anthropic.AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            base_url=settings.ANTHROPIC_API_URL,
+            http_client=http,
+        )
+    return _anthropic
+
+
+async def startup() -> None:
+    get_anthropic()
+
+
+async def shutdown() -> None:
+    global _http, _anthropic
+    _anthropic = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
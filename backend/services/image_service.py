@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import io
+import json
+
+from fastapi import UploadFile
+
+from config import settings
+from services.cache import TTLCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: images are then sent as uploaded
+    Image = ImageOps = None
+
+# ---------- Crop photo pipeline (/api/diagnose) ----------
+# Phone photos arrive at 5-12 MB. Before the vision call they are decoded
+# (JPEG at a reduced scale straight from the DCT), downscaled to
+# IMAGE_MAX_DIMENSION and re-encoded as compact JPEG/WebP in a worker thread.
+# Diagnoses are cached by the SHA-256 of the normalized image plus the
+# language, so the same photo sent again is answered without an LLM call; a
+# byte-identical upload does not even need decoding (``known_image``).
+# Perceptual hashes are deliberately not used as keys: blank or dark photos,
+# or leaves with similar gradients, would share one and get each other's
+# diagnosis.
+
+MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif", "WEBP": "image/webp"}
+OUTPUT_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class ImageTooLarge(Exception):
+    """The upload exceeds DIAGNOSE_MAX_UPLOAD_BYTES."""
+
+
+class PreparedImage:
+    """Image bytes ready for the Messages API, and the cache key of the picture."""
+
+    __slots__ = ("data", "media_type", "width", "height", "key", "original_bytes")
+
+    def __init__(self, data: bytes, media_type: str, width: int | None, height: int | None, key: str, original_bytes: int):
+        self.data = data
+        self.media_type = media_type
+        self.width = width
+        self.height = height
+        self.key = key
+        self.original_bytes = original_bytes
+
+    def summary(self) -> dict:
+        return {
+            "media_type": self.media_type,
+            "width": self.width,
+            "height": self.height,
+            "original_bytes": self.original_bytes,
+            "sent_bytes": len(self.data),
+        }
+
+
+async def read_upload(upload: UploadFile, max_bytes: int | None = None) -> bytes:
+    """The uploaded file, read in chunks and refused past ``max_bytes``."""
+    max_bytes = settings.DIAGNOSE_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge(f"Image too large (max {max_bytes // (1024 * 1024)} MB)")
+    chunks, size = [], 0
+    while chunk := await upload.read(READ_CHUNK_BYTES):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ImageTooLarge(f"Image too large (max {max_bytes // (1024 * 1024)} MB)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _sniff(data: bytes) -> str | None:
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def prepare_image(data: bytes, max_dimension: int | None = None) -> PreparedImage:
+    """Decode, downscale and re-encode ``data`` (blocking; see ``prepare_image_async``).
+
+    Raises ValueError for anything that is not a JPEG, PNG, GIF or WebP image.
+    The original bytes are kept when re-encoding would not make them smaller.
+    """
+    max_dimension = max_dimension or settings.IMAGE_MAX_DIMENSION
+    if Image is None:
+        media_type = _sniff(data)
+        if media_type is None:
+            raise ValueError("Unsupported image format (JPEG, PNG, GIF or WebP expected)")
+        return PreparedImage(data, media_type, None, None, "sha256:" + hashlib.sha256(data).hexdigest(), len(data))
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        source_format = img.format
+        if source_format not in MEDIA_TYPES:
+            raise ValueError("Unsupported image format (JPEG, PNG, GIF or WebP expected)")
+        resized = max(img.size) > max_dimension
+        if resized:
+            # JPEG: decode straight to the 1/2, 1/4 or 1/8 scale closest above the target
+            ratio = max_dimension / max(img.size)
+            img.draft("RGB", (int(img.width * ratio), int(img.height * ratio)))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        img = ImageOps.exif_transpose(img)
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError("Unreadable image (JPEG, PNG, GIF or WebP expected)") from None
+
+    pil_format, media_type = OUTPUT_FORMATS.get(settings.IMAGE_OUTPUT_FORMAT, OUTPUT_FORMATS["jpeg"])
+    out = io.BytesIO()
+    img.save(out, format=pil_format, quality=settings.IMAGE_QUALITY, optimize=True)
+    if not resized and out.tell() >= len(data):
+        data_out, media_type = data, MEDIA_TYPES[source_format]
+    else:
+        data_out = out.getvalue()
+    key = "sha256:" + hashlib.sha256(data_out).hexdigest()
+    return PreparedImage(data_out, media_type, img.width, img.height, key, len(data))
+
+
+async def upload_digest(data: bytes) -> str:
+    """SHA-256 of the raw upload, hashed off the event loop."""
+    return (await asyncio.to_thread(hashlib.sha256, data)).hexdigest()
+
+
+def known_image(digest: str) -> tuple[str, dict] | None:
+    """(image key, summary) of an upload already prepared, by its digest."""
+    return _prepared.get(digest)
+
+
+async def prepare_image_async(data: bytes, digest: str | None = None) -> PreparedImage:
+    """``prepare_image`` in a worker thread (Pillow releases the GIL while
+    decoding); remembered under ``digest`` for ``known_image``."""
+    prepared = await asyncio.to_thread(prepare_image, data)
+    if digest is not None:
+        _prepared.set(digest, (prepared.key, prepared.summary()))
+    return prepared
+
+
+# Upload digest -> (image key, summary): small entries, no image bytes.
+_prepared = TTLCache(ttl=settings.DIAGNOSIS_CACHE_TTL_SECONDS, max_entries=10_000, name="prepared_images")
+
+
+# Finished diagnoses keyed (image key, language).
+diagnosis_cache = TTLCache(
+    ttl=settings.DIAGNOSIS_CACHE_TTL_SECONDS,
+    max_entries=10_000,
+    name="diagnosis",
+    max_bytes=settings.DIAGNOSIS_CACHE_MAX_BYTES,
+    sizer=lambda entry: 256 + len(json.dumps(entry, ensure_ascii=False)),
+)
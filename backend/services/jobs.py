@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Receives progress updates ({"processed": 10, "total": 50, ...}) from a job.
+ProgressCallback = Callable[[dict], None]
+JobFunction = Callable[[ProgressCallback], Awaitable[Any]]
+
+
+class JobRegistry:
+    """In-process background jobs with pollable status.
+
+    ``submit`` starts the coroutine as an asyncio task and returns at once;
+    callers poll ``get(job_id)``. Finished jobs are kept for
+    ``JOB_RETENTION_SECONDS`` (and at most ``max_jobs``). Jobs live in the
+    worker that started them, so with several workers the status endpoint
+    must be served by the same one (sticky sessions or a single worker).
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: dict[str, dict] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._running_by_key: dict[str, str] = {}
+
+    def submit(self, kind: str, run: JobFunction, owner: str | None = None, dedupe_key: str | None = None) -> dict:
+        """Start ``run(progress)`` in the background. With ``dedupe_key``, a
+        job already running for that key is returned instead of a new one."""
+        if dedupe_key is not None:
+            running = self._running_by_key.get(dedupe_key)
+            if running is not None:
+                return self._jobs[running]
+        self._prune()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "running",
+            "owner": owner,
+            "created_at": time.time(),
+            "finished_at": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job_id] = job
+        if dedupe_key is not None:
+            self._running_by_key[dedupe_key] = job_id
+        self._tasks[job_id] = asyncio.create_task(self._run(job, run, dedupe_key))
+        return job
+
+    async def _run(self, job: dict, run: JobFunction, dedupe_key: str | None) -> None:
+        try:
+            job["result"] = await run(job["progress"].update)
+            job["status"] = "succeeded"
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            job["finished_at"] = time.time()
+            self._tasks.pop(job["id"], None)
+            if dedupe_key is not None:
+                self._running_by_key.pop(dedupe_key, None)
+
+    def get(self, job_id: str) -> dict | None:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - settings.JOB_RETENTION_SECONDS
+        finished = [j for j in self._jobs.values() if j["finished_at"] is not None]
+        for job in finished:
+            if job["finished_at"] < cutoff:
+                del self._jobs[job["id"]]
+        overflow = len(self._jobs) - self.max_jobs + 1
+        if overflow > 0:
+            for job in sorted(finished, key=lambda j: j["finished_at"])[:overflow]:
+                self._jobs.pop(job["id"], None)
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def public_view(job: dict) -> dict:
+    """Job status as returned by the API (without the owner)."""
+    return {k: v for k, v in job.items() if k != "owner"}
+
+
+jobs = JobRegistry()
@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from config import settings
+from services import tracing
+
+# ---------- LLM admission control ----------
+# Every Anthropic call (agents/llm.py: create_message) takes a slot here first.
+# At most LLM_MAX_CONCURRENCY calls run at once, and at most the model's limit
+# per model. Callers beyond that wait in a priority queue: SMS before chat
+# before background jobs, round-robin between users within a priority so one
+# user's fan-out cannot starve the others. Interactive callers are rejected
+# fast when LLM_MAX_QUEUE callers of their priority or higher already wait
+# (429: a chat backlog does not turn SMS away) or when their wait exceeds
+# LLM_QUEUE_TIMEOUT (503); background work just waits, its own concurrency
+# already bounds it.
+
+SMS = 0
+CHAT = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {SMS: "sms", CHAT: "chat", BACKGROUND: "background"}
+
+
+class LLMOverloaded(Exception):
+    """An LLM call was refused by admission control."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+_context: contextvars.ContextVar[tuple[int, str]] = contextvars.ContextVar("llm_context", default=(CHAT, "-"))
+
+
+@contextmanager
+def llm_context(priority: int, user: str | None = None) -> Iterator[None]:
+    """Priority and fairness key for the LLM calls made inside the block
+    (and in tasks it spawns)."""
+    token = _context.set((priority, user or "-"))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("model", "future", "enqueued")
+
+    def __init__(self, model: str, future: asyncio.Future):
+        self.model = model
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        model_concurrency: int,
+        model_limits: dict[str, int] | None = None,
+        max_queue: int = 200,
+        queue_timeout: float = 10.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.model_limits = model_limits or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.running_by_model: dict[str, int] = {}
+        # priority -> user -> waiters (the user order is the round-robin order)
+        self._queues: dict[int, OrderedDict[str, deque[_Waiter]]] = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._queued = dict.fromkeys(PRIORITY_NAMES, 0)
+
+    def _has_capacity(self, model: str) -> bool:
+        limit = self.model_limits.get(model, self.model_concurrency)
+        return self.running < self.max_concurrency and self.running_by_model.get(model, 0) < limit
+
+    def _start(self, model: str) -> None:
+        self.running += 1
+        self.running_by_model[model] = self.running_by_model.get(model, 0) + 1
+        tracing.llm_in_flight.set(self.running_by_model[model], model=model)
+
+    def _release(self, model: str) -> None:
+        self.running -= 1
+        self.running_by_model[model] -= 1
+        tracing.llm_in_flight.set(self.running_by_model[model], model=model)
+        self._dispatch()
+
+    def queued(self, priority: int | None = None) -> int:
+        return sum(self._queued.values()) if priority is None else self._queued[priority]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters: highest priority first, one call per
+        user per pass. A lower priority may only take a model that no higher
+        priority caller is still waiting for."""
+        blocked: set[str] = set()
+        for priority, users in self._queues.items():
+            progressed = True
+            while users and progressed and self.running < self.max_concurrency:
+                progressed = False
+                for user in list(users):
+                    waiters = users[user]
+                    waiter = waiters[0]
+                    if waiter.model in blocked or not self._has_capacity(waiter.model):
+                        continue
+                    waiters.popleft()
+                    users.move_to_end(user)
+                    if not waiters:
+                        del users[user]
+                    self._dequeued(priority)
+                    self._start(waiter.model)
+                    waiter.future.set_result(None)
+                    progressed = True
+            blocked.update(waiters[0].model for waiters in users.values())
+
+    def _dequeued(self, priority: int) -> None:
+        self._queued[priority] -= 1
+        tracing.llm_queue_depth.set(self._queued[priority], priority=PRIORITY_NAMES[priority])
+
+    def _remove(self, priority: int, user: str, waiter: _Waiter) -> None:
+        waiters = self._queues[priority].get(user)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority][user]
+            self._dequeued(priority)
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[None]:
+        """Hold one concurrency slot for ``model`` for the duration of the block."""
+        priority, user = _context.get()
+        name = PRIORITY_NAMES[priority]
+        ahead = sum(self._queued[p] for p in PRIORITY_NAMES if p <= priority)
+
+        if ahead == 0 and self._has_capacity(model):
+            self._start(model)
+            tracing.record("llm_queue", 0.0, priority=name, outcome="admitted")
+        else:
+            if priority != BACKGROUND and ahead >= self.max_queue:
+                tracing.record("llm_queue", 0.0, priority=name, outcome="rejected")
+                raise LLMOverloaded(429, "Too many requests in the LLM queue, retry shortly", self.queue_timeout)
+
+            waiter = _Waiter(model, asyncio.get_running_loop().create_future())
+            self._queues[priority].setdefault(user, deque()).append(waiter)
+            self._queued[priority] += 1
+            tracing.llm_queue_depth.set(self._queued[priority], priority=name)
+            self._dispatch()
+            timeout = None if priority == BACKGROUND else self.queue_timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Granted just as we gave up: hand the slot back.
+                    self._release(model)
+                else:
+                    waiter.future.cancel()
+                    self._remove(priority, user, waiter)
+                waited = time.perf_counter() - waiter.enqueued
+                if isinstance(e, asyncio.CancelledError):
+                    tracing.record("llm_queue", waited, priority=name, outcome="cancelled")
+                    raise
+                tracing.record("llm_queue", waited, priority=name, outcome="timeout")
+                raise LLMOverloaded(503, "LLM capacity exhausted, retry shortly", self.queue_timeout) from None
+            tracing.record("llm_queue", time.perf_counter() - waiter.enqueued, priority=name, outcome="admitted")
+
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "running_by_model": {m: n for m, n in self.running_by_model.items() if n},
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+def _parse_limits(spec: str) -> dict[str, int]:
+    """"model=8,other-model=4" -> {"model": 8, "other-model": 4}"""
+    limits = {}
+    for item in spec.split(","):
+        model, _, limit = item.partition("=")
+        if model.strip() and limit.strip():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    model_concurrency=settings.LLM_MODEL_CONCURRENCY,
+    model_limits=_parse_limits(settings.LLM_MODEL_LIMITS),
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+)
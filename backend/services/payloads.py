@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable
+
+from fastapi import Request, Response
+
+from config import settings
+from data_loader import store
+
+# Clients may keep a copy but must revalidate it (cheap with If-None-Match).
+REVALIDATE = "public, no-cache"
+
+
+def json_bytes(data) -> bytes:
+    """Compact UTF-8 JSON, as FastAPI's JSONResponse would render it."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+# ---------- Static reference payloads ----------
+# /api/crops, /markets, /zones and /cities return data that only changes when
+# data/*.json is edited. Each response is serialized once per data version and
+# kept as identity, gzip and (if the ``brotli`` package is installed) brotli
+# bytes, so a request is a dict lookup plus conditional-request checks.
+
+MIN_COMPRESS_BYTES = 512   # smaller bodies are sent as-is
+MAX_PROJECTIONS = 64       # distinct ?fields= variants kept per data version
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+class Payload:
+    """One pre-encoded JSON response and its compressed variants."""
+
+    def __init__(self, data, version: str, modified: float):
+        self.version = version
+        self.last_modified = formatdate(int(modified), usegmt=True)
+        self.body = json_bytes(data)
+        self.etag = strong_etag(self.body)
+        # encoding -> (bytes, ETag); each representation gets its own strong ETag
+        self.variants: dict[str, tuple[bytes, str]] = {"identity": (self.body, self.etag)}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = (gzip.compress(self.body, compresslevel=9, mtime=0), self.etag[:-1] + '-gz"')
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(self.body, quality=11), self.etag[:-1] + '-br"')
+
+    def variant(self, accept_encoding: str | None) -> tuple[str, bytes, str]:
+        """(encoding, body, etag) best matching an Accept-Encoding header."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return (encoding, *self.variants[encoding])
+        return ("identity", *self.variants["identity"])
+
+    def not_modified(self, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        if if_none_match:
+            # Any of our representations validates the cached copy
+            return any(etag_matches(if_none_match, etag) for _, etag in self.variants.values())
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since >= parsedate_to_datetime(self.last_modified)
+        return False
+
+
+def _accepted_encodings(header: str | None) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def project(data, fields: tuple[str, ...], containers: tuple[str, ...]):
+    """Keep only ``fields`` in each record. Records are the values of ``data``
+    (or of ``data[c]`` for each container ``c``), in a dict or a list."""
+
+    def pick(records):
+        if isinstance(records, dict):
+            return {k: {f: r[f] for f in fields if f in r} for k, r in records.items()}
+        return [{f: r[f] for f in fields if f in r} for r in records]
+
+    if not containers:
+        return pick(data)
+    return {k: pick(v) if k in containers else v for k, v in data.items()}
+
+
+def _reference(attr: str):
+    def load():
+        snapshot = store.snapshot()
+        return snapshot.version, snapshot.modified, getattr(snapshot, attr)
+    return load
+
+
+_STARTED = time.time()
+
+# name -> (loader returning (version, modified, data), record containers)
+STATIC_SOURCES: dict[str, tuple[Callable[[], tuple[str, float, Any]], tuple[str, ...]]] = {
+    "crops": (_reference("crops"), ()),
+    "markets": (_reference("markets"), ("markets", "prices")),
+    "zones": (_reference("zones"), ("zones",)),
+    "cities": (lambda: ("settings", _STARTED, settings.CITIES), ()),
+}
+
+_payloads: dict[tuple[str, tuple[str, ...] | None], Payload] = {}
+_payloads_lock = threading.Lock()
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """Normalized ``?fields=`` value (sorted, de-duplicated), None for all fields."""
+    if not fields:
+        return None
+    names = tuple(sorted({f.strip() for f in fields.split(",") if f.strip()}))
+    return names or None
+
+
+def static_payload(name: str, fields: tuple[str, ...] | None = None) -> Payload:
+    load, containers = STATIC_SOURCES[name]
+    version, modified, data = load()
+    key = (name, fields)
+    payload = _payloads.get(key)
+    if payload is not None and payload.version == version:
+        return payload
+
+    payload = Payload(project(data, fields, containers) if fields else data, version, modified)
+    with _payloads_lock:
+        for stale in [k for k, p in _payloads.items() if k[0] == name and p.version != version]:
+            del _payloads[stale]
+        # Full payloads are always kept; projections up to a bound so that
+        # arbitrary ?fields= values cannot grow memory.
+        if fields is None or sum(1 for k in _payloads if k[1] is not None) < MAX_PROJECTIONS:
+            _payloads[key] = payload
+    return payload
+
+
+def static_response(request: Request, name: str, fields: str | None = None) -> Response:
+    """Serve a static payload with ETag/Last-Modified validation and compression."""
+    payload = static_payload(name, parse_fields(fields))
+    encoding, body, etag = payload.variant(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": payload.last_modified,
+        "Cache-Control": f"public, max-age={settings.STATIC_CACHE_MAX_AGE_SECONDS}",
+        "Vary": "Accept-Encoding",
+    }
+    if payload.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
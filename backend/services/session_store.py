@@ -0,0 +1,232 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from config import settings
+from services.cache import TTLCache
+
+# ---------- Conversation sessions ----------
+# A session keeps the last turns of a conversation (so agents see what was
+# already said), the agents that answered (for follow-up routing) and recent
+# tool results (so a follow-up reuses them instead of re-running the tool).
+# Everything is trimmed to SESSION_TOKEN_BUDGET, oldest first.
+
+
+def estimate_tokens(value) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(json.dumps(value, ensure_ascii=False, default=str)) // 4 + 1
+
+
+def session_key(session_id: str, channel: str, user_id: str | None = None) -> str:
+    """Store key: sessions are per channel, and per user when logged in, so a
+    client-supplied id cannot read someone else's conversation."""
+    return f"{channel}:{user_id or '-'}:{session_id}"
+
+
+def new_session() -> dict:
+    return {"turns": [], "tools": [], "agents": [], "city": None}
+
+
+def history(session: dict) -> list[dict]:
+    """Prior turns as Messages API messages (user/assistant pairs)."""
+    return [{"role": t["role"], "content": t["content"]} for t in session["turns"]]
+
+
+class ToolMemo:
+    """Tool results from earlier turns, reusable while younger than ``max_age``.
+
+    Inputs are compared after lower-casing string values, so "Dakar" and
+    "dakar" share a result. Results that carry an ``error`` are not kept.
+    """
+
+    def __init__(self, entries: list[dict] | None = None, max_age: float | None = None):
+        self.max_age = settings.SESSION_TOOL_TTL_SECONDS if max_age is None else max_age
+        now = time.time()
+        self._entries: dict[str, dict] = {
+            e["key"]: e for e in entries or [] if now - e["at"] < self.max_age
+        }
+        self.reused = 0
+
+    @staticmethod
+    def _key(tool: str, tool_input: dict) -> str:
+        normalized = {k: v.strip().lower() if isinstance(v, str) else v for k, v in tool_input.items()}
+        return tool + ":" + json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+    def get(self, tool: str, tool_input: dict):
+        entry = self._entries.get(self._key(tool, tool_input))
+        if entry is None or time.time() - entry["at"] >= self.max_age:
+            return None
+        self.reused += 1
+        return entry["result"]
+
+    def put(self, tool: str, tool_input: dict, result) -> None:
+        if isinstance(result, dict) and "error" in result:
+            return
+        key = self._key(tool, tool_input)
+        self._entries[key] = {"key": key, "tool": tool, "result": result, "at": time.time()}
+
+    def entries(self) -> list[dict]:
+        return sorted(self._entries.values(), key=lambda e: e["at"])
+
+
+def record_turn(
+    session: dict,
+    message: str,
+    response: str,
+    agents: list[str],
+    city: str | None,
+    memo: ToolMemo | None = None,
+    budget: int | None = None,
+) -> dict:
+    """Append a user/assistant turn, then trim to the token budget: stale
+    tool results go first, then the oldest turns (one pair at a time)."""
+    budget = settings.SESSION_TOKEN_BUDGET if budget is None else budget
+    if response:  # the Messages API rejects empty assistant turns
+        session["turns"] += [{"role": "user", "content": message}, {"role": "assistant", "content": response}]
+    session["agents"] = agents
+    session["city"] = city or session.get("city")
+    if memo is not None:
+        session["tools"] = memo.entries()
+
+    while session["tools"] and estimate_tokens(session) > budget:
+        session["tools"].pop(0)
+    while len(session["turns"]) > 2 and estimate_tokens(session) > budget:
+        del session["turns"][:2]
+    return session
+
+
+# ---------- Stores ----------
+
+class SessionStore(ABC):
+    """Where sessions live between requests. ``load`` returns None for an
+    unknown or idle-expired session; ``save`` resets the idle timer."""
+
+    name = "sessions"
+
+    @abstractmethod
+    async def load(self, key: str) -> dict | None: ...
+
+    @abstractmethod
+    async def save(self, key: str, session: dict) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+    async def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU of serialized sessions with an idle TTL, bounded by
+    count and bytes. Sessions are not shared between workers."""
+
+    def __init__(self, max_sessions: int, idle_ttl: float, max_bytes: int | None = None):
+        self._cache = TTLCache(ttl=idle_ttl, max_entries=max_sessions, name=self.name, max_bytes=max_bytes, sizer=len)
+
+    async def load(self, key: str) -> dict | None:
+        raw = self._cache.lookup(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, key: str, session: dict) -> None:
+        self._cache.set(key, json.dumps(session, ensure_ascii=False, default=str))
+
+    async def delete(self, key: str) -> None:
+        self._cache.invalidate(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite key-value table, shared by every worker on
+    the host and kept across restarts. Least recently saved sessions beyond
+    ``max_sessions`` and idle ones are pruned every ``prune_every`` saves."""
+
+    def __init__(self, path: str, max_sessions: int, idle_ttl: float, prune_every: int = 100):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.prune_every = prune_every
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data TEXT NOT NULL, touched REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)")
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE key = ? AND touched > ?", (key, time.time() - self.idle_ttl)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def _save(self, key: str, data: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (key, data, touched) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data = excluded.data, touched = excluded.touched",
+                (key, data, time.time()),
+            )
+            self._saves += 1
+            if self._saves % self.prune_every == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._db.execute("DELETE FROM sessions WHERE touched <= ?", (time.time() - self.idle_ttl,))
+        self._db.execute(
+            "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY touched DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    async def load(self, key: str) -> dict | None:
+        return await asyncio.to_thread(self._load, key)
+
+    async def save(self, key: str, session: dict) -> None:
+        await asyncio.to_thread(self._save, key, json.dumps(session, ensure_ascii=False, default=str))
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": size,
+            "max_entries": self.max_sessions,
+            "ttl_seconds": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _build_store() -> SessionStore:
+    if settings.SESSION_STORE == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_DB_PATH, settings.SESSION_MAX_SESSIONS, settings.SESSION_IDLE_TTL_SECONDS)
+    return MemorySessionStore(settings.SESSION_MAX_SESSIONS, settings.SESSION_IDLE_TTL_SECONDS, settings.SESSION_MAX_BYTES)
+
+
+sessions: SessionStore = _build_store()
@@ -0,0 +1,197 @@
+from datetime import datetime
+
+from config import settings
+from data_loader import get_crop, get_crop_key, get_diseases_for_crop, get_prices, load_crops
+from services.weather_service import ForecastUnavailable, get_weather_forecast, format_weather_code
+
+# Deterministic replies for structured SMS commands (no LLM call).
+# Each reply is assembled from short segments, most important first, and
+# segments that would overflow the SMS budget are dropped.
+SMS_BUDGET = 320
+
+MONTHS = ["jan", "fev", "mar", "avr", "mai", "juin", "juil", "aout", "sep", "oct", "nov", "dec"]
+
+TEMPLATES = {
+    "fr": {
+        "meteo_head": "Meteo {city}: {desc}, {tmin:g}-{tmax:g}C, pluie {rain:g}mm.",
+        "meteo_week": "7j: {total:g}mm, {rain_days} j de pluie, max {tmax:g}C.",
+        "meteo_dry": "{dry} j secs a venir: arrosez.",
+        "meteo_sow": "Pluie utile 30mm le {date}: semez apres.",
+        "meteo_disease": "{hours}h humides: surveillez les maladies.",
+        "prices_head": "Prix {crop} (FCFA/{unit}):",
+        "prices_city": "{city} {avg} ({min}-{max})",
+        "prices_trend": "Tendance: {trend}.",
+        "crop_head": "{name}: semis {sowing}, recolte {harvest}, cycle {c0}-{c1}j.",
+        "crop_water": "Eau {w0}-{w1}mm, sol {soil}.",
+        "crop_varieties": "Varietes: {varieties}.",
+        "disease_head": "{crop} - maladies:",
+        "disease_item": "{name}: {treatment}",
+        "disease_none": "Pas de maladie repertoriee pour {crop}.",
+        "unknown_crop": "Culture inconnue: {crop}. Cultures: {crops}.",
+        "unknown_city": "Ville inconnue: {city}. Ex: METEO DAKAR, METEO KAOLACK.",
+        "meteo_unavailable": "Meteo {city} indisponible pour le moment. Reessayez plus tard.",
+        "meteo_as_of": "(donnees du {date})",
+        "missing_crop": "Precisez la culture. Ex: {command} ARACHIDE.",
+        "help": "AgriAgent: METEO <ville>, PRIX <culture>, CULTURE <culture>, MALADIE <culture>. Ou posez votre question librement.",
+    },
+    "wo": {
+        "meteo_head": "Taw {city}: {desc}, {tmin:g}-{tmax:g}C, taw {rain:g}mm.",
+        "meteo_week": "7 fan: {total:g}mm, {rain_days} fan yu taw, max {tmax:g}C.",
+        "meteo_dry": "{dry} fan yu wow: roosal.",
+        "meteo_sow": "Taw bu am solo 30mm ci {date}: bey ginnaaw.",
+        "meteo_disease": "{hours}h yu tooy: saytul jegge yi.",
+        "prices_head": "Njeg {crop} (FCFA/{unit}):",
+        "prices_city": "{city} {avg} ({min}-{max})",
+        "prices_trend": "Yoon: {trend}.",
+        "crop_head": "{name}: bey {sowing}, natt {harvest}, {c0}-{c1} fan.",
+        "crop_water": "Ndox {w0}-{w1}mm, suuf {soil}.",
+        "crop_varieties": "Variete: {varieties}.",
+        "disease_head": "{crop} - jegge:",
+        "disease_item": "{name}: {treatment}",
+        "disease_none": "Amul jegge bu nu xam ci {crop}.",
+        "unknown_crop": "Xamuma {crop}. Tool yi: {crops}.",
+        "unknown_city": "Xamuma dekk bii: {city}. Ex: METEO DAKAR.",
+        "meteo_unavailable": "Jawwu {city} amul leegi. Jeemaatal ci kanam.",
+        "meteo_as_of": "(xibaar yu {date})",
+        "missing_crop": "Wax tool bi. Ex: {command} GERTE.",
+        "help": "AgriAgent: METEO <dekk>, NJEG <tool>, TOOL <tool>, JEGGE <tool>. Walla laaj sa laaj.",
+    },
+}
+
+
+def _fit(segments: list[str], budget: int = SMS_BUDGET) -> str:
+    text = ""
+    for segment in segments:
+        candidate = f"{text} {segment}" if text else segment
+        if len(candidate) > budget:
+            continue
+        text = candidate
+    return text
+
+
+def _single_word(text: str) -> bool:
+    return len(text.split()) == 1
+
+
+def _months(months: list[int]) -> str:
+    return "-".join(MONTHS[m - 1] for m in months if 1 <= m <= 12) or "?"
+
+
+async def _meteo(city: str, t: dict, lang: str) -> str:
+    try:
+        weather = await get_weather_forecast(city)
+    except ValueError:
+        return t["unknown_city"].format(city=city)
+    except ForecastUnavailable:
+        return t["meteo_unavailable"].format(city=city.title())
+
+    days = weather.get("forecast") or []
+    today = days[0] if days else {}
+    summary = weather.get("summary", {})
+    segments = [
+        t["meteo_head"].format(
+            city=city.title(),
+            desc=format_weather_code(today.get("weather_code"))[lang],
+            tmin=today.get("temp_min") or 0,
+            tmax=today.get("temp_max") or 0,
+            rain=today.get("precipitation_mm") or 0,
+        ),
+        t["meteo_week"].format(
+            total=summary.get("total_precipitation_mm", 0),
+            rain_days=summary.get("rain_days", 0),
+            tmax=summary.get("max_temperature", 0),
+        ),
+    ]
+    if weather.get("stale"):
+        # Older than the latest model run (e.g. Open-Meteo unreachable): say when it is from.
+        as_of = datetime.fromisoformat(weather["as_of"])
+        segments.insert(1, t["meteo_as_of"].format(date=as_of.strftime("%d/%m %Hh")))
+    indicators = weather.get("indicators")
+    if indicators:
+        if indicators["sowing_trigger"]["reached"]:
+            segments.append(t["meteo_sow"].format(date=indicators["sowing_trigger"]["date"]))
+        elif indicators["dry_spell"]["from_today_days"] >= 3:
+            segments.append(t["meteo_dry"].format(dry=indicators["dry_spell"]["from_today_days"]))
+        if indicators["disease_risk"]["hours"] >= 12:
+            segments.append(t["meteo_disease"].format(hours=indicators["disease_risk"]["hours"]))
+    return _fit(segments)
+
+
+def _prices(crop_key: str, crop: dict, t: dict, lang: str) -> str:
+    prices = get_prices(crop_key)
+    if not prices:
+        return t["unknown_crop"].format(crop=crop_key, crops=", ".join(load_crops()))
+    by_city = sorted(prices["prices_by_city"].items(), key=lambda kv: kv[1]["avg"], reverse=True)
+    cities = ", ".join(t["prices_city"].format(city=c.title(), **p) for c, p in by_city)
+    segments = [
+        t["prices_head"].format(crop=crop[f"name_{lang}"], unit=prices.get("unit", "kg")) + " " + cities,
+        t["prices_trend"].format(trend=prices.get("trend", "?")),
+        prices.get(f"season_note_{lang}", ""),
+    ]
+    return _fit([s for s in segments if s])
+
+
+def _crop_advice(crop: dict, t: dict, lang: str) -> str:
+    cycle = crop.get("cycle_days") or ["?", "?"]
+    water = crop.get("water_needs_mm") or ["?", "?"]
+    segments = [
+        t["crop_head"].format(
+            name=crop[f"name_{lang}"],
+            sowing=_months(crop.get("sowing_month", [])),
+            harvest=_months(crop.get("harvest_month", [])),
+            c0=cycle[0],
+            c1=cycle[-1],
+        ),
+        crop.get(f"tips_{lang}", ""),
+        t["crop_water"].format(w0=water[0], w1=water[-1], soil="/".join(crop.get("soil_type", [])) or "?"),
+        t["crop_varieties"].format(varieties=", ".join(v["name"] for v in crop.get("varieties", [])[:3])),
+    ]
+    return _fit([s for s in segments if s])
+
+
+def _diseases(crop_key: str, crop: dict, t: dict, lang: str) -> str:
+    diseases = get_diseases_for_crop(crop_key)
+    name = crop[f"name_{lang}"]
+    if not diseases:
+        return t["disease_none"].format(crop=name)
+    segments = [t["disease_head"].format(crop=name)]
+    for d in diseases:
+        segments.append(t["disease_item"].format(name=d[f"name_{lang}"], treatment=d[f"treatment_{lang}"]))
+    return _fit(segments)
+
+
+async def respond_to_command(command: str, args: dict) -> str | None:
+    """Build the SMS reply for a parsed command, or None if the LLM should answer.
+
+    A command word followed by a sentence ("prix de l'arachide a Kaolack ?")
+    is free text: when the argument is not a known city or crop it goes to
+    the LLM, and only a bare one-word argument gets the "unknown" hint.
+    """
+    lang = args.get("language") if args.get("language") in TEMPLATES else "fr"
+    t = TEMPLATES[lang]
+
+    if command == "NDIMBAL":
+        return t["help"]
+    if command == "METEO":
+        city = args.get("city") or "dakar"
+        if city.strip() not in settings.CITIES and not _single_word(city):
+            return None
+        return await _meteo(city, t, lang)
+    if command not in ("NJEG", "TOOL", "JEGGE"):
+        return None
+
+    crop_name = args.get("crop")
+    if not crop_name:
+        return t["missing_crop"].format(command=args.get("keyword") or command)
+    crop_key = get_crop_key(crop_name)
+    if not crop_key:
+        if not _single_word(crop_name):
+            return None
+        return t["unknown_crop"].format(crop=crop_name, crops=", ".join(load_crops()))
+    crop = get_crop(crop_key)
+
+    if command == "NJEG":
+        return _prices(crop_key, crop, t, lang)
+    if command == "TOOL":
+        return _crop_advice(crop, t, lang)
+    return _diseases(crop_key, crop, t, lang)
@@ -1,4 +1,6 @@
 from agents.orchestrator import orchestrate
+from config import settings
+from services.sms_responder import respond_to_command
 
 
 async def handle_incoming_sms(from_number: str, body: str) -> dict:
@@ -8,10 +10,22 @@ async def handle_incoming_sms(from_number: str, body: str) -> dict:
     # Detect language and command from SMS
     command, args = parse_sms_command(message)
 
-    # Route through orchestrator
+    # Structured commands are answered from data, without any LLM call
+    reply = await respond_to_command(command, args)
+    if reply is not None:
+        return {
+            "to": from_number,
+            "message": truncate_for_sms(reply),
+            "language": args["language"],
+            "agents_used": ["sms_command"],
+        }
+
+    # Free text: route through orchestrator (a "city" that is really the rest
+    # of a sentence is left for the agents to read from the message)
+    city = args.get("city")
     result = await orchestrate(
         message=message,
-        city=args.get("city"),
+        city=city if city in settings.CITIES else None,
         language=args.get("language"),
         session_id=from_number,
         channel="sms",
@@ -42,18 +56,20 @@ def parse_sms_command(message: str) -> tuple[str, dict]:
     command = parts[0] if parts else ""
     arg = parts[1].strip() if len(parts) > 1 else ""
 
-    # Wolof commands
-    wolof_commands = {"METEO", "JEGGE", "NJEG", "TOOL", "NDIMBAL"}
+    # Wolof commands (METEO is shared, so it answers in French)
+    wolof_commands = {"JEGGE", "NJEG", "TOOL", "NDIMBAL"}
     # French equivalents
     french_commands = {"METEO": "METEO", "MALADIE": "JEGGE", "PRIX": "NJEG", "CULTURE": "TOOL", "AIDE": "NDIMBAL"}
 
+    # Language follows the keyword the farmer typed (PRIX -> fr, NJEG -> wo)
+    is_wolof = command in wolof_commands
+
     if command in french_commands:
         command = french_commands[command]
-
-    is_wolof = command in wolof_commands
     language = "wo" if is_wolof else "fr"
 
-    args = {"language": language}
+    # The keyword as typed, for replies that quote it back (PRIX, not NJEG)
+    args = {"language": language, "keyword": parts[0] if parts else ""}
 
     if command == "METEO":
         args["city"] = arg.lower() if arg else "dakar"
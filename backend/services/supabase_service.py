@@ -1,11 +1,74 @@
-from supabase import create_client, Client
+import asyncio
+import time
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 from config import settings
+from services import tracing
+from services.http_client import http2_available
+
+_client: AsyncClient | None = None
+_http: httpx.AsyncClient | None = None
+_lock = asyncio.Lock()
+
+_REST_PREFIX = "/rest/v1/"
+
+
+async def _mark_start(request: httpx.Request) -> None:
+    request.extensions["trace_started"] = time.perf_counter()
+
 
-_client: Client | None = None
+async def _record_query(response: httpx.Response) -> None:
+    request = response.request
+    started = request.extensions.get("trace_started")
+    if started is None:
+        return
+    path = request.url.path
+    table = path.split(_REST_PREFIX, 1)[1] if _REST_PREFIX in path else path
+    tracing.record(
+        "supabase", time.perf_counter() - started, started=started,
+        table=table, method=request.method, status=str(response.status_code),
+    )
 
 
-def get_supabase() -> Client:
-    global _client
+def _build_http_client() -> httpx.AsyncClient:
+    # Own pool so a burst of DB queries cannot starve the LLM/Open-Meteo pool.
+    # PostgREST requests carry absolute URLs and headers, so no base_url here.
+    return httpx.AsyncClient(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT, connect=5.0),
+        follow_redirects=True,
+        # Time every query (until response headers) for tracing.
+        event_hooks={"request": [_mark_start], "response": [_record_query]},
+    )
+
+
+async def get_supabase() -> AsyncClient:
+    """The shared async Supabase client (non-blocking, pooled connections).
+
+    Queries are awaited: ``await sb.table("profiles").select("*").execute()``.
+    """
+    global _client, _http
     if _client is None:
-        _client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+        async with _lock:
+            if _client is None:
+                _http = _build_http_client()
+                _client = await acreate_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SERVICE_ROLE_KEY,
+                    options=AsyncClientOptions(httpx_client=_http),
+                )
     return _client
+
+
+async def shutdown() -> None:
+    global _client, _http
+    _client = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
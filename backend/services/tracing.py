@@ -0,0 +1,204 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# ---------- Metrics ----------
+# A minimal Prometheus registry: latency histograms and counters keyed by
+# label values, rendered in the text exposition format on /metrics.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(s[0]), s[1], s[2]) for k, s in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            for bound, n in zip(self.buckets, counts):
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {n}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, key)} {value:g}" for key, value in snapshot)
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[tuple(labels.get(n, "") for n in self.label_names)] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_labels(self.label_names, key)} {value:g}" for key, value in sorted(self._values.items()))
+        return lines
+
+
+# One latency histogram per span kind; span labels must match these names.
+HISTOGRAMS = {
+    "http": Histogram("agriagent_http_request_duration_seconds", "HTTP request latency (until response headers)", ("method", "route", "status")),
+    "stage": Histogram("agriagent_orchestrator_stage_duration_seconds", "Orchestrator stage latency", ("stage",)),
+    "llm": Histogram("agriagent_llm_request_duration_seconds", "Anthropic Messages call latency", ("model", "mode")),
+    "tool": Histogram("agriagent_tool_duration_seconds", "Agent tool execution latency", ("agent", "tool", "status")),
+    "supabase": Histogram("agriagent_supabase_request_duration_seconds", "Supabase (PostgREST) request latency", ("table", "method", "status")),
+    "open_meteo": Histogram("agriagent_open_meteo_request_duration_seconds", "Open-Meteo request latency", ("mode", "status")),
+    "llm_queue": Histogram("agriagent_llm_queue_wait_seconds", "Time LLM calls waited for admission", ("priority", "outcome")),
+}
+
+llm_tokens = Counter("agriagent_llm_tokens_total", "Anthropic tokens by model and kind", ("model", "kind"))
+llm_queue_depth = Gauge("agriagent_llm_queue_depth", "LLM calls waiting for admission", ("priority",))
+llm_in_flight = Gauge("agriagent_llm_in_flight", "LLM calls currently running", ("model",))
+
+
+def _render_caches(caches: list[dict]) -> list[str]:
+    gauges = {
+        "size": ("agriagent_cache_entries", "gauge", "Entries currently cached"),
+        "bytes": ("agriagent_cache_bytes", "gauge", "Approximate bytes cached (memory-bounded caches)"),
+        "hits": ("agriagent_cache_hits_total", "counter", "Cache hits"),
+        "misses": ("agriagent_cache_misses_total", "counter", "Cache misses"),
+        "coalesced": ("agriagent_cache_coalesced_total", "counter", "Lookups that joined an in-flight load"),
+        "evictions": ("agriagent_cache_evictions_total", "counter", "Entries evicted for size"),
+    }
+    lines = []
+    for field, (name, kind, help) in gauges.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{_escape(c["name"])}"}} {c.get(field) or 0}' for c in caches]
+    return lines
+
+
+def render_metrics(caches: list[dict] = ()) -> str:
+    """All metrics in the Prometheus text format; ``caches`` are TTLCache.stats() dicts."""
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines += histogram.render()
+    for metric in (llm_tokens, llm_queue_depth, llm_in_flight):
+        lines += metric.render()
+    lines += _render_caches(list(caches))
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Spans ----------
+# ``span`` times a block and feeds the matching histogram. When a trace is
+# being collected for the current request (``collect``), each span is also
+# recorded with its start offset, duration, labels, extra attributes and the
+# enclosing span, which is what ends up in orchestrate()'s metadata.
+
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: list[dict] = []
+
+    def summary(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("trace", default=None)
+_parent: contextvars.ContextVar[str | None] = contextvars.ContextVar("trace_parent", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Trace]:
+    """Record every span in the current context (and tasks it spawns)."""
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def record(kind: str, seconds: float, started: float | None = None, attrs: dict | None = None, **labels) -> None:
+    """Observe an already-measured duration (``started`` is a perf_counter value)."""
+    HISTOGRAMS[kind].observe(seconds, **labels)
+    trace = _trace.get()
+    if trace is not None:
+        started = time.perf_counter() - seconds if started is None else started
+        entry = {"span": kind, **labels, "start_ms": round((started - trace.started) * 1000, 1), "ms": round(seconds * 1000, 1)}
+        parent = _parent.get()
+        if parent:
+            entry["parent"] = parent
+        if attrs:
+            entry.update(attrs)
+        trace.spans.append(entry)
+
+
+@contextmanager
+def span(kind: str, **labels) -> Iterator[dict]:
+    """Time a block as a ``kind`` span. Yields a dict for extra trace-only
+    attributes (token counts, sizes) that are not metric labels."""
+    attrs: dict = {}
+    started = time.perf_counter()
+    token = _parent.set(":".join([kind, *map(str, labels.values())]))
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        record(kind, time.perf_counter() - started, started=started, attrs=attrs, **labels)
@@ -0,0 +1,77 @@
+import json
+
+from config import settings
+from services.cache import TTLCache
+from services.supabase_service import get_supabase
+
+# ---------- Per-user read-through cache ----------
+# Profile, parcelles and cultures change only through the api_protected
+# mutation endpoints, which call ``invalidate`` after each write. Entries are
+# keyed (kind, user_id), sized by their JSON length and expire after
+# USER_CACHE_TTL_SECONDS, which also bounds staleness across workers (each
+# worker invalidates only its own copy).
+
+PROFILE = "profile"
+PARCELLES = "parcelles"
+CULTURES = "cultures"
+
+ACTIVE_STATUSES = ("planned", "sown", "growing", "harvesting")
+
+user_cache = TTLCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    max_entries=100_000,
+    name="user_data",
+    max_bytes=settings.USER_CACHE_MAX_BYTES,
+    sizer=lambda value: 64 + len(json.dumps(value, default=str)),
+)
+
+# Write generation per user, bumped by every invalidation: a load that
+# overlapped a write by the same user is not kept, so a read racing a write
+# can never re-cache the pre-write rows. Other users' writes don't matter.
+_writes: dict[str, int] = {}
+
+
+async def _cached(kind: str, user_id: str, load):
+    key = (kind, user_id)
+    writes = _writes.get(user_id, 0)
+    value = await user_cache.get_or_load(key, load)
+    if _writes.get(user_id, 0) != writes:
+        user_cache.invalidate(key)
+    return value
+
+
+async def get_profile(user_id: str) -> dict | None:
+    async def load():
+        sb = await get_supabase()
+        result = await sb.table("profiles").select("*").eq("id", user_id).single().execute()
+        return result.data
+    return await _cached(PROFILE, user_id, load)
+
+
+async def get_parcelles(user_id: str) -> list[dict]:
+    """All of the user's parcelles, newest first."""
+    async def load():
+        sb = await get_supabase()
+        result = await sb.table("parcelles").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        return result.data or []
+    return await _cached(PARCELLES, user_id, load)
+
+
+async def get_cultures(user_id: str) -> list[dict]:
+    """All of the user's cultures, newest first (filter the list, don't mutate it)."""
+    async def load():
+        sb = await get_supabase()
+        result = await sb.table("cultures").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        return result.data or []
+    return await _cached(CULTURES, user_id, load)
+
+
+async def get_active_cultures(user_id: str) -> list[dict]:
+    return [c for c in await get_cultures(user_id) if c.get("status") in ACTIVE_STATUSES]
+
+
+def invalidate(user_id: str, *kinds: str) -> None:
+    """Drop cached ``kinds`` (PROFILE, PARCELLES, CULTURES) for a user after a write."""
+    _writes[user_id] = _writes.get(user_id, 0) + 1
+    for kind in kinds:
+        user_cache.invalidate((kind, user_id))
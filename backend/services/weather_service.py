@@ -1,29 +1,267 @@
-import httpx
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
 from config import settings
+from data_loader import load_crops
+from services.agro_indicators import compute_indicators
+from services import tracing
+from services.cache import TTLCache
+from services.forecast_store import Entry, open_store
+from services.http_client import get_http_client
 
+logger = logging.getLogger(__name__)
 
-async def get_weather_forecast(city: str) -> dict:
-    """Fetch 7-day weather forecast from Open-Meteo for any city worldwide."""
-    key = city.lower().strip()
-    city_data = settings.CITIES.get(key)
+# ---------- Forecast cache and store ----------
+# Parsed forecasts keyed by (lat, lon) live in a per-process memory cache in
+# front of the durable per-host store, as (fetched_at, forecast) entries:
+# - fresh (fetched since the latest Open-Meteo model update): served from
+#   memory until the next update;
+# - stale but younger than WEATHER_STALE_SERVE_SECONDS: served at once while
+#   a background refresh fetches a new one (retried at most every
+#   WEATHER_REFRESH_RETRY_SECONDS while Open-Meteo is down);
+# - older or unknown: fetched inline. If Open-Meteo fails, any stored
+#   forecast is served anyway; with none, ForecastUnavailable is raised.
+# Served forecasts carry ``as_of`` (fetch time, UTC) and ``stale``.
+
+forecast_cache = TTLCache(
+    ttl=settings.WEATHER_CACHE_TTL_SECONDS,
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+    name="weather_forecast",
+)
+forecast_store = open_store(settings.WEATHER_STORE_PATH, settings.WEATHER_STORE_MAX_AGE_SECONDS)
+
+
+class ForecastUnavailable(Exception):
+    """Open-Meteo failed and no forecast is stored for the location."""
+
+
+def _last_update() -> float:
+    """Epoch time of the latest Open-Meteo model update (plus publication lag)."""
+    now = time.time()
+    return now - ((now - settings.WEATHER_CACHE_UPDATE_LAG_SECONDS) % settings.WEATHER_CACHE_TTL_SECONDS)
+
+
+def _forecast_ttl() -> float:
+    """Seconds until the next Open-Meteo model update (plus publication lag)."""
+    ttl = _last_update() + settings.WEATHER_CACHE_TTL_SECONDS - time.time()
+    return max(ttl, 60.0)
+
+
+def _is_fresh(fetched_at: float) -> bool:
+    return fetched_at >= _last_update()
+
+
+def _entry_ttl(entry: Entry) -> float:
+    return _forecast_ttl() if _is_fresh(entry[0]) else settings.WEATHER_REFRESH_RETRY_SECONDS
+
+
+def _served(label: str | None, entry: Entry) -> dict:
+    fetched_at, forecast = entry
+    return {
+        "city": label,
+        **forecast,
+        "as_of": datetime.fromtimestamp(fetched_at, timezone.utc).isoformat(timespec="seconds"),
+        "stale": not _is_fresh(fetched_at),
+    }
+
+
+def forecast_cache_stats() -> dict:
+    return forecast_cache.stats()
+
+
+def forecast_store_stats() -> dict:
+    return forecast_store.stats()
+
+
+_FORECAST_PARAMS = {
+    "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,windspeed_10m_max,weathercode",
+    "hourly": "temperature_2m,relative_humidity_2m,precipitation",
+    "current_weather": "true",
+    "timezone": "Africa/Dakar",
+    "forecast_days": 7,
+}
+
+# Locations per Open-Meteo request when fetching in bulk (keeps URLs short).
+BATCH_SIZE = 50
+
+
+def _resolve_city(city: str) -> dict:
+    city_data = settings.CITIES.get(city.lower().strip())
     if not city_data:
         raise ValueError(f"Ville inconnue: {city}. Villes disponibles: {', '.join(settings.CITIES.keys())}")
+    return city_data
+
+
+def _cache_key(location: dict) -> tuple[float, float]:
+    return (round(location["lat"], 4), round(location["lon"], 4))
+
+
+async def get_weather_forecast(city: str) -> dict:
+    """Fetch 7-day weather forecast from Open-Meteo for any city worldwide.
 
+    Served from memory or the forecast store when possible (see above);
+    concurrent misses for the same city share a single upstream request.
+    Raises ValueError for an unknown city and ForecastUnavailable when there
+    is no forecast to serve.
+    """
+    city_data = _resolve_city(city)
+    key = _cache_key(city_data)
+    entries = await _entries({key: city_data})
+    return _served(city, entries[key])
+
+
+async def get_weather_forecasts(locations: list[str | tuple[float, float]]) -> list[dict]:
+    """Fetch forecasts for many locations in as few Open-Meteo calls as possible.
+
+    Each location is a city key from ``settings.CITIES`` or a ``(lat, lon)``
+    pair. Cached and stored locations are served without a request; the rest
+    are requested in chunks of ``BATCH_SIZE`` comma-separated coordinates.
+    Results come back in input order. Raises ValueError for unknown city
+    names and ForecastUnavailable if any location has no forecast to serve.
+    """
+    resolved = []
+    for loc in locations:
+        if isinstance(loc, str):
+            resolved.append((loc, _resolve_city(loc)))
+        else:
+            lat, lon = loc
+            resolved.append((None, {"lat": float(lat), "lon": float(lon), "region": None}))
+
+    entries = await _entries({_cache_key(data): data for _, data in resolved})
+    return [_served(label, entries[_cache_key(data)]) for label, data in resolved]
+
+
+async def _entries(locations: dict[tuple[float, float], dict]) -> dict[tuple[float, float], Entry]:
+    """Entries for every location: memory, then the store, then Open-Meteo."""
+
+    async def load(missing: list[tuple[float, float]]) -> dict:
+        stored = await forecast_store.load_many(missing)
+        now = time.time()
+        found, stale, to_fetch = {}, {}, {}
+        for key in missing:
+            entry = stored.get(key)
+            if entry is not None and _is_fresh(entry[0]):
+                found[key] = entry
+            elif entry is not None and now - entry[0] < settings.WEATHER_STALE_SERVE_SECONDS:
+                found[key] = stale[key] = entry
+            else:
+                to_fetch[key] = locations[key]
+        if stale:
+            _refresh_in_background({key: locations[key] for key in stale})
+        if to_fetch:
+            try:
+                found.update(await _fetch_and_store(to_fetch))
+            except Exception as e:
+                unavailable = [key for key in to_fetch if key not in stored]
+                if unavailable:
+                    raise ForecastUnavailable(
+                        f"Prévisions météo indisponibles pour {len(unavailable)} lieu(x), réessayez plus tard"
+                    ) from e
+                # An old forecast beats none while Open-Meteo is down.
+                logger.warning("Open-Meteo failed (%s); serving %d stored forecast(s)", e, len(to_fetch))
+                found.update({key: stored[key] for key in to_fetch})
+        return found
+
+    entries = await forecast_cache.get_many_or_load(list(locations), load, ttl=_entry_ttl)
+    if len(entries) < len(locations):
+        raise ForecastUnavailable("Prévisions météo indisponibles, réessayez plus tard")
+    return entries
+
+
+async def _fetch_and_store(locations: dict[tuple[float, float], dict]) -> dict[tuple[float, float], Entry]:
+    """Fetch ``locations`` from Open-Meteo and write them to the store."""
+    keys = list(locations)
+    if len(keys) == 1:
+        forecasts = [await _fetch_forecast(locations[keys[0]])]
+    else:
+        chunks = [keys[i:i + BATCH_SIZE] for i in range(0, len(keys), BATCH_SIZE)]
+        parsed = await asyncio.gather(*(_fetch_forecast_batch([locations[k] for k in chunk]) for chunk in chunks))
+        forecasts = [forecast for chunk in parsed for forecast in chunk]
+    fetched_at = time.time()
+    entries = {key: (fetched_at, forecast) for key, forecast in zip(keys, forecasts)}
+    await forecast_store.save_many(entries)
+    return entries
+
+
+# ---------- Background refresh ----------
+
+_refreshing: set[tuple[float, float]] = set()
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def _refresh_in_background(locations: dict[tuple[float, float], dict]) -> None:
+    """Refetch stale locations without making the caller wait; a location
+    already being refreshed is skipped."""
+    pending = {key: data for key, data in locations.items() if key not in _refreshing}
+    if not pending:
+        return
+    _refreshing.update(pending)
+    task = asyncio.create_task(_refresh(pending))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def _refresh(locations: dict[tuple[float, float], dict]) -> None:
+    try:
+        entries = await _fetch_and_store(locations)
+    except Exception as e:
+        logger.warning("Forecast refresh failed for %d location(s): %s", len(locations), e)
+        return
+    finally:
+        _refreshing.difference_update(locations)
+    for key, entry in entries.items():
+        forecast_cache.set(key, entry, ttl=_entry_ttl)
+
+
+async def shutdown() -> None:
+    for task in list(_refresh_tasks):
+        task.cancel()
+    await asyncio.gather(*_refresh_tasks, return_exceptions=True)
+    await forecast_store.close()
+
+
+async def _get_open_meteo(params: dict, mode: str, locations: int = 1):
+    started = time.perf_counter()
+    status = "error"
+    try:
+        resp = await get_http_client().get(settings.OPEN_METEO_BASE_URL, params=params)
+        status = str(resp.status_code)
+        resp.raise_for_status()
+        return resp.json()
+    finally:
+        tracing.record(
+            "open_meteo", time.perf_counter() - started, started=started,
+            attrs={"locations": locations}, mode=mode, status=status,
+        )
+
+
+async def _fetch_forecast(city_data: dict) -> dict:
+    params = {"latitude": city_data["lat"], "longitude": city_data["lon"], **_FORECAST_PARAMS}
+
+    data = await _get_open_meteo(params, mode="single")
+
+    return _parse_forecast(data, city_data)
+
+
+async def _fetch_forecast_batch(locations: list[dict]) -> list[dict]:
+    """One Open-Meteo call for several locations; returns parsed forecasts in order."""
     params = {
-        "latitude": city_data["lat"],
-        "longitude": city_data["lon"],
-        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,windspeed_10m_max,weathercode",
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation",
-        "current_weather": "true",
-        "timezone": "Africa/Dakar",
-        "forecast_days": 7,
+        "latitude": ",".join(str(loc["lat"]) for loc in locations),
+        "longitude": ",".join(str(loc["lon"]) for loc in locations),
+        **_FORECAST_PARAMS,
     }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(settings.OPEN_METEO_BASE_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+    data = await _get_open_meteo(params, mode="batch", locations=len(locations))
+
+    # A single location comes back as an object, several as a list.
+    if isinstance(data, dict):
+        data = [data]
+    return [_parse_forecast(item, loc) for item, loc in zip(data, locations)]
+
 
+def _parse_forecast(data: dict, city_data: dict) -> dict:
     current = data.get("current_weather", {})
     daily = data.get("daily", {})
 
@@ -44,8 +282,7 @@ async def get_weather_forecast(city: str) -> dict:
     rain_days = sum(1 for d in forecast_days if d["precipitation_mm"] and d["precipitation_mm"] > 1)
 
     return {
-        "city": city,
-        "region": city_data["region"],
+        "region": city_data.get("region"),
         "lat": city_data["lat"],
         "lon": city_data["lon"],
         "current": {
@@ -59,6 +296,7 @@ async def get_weather_forecast(city: str) -> dict:
             "max_temperature": max_temp,
             "rain_days": rain_days,
         },
+        "indicators": compute_indicators(data.get("hourly", {}), daily, load_crops()),
     }
 
 
@@ -0,0 +1,64 @@
+import asyncio
+
+from agents import alerts_agent
+from services.weather_service import ForecastUnavailable
+
+PROFILES = {
+    "u1": {"id": "u1", "city": "Dakar", "zone": "niayes"},
+    "u2": {"id": "u2", "city": "touba", "zone": "bassin_arachidier"},
+    "u3": {"id": "u3", "city": "kaolack", "zone": "bassin_arachidier"},
+}
+FORECAST = {"forecast": [{"date": "2026-07-01", "temp_min": 24, "temp_max": 33, "precipitation_mm": 12}]}
+
+
+def _patch_batch(monkeypatch, failing_city):
+    contexts: dict[str, str] = {}
+    inserted: list[dict] = []
+
+    async def get_supabase():
+        return None
+
+    async def cultures(sb, user_ids):
+        return {u: [{"user_id": u, "crop_key": "mil", "status": "en_croissance"}] for u in PROFILES}
+
+    async def profiles(sb, user_ids):
+        return {u: PROFILES[u] for u in user_ids}
+
+    async def forecasts(cities):
+        raise ForecastUnavailable(f"No forecast for {failing_city}")
+
+    async def forecast(city):
+        if city == failing_city:
+            raise ForecastUnavailable(f"No forecast for {city}")
+        return FORECAST
+
+    async def generate(user_id, context):
+        contexts[user_id] = context
+        return [{"type": "calendar", "title_fr": f"Alerte {user_id}"}], True
+
+    async def insert(sb, rows):
+        inserted.extend(rows)
+        return rows
+
+    monkeypatch.setattr(alerts_agent, "get_supabase", get_supabase)
+    monkeypatch.setattr(alerts_agent, "_active_cultures_by_user", cultures)
+    monkeypatch.setattr(alerts_agent, "_profiles", profiles)
+    monkeypatch.setattr(alerts_agent, "get_weather_forecasts", forecasts)
+    monkeypatch.setattr(alerts_agent, "get_weather_forecast", forecast)
+    monkeypatch.setattr(alerts_agent, "_generate_alerts", generate)
+    monkeypatch.setattr(alerts_agent, "_insert_alerts", insert)
+    return contexts, inserted
+
+
+def test_batch_survives_one_city_without_forecast(monkeypatch):
+    contexts, inserted = _patch_batch(monkeypatch, failing_city="touba")
+
+    stats = asyncio.run(alerts_agent.generate_alerts_batch())
+
+    assert stats["users"] == 3
+    assert stats["processed"] == 3
+    assert stats["forecasts"] == 2
+    assert sorted(row["user_id"] for row in inserted) == ["u1", "u2", "u3"]
+    assert "Meteo 3 jours" in contexts["u1"]
+    assert "Meteo 3 jours" not in contexts["u2"]
+    assert "Meteo 3 jours" in contexts["u3"]
@@ -0,0 +1,67 @@
+import hashlib
+import time
+
+import pytest
+from jose import JWTError, jwt
+
+import auth
+from auth import _verify, token_cache
+from config import settings
+
+SECRET = "test-secret"
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(settings, "SUPABASE_JWT_SECRET", SECRET)
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def _token(sub="user-1", expires_in=3600, secret=SECRET) -> str:
+    return jwt.encode({"sub": sub, "exp": int(time.time() + expires_in)}, secret, algorithm="HS256")
+
+
+def _cached_ttl(token: str) -> float | None:
+    entry = token_cache._entries.get(hashlib.sha256(token.encode()).digest())
+    return None if entry is None else entry[0] - time.monotonic()
+
+
+def test_token_is_cached_until_its_exp():
+    token = _token(expires_in=120)
+    assert _verify(token) == "user-1"
+    assert 110 < _cached_ttl(token) <= 120
+
+
+def test_cache_lifetime_is_capped():
+    token = _token(expires_in=10 * 86400)
+    assert _verify(token) == "user-1"
+    assert settings.AUTH_CACHE_MAX_TTL_SECONDS - 10 < _cached_ttl(token) <= settings.AUTH_CACHE_MAX_TTL_SECONDS
+
+
+def test_cached_token_skips_verification(monkeypatch):
+    token = _token()
+    _verify(token)
+
+    def decode(*args, **kwargs):
+        raise AssertionError("signature checked again")
+
+    monkeypatch.setattr(auth.jwt, "decode", decode)
+    assert _verify(token) == "user-1"
+    assert token_cache.hits == 1
+
+
+def test_rejected_tokens_are_not_cached():
+    expired = _token(expires_in=-10)
+    forged = _token(secret="someone-else")
+    for token in (expired, forged):
+        with pytest.raises(JWTError):
+            _verify(token)
+        assert _cached_ttl(token) is None
+
+
+def test_unverified_tokens_are_not_cached():
+    token = _token(secret="someone-else")
+    assert _verify(token, verify_signature=False) == "user-1"
+    assert _cached_ttl(token) is None
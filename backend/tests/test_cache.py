@@ -0,0 +1,114 @@
+import asyncio
+
+from services.cache import TTLCache
+
+
+def test_get_or_load_joining_a_batch_that_left_its_key_out():
+    async def scenario():
+        cache = TTLCache(ttl=60)
+        release = asyncio.Event()
+
+        async def batch_loader(keys):
+            await release.wait()
+            return {"dakar": "sec"}  # "touba" left out
+
+        async def single_loader():
+            return "pluie"
+
+        batch = asyncio.create_task(cache.get_many_or_load(["dakar", "touba"], batch_loader))
+        await asyncio.sleep(0)
+        single = asyncio.create_task(cache.get_or_load("touba", single_loader))
+        await asyncio.sleep(0)
+        release.set()
+        return await batch, await single, cache
+
+    batch, single, cache = asyncio.run(scenario())
+    assert batch == {"dakar": "sec"}
+    assert single == "pluie"
+    assert cache.get("touba") == "pluie"
+    assert cache.coalesced == 1
+
+
+def test_concurrent_misses_share_one_load():
+    calls = 0
+
+    async def scenario():
+        cache = TTLCache(ttl=60)
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"temp": 31}
+
+        values = await asyncio.gather(*(cache.get_or_load("dakar", loader) for _ in range(10)))
+        return values, cache
+
+    values, cache = asyncio.run(scenario())
+    assert calls == 1
+    assert all(v == {"temp": 31} for v in values)
+    assert (cache.misses, cache.coalesced) == (1, 9)
+
+
+def test_failed_load_is_shared_but_not_cached():
+    async def scenario():
+        cache = TTLCache(ttl=60)
+        attempts = 0
+
+        async def loader():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0.01)
+            if attempts == 1:
+                raise RuntimeError("upstream down")
+            return "ok"
+
+        first = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+        return first, await cache.get_or_load("k", loader), attempts
+
+    first, retried, attempts = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in first)
+    assert retried == "ok"
+    assert attempts == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=lambda value: 120)
+    now[0] += 60
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_memory_bound_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, max_bytes=250, sizer=len)
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 100)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", "z" * 100)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.bytes == 200
+    assert cache.evictions == 1
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = TTLCache(ttl=60, max_bytes=1000, sizer=len)
+    cache.set("a", "x" * 400)
+    cache.set("a", "x" * 10)
+    cache.invalidate("missing")
+    assert cache.bytes == 10
+    cache.invalidate("a")
+    assert (cache.bytes, len(cache)) == (0, 0)
+
+
+def test_max_entries_bound():
+    cache = TTLCache(ttl=60, max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    assert (len(cache), cache.get("a"), cache.evictions) == (2, None, 1)
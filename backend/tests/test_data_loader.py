@@ -0,0 +1,37 @@
+import json
+
+from data_loader import DATA_FILES, ReferenceStore
+
+
+def _write(data_dir, name, content):
+    (data_dir / f"{name}.json").write_text(json.dumps(content))
+
+
+def _store(tmp_path):
+    for name in DATA_FILES:
+        _write(tmp_path, name, {})
+    _write(tmp_path, "crops", {"mil": {"name_fr": "Mil", "name_wo": "Dugub"}})
+    return ReferenceStore(tmp_path, check_interval=0.0)
+
+
+def test_missing_file_keeps_the_previous_snapshot(tmp_path):
+    store = _store(tmp_path)
+    before = store.snapshot()
+
+    (tmp_path / "crops.json").unlink()
+    assert store.snapshot() is before
+
+    _write(tmp_path, "crops", {"mil": {"name_fr": "Mil"}, "sorgho": {"name_fr": "Sorgho"}})
+    after = store.snapshot()
+    assert after.version != before.version
+    assert "sorgho" in after.crops
+
+
+def test_unparsable_file_keeps_the_previous_snapshot(tmp_path):
+    store = _store(tmp_path)
+    before = store.snapshot()
+
+    (tmp_path / "markets.json").write_text("{")
+    store.reload()
+    assert store.snapshot() is before
+    assert before.crop_key("dugub") == "mil"
@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from services.image_service import prepare_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(color, size=(640, 480), dot=None) -> bytes:
+    img = Image.new("RGB", size, color)
+    if dot:
+        img.putpixel(dot, (255, 255, 255))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=95)
+    return out.getvalue()
+
+
+def test_dark_photos_do_not_share_a_key():
+    black = prepare_image(_jpeg((0, 0, 0)), max_dimension=256)
+    near_black = prepare_image(_jpeg((6, 6, 6)), max_dimension=256)
+    dotted = prepare_image(_jpeg((0, 0, 0), dot=(320, 240)), max_dimension=256)
+    assert len({black.key, near_black.key, dotted.key}) == 3
+
+
+def test_same_photo_gets_the_same_key():
+    data = _jpeg((40, 120, 30))
+    first, again = prepare_image(data, max_dimension=256), prepare_image(data, max_dimension=256)
+    assert first.key == again.key
+    assert first.key.startswith("sha256:")
+    assert max(first.width, first.height) == 256
+
+
+def test_unsupported_bytes_are_refused():
+    with pytest.raises(ValueError):
+        prepare_image(b"not an image")
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from services.llm_scheduler import BACKGROUND, CHAT, SMS, LLMOverloaded, LLMScheduler, _parse_limits, llm_context
+
+
+def _scheduler(**kwargs) -> LLMScheduler:
+    return LLMScheduler(**{"max_concurrency": 1, "model_concurrency": 1, "max_queue": 2, "queue_timeout": 1.0, **kwargs})
+
+
+async def _hold(scheduler, release: asyncio.Event, model="m"):
+    """Take the only slot until ``release`` is set."""
+    with llm_context(CHAT, "holder"):
+        async with scheduler.slot(model):
+            await release.wait()
+
+
+async def _call(scheduler, priority, user, order: list, model="m"):
+    with llm_context(priority, user):
+        async with scheduler.slot(model):
+            order.append(user)
+
+
+def test_full_queue_rejects_with_429():
+    async def scenario():
+        scheduler, release, order = _scheduler(), asyncio.Event(), []
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(_call(scheduler, CHAT, f"c{i}", order)) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded) as rejected:
+            await _call(scheduler, CHAT, "c-extra", order)
+        release.set()
+        await asyncio.gather(holder, *waiting)
+        return rejected.value, order
+
+    rejected, order = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert order == ["c0", "c1"]
+
+
+def test_chat_backlog_does_not_reject_sms():
+    async def scenario():
+        scheduler, release, order = _scheduler(), asyncio.Event(), []
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        chats = [asyncio.create_task(_call(scheduler, CHAT, f"c{i}", order)) for i in range(2)]
+        await asyncio.sleep(0)
+        sms = asyncio.create_task(_call(scheduler, SMS, "s0", order))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, sms, *chats)
+        return order
+
+    assert asyncio.run(scenario()) == ["s0", "c0", "c1"]
+
+
+def test_queue_timeout_is_503():
+    async def scenario():
+        scheduler, release = _scheduler(queue_timeout=0.05), asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(LLMOverloaded) as timed_out:
+                await _call(scheduler, CHAT, "late", [])
+        finally:
+            release.set()
+            await holder
+        return timed_out.value, scheduler
+
+    timed_out, scheduler = asyncio.run(scenario())
+    assert timed_out.status_code == 503
+    assert scheduler.queued() == 0
+    assert scheduler.running == 0
+
+
+def test_background_waits_past_the_timeout():
+    async def scenario():
+        scheduler, release, order = _scheduler(queue_timeout=0.01), asyncio.Event(), []
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        job = asyncio.create_task(_call(scheduler, BACKGROUND, "job", order))
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(holder, job)
+        return order
+
+    assert asyncio.run(scenario()) == ["job"]
+
+
+def test_users_are_served_round_robin():
+    async def scenario():
+        scheduler, release, order = _scheduler(max_queue=10), asyncio.Event(), []
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        calls = [asyncio.create_task(_call(scheduler, CHAT, user, order)) for user in ("a", "a", "a", "b", "c")]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *calls)
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "c", "a", "a"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler, release = _scheduler(), asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_call(scheduler, CHAT, "gone", []))
+        await asyncio.sleep(0)
+        assert scheduler.queued(CHAT) == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        queued = scheduler.queued(CHAT)
+        release.set()
+        await holder
+        return queued, scheduler.running
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_parse_limits():
+    assert _parse_limits("a=8, b = 4,,c=") == {"a": 8, "b": 4}
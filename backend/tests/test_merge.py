@@ -0,0 +1,78 @@
+from agents.merge import SMS_MAX_CHARS, choose_strategy, find_conflicts, merge_sections
+
+
+def _result(agent, response):
+    return {"agent": agent, "response": response}
+
+
+def test_look_alike_words_are_not_advice():
+    results = [
+        _result("weather", "Pas de pluie cette semaine, vendredi sera sec. Les plantes souffrent de la chaleur."),
+        _result("agro", "Semez le mil dès les premières pluies. Le traitement des semences n'est pas utile."),
+    ]
+    assert find_conflicts(results) == []
+
+
+def test_negation_applies_to_its_own_verb_only():
+    results = [
+        _result("weather", "Semez maintenant : les jeunes plants ne supportent pas la chaleur de mai."),
+        _result("agro", "Vous pouvez semer l'arachide cette semaine."),
+    ]
+    assert find_conflicts(results) == []
+
+
+def test_opposite_advice_is_a_conflict():
+    results = [
+        _result("weather", "Ne semez pas avant la prochaine pluie."),
+        _result("agro", "Semez le mil maintenant."),
+        _result("market", "Don't sell your peanuts yet, wait for better prices."),
+    ]
+    assert find_conflicts(results) == ["sow"]
+
+
+def test_english_and_wolof_negations():
+    results = [
+        _result("market", "Bul jaay sa gerte tey."),
+        _result("agro", "Sell now while prices are high."),
+    ]
+    assert find_conflicts(results) == ["sell"]
+
+
+def test_choose_strategy():
+    agree = [_result("weather", "Semez demain."), _result("agro", "Semez le mil.")]
+    disagree = [_result("weather", "Evitez de semer demain."), _result("agro", "Semez le mil.")]
+    assert choose_strategy("auto", agree) == ("structured", [])
+    assert choose_strategy("auto", disagree) == ("llm", ["sow"])
+    assert choose_strategy("structured", disagree) == ("structured", [])
+    assert choose_strategy("llm", agree) == ("llm", [])
+
+
+def test_web_sections_follow_fixed_order():
+    results = [
+        _result("market", "Arachide : 300 FCFA/kg."),
+        _result("weather", "**Sec** toute la semaine."),
+        _result("agro", "   "),
+    ]
+    merged = merge_sections(results, "fr", "web")
+    assert merged == "### 🌦️ Météo\n\n**Sec** toute la semaine.\n\n### 💰 Marchés\n\nArachide : 300 FCFA/kg."
+
+
+def test_sms_sections_share_the_budget():
+    short = "Pluie faible jeudi."
+    long = " ".join(f"Phrase {i} sur le prix de l'arachide a Kaolack." for i in range(20))
+    merged = merge_sections([_result("market", long), _result("weather", short)], "fr", "sms")
+    lines = merged.split("\n")
+    assert len(merged) <= SMS_MAX_CHARS
+    assert lines[0] == f"MÉTÉO: {short}"
+    assert lines[1].startswith("MARCHÉS: Phrase 0")
+    # What the short section leaves goes to the long one.
+    assert len(merged) > SMS_MAX_CHARS - 60
+
+
+def test_sms_sections_are_plain_text():
+    merged = merge_sections([_result("agro", "## Conseil\n\n- **Semez** le mil")], "en", "sms")
+    assert merged == "CROPS: Conseil - Semez le mil"
+
+
+def test_empty_answers_merge_to_nothing():
+    assert merge_sections([_result("weather", "")], "fr", "web") == ""
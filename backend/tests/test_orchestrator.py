@@ -0,0 +1,12 @@
+from agents.orchestrator import _mentioned_city
+
+
+def test_follow_up_names_a_city():
+    assert _mentioned_city("et à Touba ?") == "touba"
+    assert _mentioned_city("Météo à Saint-Louis demain") == "saint-louis"
+    assert _mentioned_city("Quel temps à Thiès") == "thies"
+
+
+def test_no_city_in_message():
+    assert _mentioned_city("et demain ?") is None
+    assert _mentioned_city("toubab") is None
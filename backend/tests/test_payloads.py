@@ -0,0 +1,80 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from config import settings
+from services.payloads import etag_matches, static_payload, static_response
+
+app = FastAPI()
+
+
+@app.get("/cities")
+async def cities(request: Request, fields: str | None = None):
+    return static_response(request, "cities", fields)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_full_response_carries_validators(client):
+    r = client.get("/cities", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.json() == settings.CITIES
+    assert r.headers["etag"] == static_payload("cities").etag
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert "last-modified" in r.headers
+    assert "content-encoding" not in r.headers
+
+
+def test_matching_etag_is_not_modified(client):
+    etag = client.get("/cities", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    r = client.get("/cities", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert "etag" in r.headers
+
+
+def test_any_representation_or_weak_tag_validates(client):
+    gz = client.get("/cities", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["content-encoding"] == "gzip"
+    identity_etag = static_payload("cities").etag
+    assert gz.headers["etag"] != identity_etag
+    for tag in (gz.headers["etag"], "W/" + identity_etag, f'"other", {identity_etag}', "*"):
+        assert client.get("/cities", headers={"If-None-Match": tag}).status_code == 304
+
+
+def test_stale_etag_gets_the_body(client):
+    r = client.get("/cities", headers={"If-None-Match": '"not-the-current-version"'})
+    assert r.status_code == 200
+    assert r.json() == settings.CITIES
+
+
+def test_if_modified_since(client):
+    last_modified = client.get("/cities").headers["last-modified"]
+    assert client.get("/cities", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/cities", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+    assert client.get("/cities", headers={"If-Modified-Since": "garbage"}).status_code == 200
+
+
+def test_gzip_body_is_the_same_json():
+    payload = static_payload("cities")
+    body, _ = payload.variants["gzip"]
+    assert json.loads(gzip.decompress(body)) == settings.CITIES
+
+
+def test_field_projection_has_its_own_etag(client):
+    r = client.get("/cities?fields=lat,lon", headers={"Accept-Encoding": "identity"})
+    assert r.json()["dakar"] == {"lat": settings.CITIES["dakar"]["lat"], "lon": settings.CITIES["dakar"]["lon"]}
+    assert r.headers["etag"] != static_payload("cities").etag
+    assert client.get("/cities?fields=lon,lat", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+
+def test_etag_matches():
+    assert not etag_matches(None, '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert not etag_matches('"b"', '"a"')
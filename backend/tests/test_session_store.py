@@ -0,0 +1,105 @@
+import pytest
+
+from services import session_store
+from services.session_store import SessionStore, ToolMemo, estimate_tokens, new_session, record_turn
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _memo_with_tools(clock, count, size=200):
+    memo = ToolMemo(max_age=600)
+    for i in range(count):
+        clock.now += 1
+        memo.put("get_weather", {"city": f"city{i}"}, {"forecast": "x" * size})
+    return memo
+
+
+def test_record_turn_drops_oldest_tools_before_turns(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    session = new_session()
+    record_turn(session, "q1", "a1", ["weather"], "dakar")
+    memo = _memo_with_tools(clock, 4)
+    budget = estimate_tokens(session) + 150
+
+    record_turn(session, "q2", "a2", ["weather"], None, memo=memo, budget=budget)
+
+    assert [t["content"] for t in session["turns"]] == ["q1", "a1", "q2", "a2"]
+    assert 0 < len(session["tools"]) < 4
+    assert [e["key"] for e in session["tools"]] == [e["key"] for e in memo.entries()[-len(session["tools"]):]]
+    assert estimate_tokens(session) <= budget
+    assert session["city"] == "dakar"
+
+
+def test_record_turn_drops_oldest_turn_pairs_once_tools_are_gone():
+    session = new_session()
+    for i in range(5):
+        record_turn(session, f"question {i} " + "x" * 100, f"answer {i} " + "y" * 100, ["agro"], None)
+    budget = estimate_tokens(session) - 10
+
+    record_turn(session, "question 5", "answer 5", ["agro"], None, budget=budget)
+
+    contents = [t["content"] for t in session["turns"]]
+    assert contents[-2:] == ["question 5", "answer 5"]
+    assert not contents[0].startswith("question 0")
+    assert [t["role"] for t in session["turns"]] == ["user", "assistant"] * (len(contents) // 2)
+    assert estimate_tokens(session) <= budget
+
+
+def test_record_turn_keeps_the_latest_pair_over_budget():
+    session = new_session()
+    record_turn(session, "q" * 400, "a" * 400, ["agro"], None, budget=10)
+    assert len(session["turns"]) == 2
+
+
+def test_tool_memo_reuses_results_within_ttl_only(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    memo = ToolMemo(max_age=600)
+    memo.put("get_weather", {"city": "Dakar"}, {"forecast": "sec"})
+
+    clock.now += 599
+    assert memo.get("get_weather", {"city": " dakar "}) == {"forecast": "sec"}
+    assert memo.get("get_weather", {"city": "touba"}) is None
+    assert memo.reused == 1
+
+    clock.now += 1
+    assert memo.get("get_weather", {"city": "dakar"}) is None
+
+
+def test_tool_memo_drops_expired_entries_when_loaded(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    memo = ToolMemo(max_age=600)
+    memo.put("get_prices", {"crop": "mil"}, {"price": 250})
+    clock.now += 300
+    memo.put("get_prices", {"crop": "arachide"}, {"price": 300})
+    entries = memo.entries()
+
+    clock.now += 400
+    reloaded = ToolMemo(entries, max_age=600)
+    assert reloaded.get("get_prices", {"crop": "mil"}) is None
+    assert reloaded.get("get_prices", {"crop": "arachide"}) == {"price": 300}
+    assert [e["tool"] for e in reloaded.entries()] == ["get_prices"]
+
+
+def test_tool_memo_does_not_keep_errors():
+    memo = ToolMemo(max_age=600)
+    memo.put("get_weather", {"city": "dakar"}, {"error": "timeout"})
+    assert memo.get("get_weather", {"city": "dakar"}) is None
+    assert memo.entries() == []
+
+
+def test_incomplete_store_fails_when_created():
+    class LoadOnlyStore(SessionStore):
+        async def load(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        LoadOnlyStore()
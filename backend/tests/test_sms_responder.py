@@ -0,0 +1,23 @@
+import asyncio
+
+from services.sms_responder import respond_to_command
+from services.sms_service import parse_sms_command
+
+
+def _reply(text: str) -> str | None:
+    return asyncio.run(respond_to_command(*parse_sms_command(text)))
+
+
+def test_missing_crop_quotes_the_keyword_typed():
+    assert _reply("PRIX") == "Precisez la culture. Ex: PRIX ARACHIDE."
+    assert _reply("maladie") == "Precisez la culture. Ex: MALADIE ARACHIDE."
+    assert _reply("NJEG") == "Wax tool bi. Ex: NJEG GERTE."
+
+
+def test_free_text_after_a_command_word_goes_to_the_llm():
+    assert _reply("prix de l'arachide a Kaolack ?") is None
+    assert _reply("meteo cette semaine pour mon champ") is None
+
+
+def test_unknown_single_word_crop_gets_the_hint():
+    assert _reply("PRIX banane").startswith("Culture inconnue: banane.")
@@ -0,0 +1,39 @@
+import asyncio
+
+from services import user_data_service
+from services.user_data_service import PROFILE, _cached, invalidate, user_cache
+
+
+def _race(write_user):
+    """Load u1's profile while ``write_user`` writes; is the load kept?"""
+    async def scenario():
+        user_cache.clear()
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return {"id": "u1", "city": "dakar"}
+
+        reading = asyncio.create_task(_cached(PROFILE, "u1", load))
+        await asyncio.sleep(0)
+        invalidate(write_user, PROFILE)
+        release.set()
+        await reading
+        return user_cache.get((PROFILE, "u1"))
+
+    return asyncio.run(scenario())
+
+
+def test_load_overlapping_the_users_own_write_is_not_cached():
+    assert _race("u1") is None
+
+
+def test_other_users_writes_do_not_drop_the_load():
+    assert _race("u2") == {"id": "u1", "city": "dakar"}
+
+
+def test_write_generations_are_per_user():
+    before = dict(user_data_service._writes)
+    invalidate("u3", PROFILE)
+    assert user_data_service._writes["u3"] == before.get("u3", 0) + 1
+    assert {k: v for k, v in user_data_service._writes.items() if k != "u3"} == {k: v for k, v in before.items() if k != "u3"}
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from config import settings
+from services import weather_service
+from services.forecast_store import ForecastStore
+from services.weather_service import ForecastUnavailable, get_weather_forecast, get_weather_forecasts
+
+
+class _OpenMeteo:
+    """Stand-in for the Open-Meteo fetchers: counts calls, can be taken down."""
+
+    def __init__(self):
+        self.down = False
+        self.single_calls = 0
+        self.batch_calls = 0
+
+    def _forecast(self, location):
+        if self.down:
+            raise httpx.ConnectError("Open-Meteo unreachable")
+        return {"forecast": [{"date": "2026-07-01", "temp_max": 33}], "lat": location["lat"]}
+
+    async def single(self, location):
+        self.single_calls += 1
+        return self._forecast(location)
+
+    async def batch(self, locations):
+        self.batch_calls += 1
+        return [self._forecast(location) for location in locations]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = _OpenMeteo()
+    monkeypatch.setattr(weather_service, "forecast_store", ForecastStore(":memory:", settings.WEATHER_STORE_MAX_AGE_SECONDS))
+    monkeypatch.setattr(weather_service, "_fetch_forecast", fake.single)
+    monkeypatch.setattr(weather_service, "_fetch_forecast_batch", fake.batch)
+    weather_service.forecast_cache.clear()
+    yield fake
+    weather_service.forecast_cache.clear()
+
+
+def _store(city, age):
+    location = settings.CITIES[city]
+    entry = (time.time() - age, {"forecast": [{"date": "2026-06-01"}], "lat": location["lat"]})
+    asyncio.run(weather_service.forecast_store.save_many({weather_service._cache_key(location): entry}))
+
+
+def test_many_cities_are_fetched_in_one_batch_then_cached(upstream):
+    cities = ["dakar", "touba", "kaolack"]
+    first = asyncio.run(get_weather_forecasts(cities))
+    again = asyncio.run(get_weather_forecasts(cities))
+
+    assert [f["city"] for f in first] == cities
+    assert [f["lat"] for f in first] == [settings.CITIES[c]["lat"] for c in cities]
+    assert not any(f["stale"] for f in first)
+    assert (upstream.batch_calls, upstream.single_calls) == (1, 0)
+    assert again == first
+
+
+def test_fresh_stored_forecast_is_served_without_a_request(upstream):
+    _store("dakar", age=0)
+    forecast = asyncio.run(get_weather_forecast("dakar"))
+    assert forecast["stale"] is False
+    assert upstream.single_calls == 0
+
+
+def test_stale_stored_forecast_is_served_at_once_and_refreshed(upstream):
+    _store("dakar", age=time.time() - weather_service._last_update() + 60)
+
+    async def scenario():
+        served = await get_weather_forecast("dakar")
+        inline_calls = upstream.single_calls
+        await asyncio.gather(*weather_service._refresh_tasks)
+        return served, inline_calls, await get_weather_forecast("dakar")
+
+    served, inline_calls, refreshed = asyncio.run(scenario())
+    assert served["stale"] is True
+    assert inline_calls == 0
+    assert refreshed["stale"] is False
+    assert upstream.single_calls == 1
+
+
+def test_stored_forecast_is_served_while_upstream_is_down(upstream):
+    upstream.down = True
+    _store("dakar", age=settings.WEATHER_STALE_SERVE_SECONDS + 3600)
+
+    forecast = asyncio.run(get_weather_forecast("dakar"))
+
+    assert upstream.single_calls == 1
+    assert forecast["stale"] is True
+    assert forecast["forecast"] == [{"date": "2026-06-01"}]
+
+
+def test_no_forecast_anywhere_is_unavailable(upstream):
+    upstream.down = True
+    with pytest.raises(ForecastUnavailable):
+        asyncio.run(get_weather_forecast("touba"))
+
+
+def test_batch_fails_when_one_city_has_nothing_stored(upstream):
+    upstream.down = True
+    _store("dakar", age=settings.WEATHER_STALE_SERVE_SECONDS + 3600)
+    with pytest.raises(ForecastUnavailable):
+        asyncio.run(get_weather_forecasts(["dakar", "touba"]))
+    # dakar alone is still served from the store
+    assert asyncio.run(get_weather_forecast("dakar"))["stale"] is True
+
+
+def test_unknown_city_is_a_value_error(upstream):
+    with pytest.raises(ValueError):
+        asyncio.run(get_weather_forecast("atlantis"))
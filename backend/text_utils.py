@@ -0,0 +1,39 @@
+import re
+import unicodedata
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _build_fold_table() -> dict[int, str | None]:
+    """Map every accented Latin character to its unaccented base, once."""
+    table: dict[int, str | None] = {}
+    for start, end in ((0x00C0, 0x0250), (0x1E00, 0x1F00)):
+        for cp in range(start, end):
+            base = "".join(
+                c for c in unicodedata.normalize("NFKD", chr(cp)) if not unicodedata.combining(c)
+            )
+            if base != chr(cp):
+                table[cp] = base
+    # Stray combining marks (already-decomposed input) are dropped.
+    for cp in range(0x0300, 0x0370):
+        table[cp] = None
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents (é -> e, ç -> c) for accent-insensitive lookups."""
+    if text.isascii():
+        return text.lower().strip()
+    return text.casefold().translate(_FOLD_TABLE).strip()
+
+
+def normalize_query(text: str) -> str:
+    """Fold case and accents, drop punctuation and collapse whitespace.
+
+    "Prix de l'arachide, Kaolack ?" and "prix de l arachide kaolack" compare equal.
+    """
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", fold_text(text))).strip()
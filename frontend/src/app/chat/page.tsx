@@ -428,6 +428,18 @@ export default function ChatPage() {
             return updated;
           });
           setRoutingAgents([]);
+        },
+        activeSessionId,
+        () => {
+          // The tokens so far came from a turn that called tools, not the answer.
+          setMessages((prev) => {
+            const updated = [...prev];
+            const last = updated[updated.length - 1];
+            if (last.role === "assistant") {
+              updated[updated.length - 1] = { ...last, content: "" };
+            }
+            return updated;
+          });
         }
       );
     } catch {
@@ -69,12 +69,13 @@ export interface WeatherData {
 export async function sendChat(
   message: string,
   city?: string,
-  language?: string
+  language?: string,
+  sessionId?: string
 ): Promise<ChatResponse> {
   return authFetch(`${API_BASE}/chat`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ message, city, language }),
+    body: JSON.stringify({ message, city, language, session_id: sessionId }),
   });
 }
 
@@ -85,13 +86,15 @@ export async function sendChatStream(
   onRouting: (agents: string[]) => void,
   onToken: (text: string) => void,
   onDone: (agentsUsed: string[], language: string) => void,
-  onError: (error: string) => void
+  onError: (error: string) => void,
+  sessionId?: string,
+  onReset?: () => void
 ): Promise<void> {
   const authHeaders = await getAuthHeaders();
   const res = await fetch(`${API_BASE}/chat/stream`, {
     method: "POST",
     headers: { "Content-Type": "application/json", ...authHeaders },
-    body: JSON.stringify({ message, city, language }),
+    body: JSON.stringify({ message, city, language, session_id: sessionId }),
   });
   if (!res.ok) throw new Error(`API error: ${res.status}`);
   if (!res.body) throw new Error("No response body");
@@ -114,6 +117,7 @@ export async function sendChatStream(
           const data = JSON.parse(line.slice(6));
           if (data.type === "routing") onRouting(data.agents);
           else if (data.type === "token") onToken(data.text);
+          else if (data.type === "reset") onReset?.();
           else if (data.type === "done")
             onDone(data.agents_used, data.language);
           else if (data.type === "error") onError(data.message);
@@ -349,10 +353,26 @@ export async function markAlertRead(id: string) {
   return authFetch(`${API_BASE}/alerts/${id}/read`, { method: "PUT" });
 }
 
-export async function generateAlerts(): Promise<Alert[]> {
+export interface AlertJob {
+  id: string;
+  kind: string;
+  status: "running" | "succeeded" | "failed" | "cancelled";
+  created_at: number;
+  finished_at: number | null;
+  progress: Record<string, number>;
+  result: Alert[] | null;
+  error: string | null;
+}
+
+// Starts generation in the background; poll fetchAlertJob(job.id) until it is no longer "running".
+export async function generateAlerts(): Promise<AlertJob> {
   return authFetch(`${API_BASE}/alerts/generate`, { method: "POST" });
 }
 
+export async function fetchAlertJob(id: string): Promise<AlertJob> {
+  return authFetch(`${API_BASE}/alerts/jobs/${id}`);
+}
+
 // ─── Calendar ─────────────────────────────────────────────────
 
 export interface CalendarMonth {